@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, Request
 from config import Config
 from dotenv import load_dotenv
 import os
@@ -12,8 +12,45 @@ if not os.getenv("GCP_PROJECT_ID"):
 if not os.getenv("GEMINI_API_KEY"):
     print("⚠️ WARNING: GEMINI_API_KEY not found in environment variables!")
 
+class IngestRequest(Request):
+    """
+    Request that can stream file uploads into hashed, type-checked spool files.
+
+    Spooling is opt-in per view (spool_uploads()), so only views that
+    handle UploadRejected and RequestEntityTooLarge ever see them; other
+    routes parse uploads exactly like a plain Flask request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._spooling = False
+        self._ingest_streams = []
+
+    def spool_uploads(self):
+        """Stream this request's file fields into spool files; call before reading the form."""
+        self._spooling = True
+        # Reject larger bodies (413) before reading them; slack for form fields
+        self.max_content_length = Config.UPLOAD_MAX_BYTES + 64 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not self._spooling:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        from services.upload_ingest import IngestStream
+        stream = IngestStream()
+        self._ingest_streams.append(stream)
+        return stream
+
+    def discard_unclaimed_uploads(self):
+        """Delete spool files of file fields the route never ingested."""
+        streams, self._ingest_streams = self._ingest_streams, []
+        for stream in streams:
+            if not stream.claimed:
+                stream.discard()
+
+
 def create_app():
     app = Flask(__name__)
+    app.request_class = IngestRequest
     app.config.from_object(Config)
     app.secret_key = app.config["SECRET_KEY"]
 
@@ -30,6 +67,15 @@ def create_app():
     app.register_blueprint(citizen_bp, url_prefix="/citizen")
     app.register_blueprint(document_bp, url_prefix="/document")
 
+    @app.teardown_request
+    def discard_unclaimed_uploads(exc):
+        from flask import request
+        request.discard_unclaimed_uploads()
+
+    # Resume Cloud Storage uploads journaled before the last restart
+    from services.upload_queue import upload_queue
+    upload_queue.start()
+
     @app.route("/")
     def index():
         from flask import redirect, url_for
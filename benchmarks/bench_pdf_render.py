@@ -0,0 +1,97 @@
+"""
+PDF render benchmark.
+
+Compares the xhtml2pdf and fpdf report engines on synthetic analysis
+results with 3 to 50 clauses, reporting pages/sec and p50/p99 latency.
+
+Usage:
+    python -m benchmarks.bench_pdf_render [--runs 20] [--json out.json]
+
+Run from the repository root.
+"""
+
+import io
+import json
+import time
+import argparse
+import statistics
+
+from PyPDF2 import PdfReader
+
+from services.pdf_exporter import ENGINES, render_pdf
+
+CLAUSE_COUNTS = (3, 10, 25, 50)
+RISKS = ("Low", "Medium", "High")
+
+
+def make_result(clauses: int) -> dict:
+    """Synthetic analysis result shaped like document_analyzer output."""
+    return {
+        "document_type": "Rental Agreement",
+        "summary": "This agreement sets out the terms of a residential tenancy. " * 6,
+        "overall_risk": "Medium",
+        "risk_drivers": [f"Risk driver {i}: one-sided clause on deposits and notice periods" for i in range(5)],
+        "clauses": [
+            {
+                "title": f"Clause {i + 1}: The tenant shall pay all maintenance charges and any penalty for late payment",
+                "risk": RISKS[i % 3],
+                "suggestion": "Consider reviewing this clause with a legal professional. " * (1 + i % 4),
+            }
+            for i in range(clauses)
+        ],
+    }
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def bench(engine: str, clauses: int, runs: int) -> dict:
+    result = make_result(clauses)
+    render_pdf(result, engine)  # warm-up (imports, font metrics)
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        data = render_pdf(result, engine)
+        latencies.append(time.perf_counter() - start)
+    pages = len(PdfReader(io.BytesIO(data)).pages)
+
+    total = sum(latencies)
+    return {
+        "engine": engine,
+        "clauses": clauses,
+        "pages": pages,
+        "runs": runs,
+        "pages_per_sec": round(pages * runs / total, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="renders per engine and report size")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=ENGINES)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'engine':<10} {'clauses':>7} {'pages':>5} {'pages/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for engine in args.engines:
+        for clauses in CLAUSE_COUNTS:
+            row = bench(engine, clauses, args.runs)
+            rows.append(row)
+            print(f"{engine:<10} {clauses:>7} {row['pages']:>5} {row['pages_per_sec']:>8} "
+                  f"{row['p50_ms']:>8} {row['p99_ms']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"📊 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+In-memory Firestore and Cloud Storage for load tests.
+
+``install()`` registers this module as ``services.firebase_service``, so
+firestore_service, storage_service and the upload queue run unchanged
+against the fakes below instead of the Firebase Admin SDK. Every
+operation waits for a latency drawn from a log-normal model, so Firestore
+round-trips still occupy request threads as they do in production.
+"""
+
+import sys
+import copy
+import time
+import uuid
+import random
+import threading
+
+from services.ai.simulator import LatencyModel
+
+_latency = LatencyModel(0, 0)
+_rng = random.Random()
+_rng_lock = threading.Lock()
+
+
+def _wait():
+    with _rng_lock:
+        delay = _latency.sample(_rng)
+    time.sleep(delay)
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeDocumentRef:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def set(self, data, merge=False):
+        _wait()
+        with self._collection.lock:
+            current = self._collection.docs.get(self.id, {}) if merge else {}
+            self._collection.docs[self.id] = {**current, **copy.deepcopy(data)}
+
+    def update(self, data):
+        _wait()
+        with self._collection.lock:
+            if self.id not in self._collection.docs:
+                raise KeyError(f"No document to update: {self._collection.name}/{self.id}")
+            self._collection.docs[self.id].update(copy.deepcopy(data))
+
+    def get(self):
+        _wait()
+        with self._collection.lock:
+            return FakeSnapshot(self.id, copy.deepcopy(self._collection.docs.get(self.id)))
+
+    def delete(self):
+        _wait()
+        with self._collection.lock:
+            self._collection.docs.pop(self.id, None)
+
+
+OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "array_contains": lambda a, b: b in (a or []),
+}
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=()):
+        self._collection = collection
+        self._filters = tuple(filters)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return FakeQuery(self._collection, self._filters + ((field_path, OPERATORS[op_string], value),))
+
+    def stream(self):
+        _wait()
+        with self._collection.lock:
+            matches = [
+                FakeSnapshot(doc_id, copy.deepcopy(data))
+                for doc_id, data in self._collection.docs.items()
+                if all(field in data and test(data[field], value) for field, test, value in self._filters)
+            ]
+        return iter(matches)
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, name):
+        super().__init__(self)
+        self.name = name
+        self.docs = {}
+        self.lock = threading.Lock()
+
+    def document(self, doc_id=None):
+        return FakeDocumentRef(self, doc_id or uuid.uuid4().hex[:20])
+
+
+class FakeFirestore:
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(name)
+            return self._collections[name]
+
+    def counts(self):
+        with self._lock:
+            return {name: len(collection.docs) for name, collection in self._collections.items()}
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+
+    @property
+    def public_url(self):
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    def upload_from_file(self, file, content_type=None, **kwargs):
+        self.upload_from_string(file.read(), content_type)
+
+    def upload_from_filename(self, filename, content_type=None, **kwargs):
+        with open(filename, "rb") as f:
+            self.upload_from_string(f.read(), content_type)
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        _wait()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.bucket.lock:
+            self.bucket.blobs[self.name] = (data, content_type)
+
+    def download_as_bytes(self, **kwargs):
+        _wait()
+        with self.bucket.lock:
+            if self.name not in self.bucket.blobs:
+                raise FileNotFoundError(self.name)
+            return self.bucket.blobs[self.name][0]
+
+    def exists(self, **kwargs):
+        _wait()
+        with self.bucket.lock:
+            return self.name in self.bucket.blobs
+
+    def delete(self, **kwargs):
+        _wait()
+        with self.bucket.lock:
+            self.bucket.blobs.pop(self.name, None)
+
+    def generate_signed_url(self, **kwargs):
+        return self.public_url + "?X-Goog-Signature=fake"
+
+
+class FakeBucket:
+    def __init__(self, name):
+        self.name = name
+        self.blobs = {}
+        self.lock = threading.Lock()
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def list_blobs(self, prefix=""):
+        _wait()
+        with self.lock:
+            return [FakeBlob(self, name) for name in self.blobs if name.startswith(prefix)]
+
+    def total_bytes(self):
+        with self.lock:
+            return sum(len(data) for data, _ in self.blobs.values())
+
+
+db = FakeFirestore()
+bucket = FakeBucket("load-test.appspot.com")
+
+
+def get_firestore_client():
+    """Returns the in-memory Firestore client"""
+    return db
+
+
+def get_storage_bucket():
+    """Returns the in-memory Cloud Storage bucket"""
+    return bucket
+
+
+def install(median_ms: float = 15, p99_ms: float = 80, seed=None):
+    """Use the fakes as services.firebase_service, with the given per-operation latency."""
+    global _latency, _rng
+    _latency = LatencyModel(median_ms, p99_ms)
+    _rng = random.Random(seed)
+    sys.modules["services.firebase_service"] = sys.modules[__name__]
+
+
+def stats() -> dict:
+    return {"firestore_documents": db.counts(), "storage_blobs": len(bucket.blobs), "storage_bytes": bucket.total_bytes()}
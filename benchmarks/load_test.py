@@ -0,0 +1,570 @@
+"""
+End-to-end load test.
+
+Drives a mix of students (signup/login, mock-client turns, document
+drafting, dashboards) and citizens (document uploads from tmp_docs/ through
+to their results, library browsing) against the app with the AI backends
+simulated (services/ai/simulator.py) and Firestore / Cloud Storage in
+memory (benchmarks/fakes.py). Concurrency is stepped up stage by stage;
+each stage reports throughput and p50/p95/p99 per route, and the
+saturation point is the first stage where more users stop adding
+throughput or errors appear.
+
+By default the app is served in-process on a pool of --threads worker
+threads, like the production ``gunicorn --workers 1 --threads 8``. To load
+the real deployment shape instead, start::
+
+    AI_BACKEND=simulated gunicorn --workers 1 --threads 8 --bind 127.0.0.1:8000 \\
+        'benchmarks.load_test:stubbed_app()'
+
+and pass ``--url http://127.0.0.1:8000``.
+
+Usage:
+    python -m benchmarks.load_test [--stages 1,2,4,8,16,32] [--duration 30]
+        [--json baseline.json] [--compare baseline.json]
+
+Run from the repository root.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+from urllib.parse import urlsplit, urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tmp_docs")
+
+# Action weights per role
+STUDENT_MIX = {"mock_client_turn": 6, "document_drafting": 2, "student_dashboard": 2, "relogin": 1}
+CITIZEN_MIX = {"analyze_upload": 2, "library": 6, "citizen_dashboard": 2, "relogin": 1}
+
+# Mock-client chats live in the cookie session; start a new case before it gets too big
+TURNS_PER_CASE = 5
+ANALYSIS_POLL_SECONDS = 0.5
+ANALYSIS_TIMEOUT_SECONDS = 180
+
+# Adding users must raise throughput by this much, with at most this error rate
+SATURATION_MIN_GAIN = 0.10
+SATURATION_MAX_ERROR_RATE = 0.01
+
+QUESTIONS = (
+    "When did you first receive the notice?",
+    "Can you tell me exactly what happened, step by step?",
+    "Do you have a written contract or any receipts?",
+    "Did you reply to them in writing?",
+    "How much money is involved in total?",
+    "Who else was present when this happened?",
+    "Have you spoken to anyone else about this problem?",
+    "What outcome would you like from this?",
+    "Are there any deadlines mentioned in the letter you received?",
+    "Have you missed any payments?",
+)
+
+DRAFTS = (
+    ("Eviction Notice", """NOTICE TO VACATE
+
+Date: 1 March 2025
+To: The Tenant, Flat 4B, Green Park Residency
+
+1. You are hereby notified that rent of Rs 25,000 for the months of January and February 2025 remains unpaid.
+2. Under clause 7 of the lease agreement dated 1 April 2024, you are required to pay the outstanding amount within 15 days.
+3. If payment is not received, the landlord will terminate the tenancy and you must vacate the premises within 30 days.
+
+Signed,
+The Landlord"""),
+    ("Demand Letter", """DEMAND FOR PAYMENT
+
+Date: 12 June 2025
+To: Mr. R. Sharma
+
+Dear Sir,
+
+On 3 May 2025 a window at my property was broken by a cricket ball from your premises. The repair cost was Rs 4,500 as shown by the attached invoice.
+I request that you reimburse this amount within 14 days of this letter. If the amount is not paid, I reserve my right to pursue the matter in the appropriate forum.
+
+Yours faithfully,
+A. Verma"""),
+    ("Refund Request", """REQUEST FOR REFUND
+
+Date: 20 July 2025
+To: Customer Service, QuickShop Pvt Ltd
+
+Order number 88213 for a study table was promised for delivery on 1 July 2025 but arrived on 18 July 2025.
+As the delivery was late beyond the agreed date, I request a full refund of Rs 7,999 to my original payment method within 10 days.
+
+Regards,
+S. Iyer"""),
+)
+
+LIBRARY_QUERIES = (
+    {},
+    {"sort": "oldest"},
+    {"sort": "high_risk"},
+    {"risk": "high"},
+    {"risk": "low", "sort": "low_risk"},
+    {"search": "agreement"},
+)
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# =========================================================
+# App under test
+# =========================================================
+def stubbed_app(firestore_median_ms: float = 15, firestore_p99_ms: float = 80):
+    """
+    The app with simulated AI and in-memory Firestore / Cloud Storage.
+
+    Must run before anything imports config: backends are chosen from the
+    environment at import time.
+    """
+    os.environ.setdefault("AI_BACKEND", "simulated")
+    scratch = tempfile.mkdtemp(prefix="justiplay-load-")
+    for name in ("CACHE_DIR", "REPORT_STORE_DIR", "UPLOAD_JOURNAL_DIR", "UPLOAD_SPOOL_DIR"):
+        os.environ.setdefault(name, os.path.join(scratch, name.lower()))
+    os.environ.setdefault("REPORT_STORE_BACKEND", "local")
+
+    from benchmarks import fakes
+    fakes.install(firestore_median_ms, firestore_p99_ms)
+
+    from app import create_app
+    return create_app()
+
+
+def serve(app, threads: int):
+    """Serve ``app`` on a free local port with a fixed pool of worker threads."""
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        # Connections wait for a free worker, as with gunicorn's gthread worker
+        request_queue_size = 128
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PooledWSGIServer("127.0.0.1", 0, app, handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name="wsgi-accept", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# =========================================================
+# Virtual users
+# =========================================================
+class Recorder:
+    """Latency samples per route label, thread-safe."""
+
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def add(self, label, seconds, ok):
+        with self._lock:
+            self.samples.append((label, seconds, ok))
+
+
+class Rejected(Exception):
+    """The app answered, but not with what the action needed (e.g. queue full)."""
+
+
+class VirtualUser:
+    """One browser session: a cookie jar and the user's current state."""
+
+    def __init__(self, base_url, role, recorder, rng, documents=(), unique_uploads=False, timeout=120):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.role = role
+        self.recorder = recorder
+        self.rng = rng
+        self.documents = documents
+        self.unique_uploads = unique_uploads
+        self.timeout = timeout
+        self.cookies = {}
+        self.username = f"load_{uuid.uuid4().hex[:10]}"
+        self.password = "load-test-password"
+        self.turns = 0
+
+    def request(self, label, method, path, fields=None, files=None):
+        """(status, headers, body) of one request, recorded under ``label``."""
+        headers = {"Connection": "close"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        body = None
+        if files:
+            body, headers["Content-Type"] = _multipart(fields or {}, files)
+        elif fields is not None:
+            body = urlencode(fields).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            finally:
+                conn.close()
+            ok = response.status < 400
+        finally:
+            self.recorder.add(label, time.perf_counter() - started, ok)
+
+        for header in response.headers.get_all("Set-Cookie") or []:
+            name, _, rest = header.partition("=")
+            value = rest.split(";", 1)[0]
+            if "Expires=Thu, 01 Jan 1970" in header or not value:
+                self.cookies.pop(name.strip(), None)
+            else:
+                self.cookies[name.strip()] = value
+        return response.status, response.headers, data
+
+    def expect_redirect(self, label, status, headers, fragment):
+        location = headers.get("Location", "")
+        if status not in (301, 302, 303) or fragment not in location:
+            self.recorder.add(f"rejected: {label}", 0.0, False)
+            raise Rejected(f"{label}: {status} -> {location or 'no redirect'}")
+        return location
+
+    # ---- actions ----
+
+    def signup(self):
+        status, headers, _ = self.request("POST /signup", "POST", "/signup", {
+            "role": self.role, "username": self.username,
+            "full_name": f"Load Test {self.role.title()}", "password": self.password,
+        })
+        self.expect_redirect("POST /signup", status, headers, "/dashboard")
+
+    def relogin(self):
+        self.request("GET /logout", "GET", "/logout")
+        self.cookies.clear()
+        status, headers, _ = self.request("POST /login", "POST", "/login", {
+            "role": self.role, "username": self.username, "password": self.password,
+        })
+        self.expect_redirect("POST /login", status, headers, "/dashboard")
+        self.turns = 0
+
+    def student_dashboard(self):
+        self.request("GET /student/dashboard", "GET", "/student/dashboard")
+
+    def citizen_dashboard(self):
+        self.request("GET /citizen/dashboard", "GET", "/citizen/dashboard")
+
+    def mock_client_turn(self):
+        if self.turns == 0 or self.turns >= TURNS_PER_CASE:
+            self.request("GET /student/mock-client?clear=true", "GET", "/student/mock-client?clear=true")
+            self.request("GET /student/mock-client", "GET", "/student/mock-client")
+            self.turns = 0
+        self.request("POST /student/mock-client", "POST", "/student/mock-client",
+                     {"question": self.rng.choice(QUESTIONS)})
+        self.turns += 1
+
+    def document_drafting(self):
+        document_type, text = self.rng.choice(DRAFTS)
+        self.request("POST /student/document-drafting", "POST", "/student/document-drafting",
+                     {"document_type": document_type, "document_text": text})
+
+    def library(self):
+        query = self.rng.choice(LIBRARY_QUERIES)
+        self.request("GET /citizen/library", "GET", "/citizen/library" + (f"?{urlencode(query)}" if query else ""))
+
+    def analyze_upload(self):
+        name, content = self.rng.choice(self.documents)
+        if self.unique_uploads:
+            # A trailing PDF comment changes the hash, so content caches miss
+            content += f"\n% load-test {uuid.uuid4().hex}\n".encode("ascii")
+
+        started = time.perf_counter()
+        status, headers, _ = self.request("POST /document/analyze", "POST", "/document/analyze",
+                                          files={"doc": (name, content, "application/pdf")})
+        location = self.expect_redirect("POST /document/analyze", status, headers, "/document/jobs/")
+        job_id = location.rstrip("/").rsplit("/", 1)[-1]
+
+        state = None
+        while time.perf_counter() - started < ANALYSIS_TIMEOUT_SECONDS:
+            status, _, body = self.request("GET /document/jobs/<id>/status", "GET", f"/document/jobs/{job_id}/status")
+            state = json.loads(body).get("status") if status == 200 else None
+            if state in ("done", "failed", None):
+                break
+            time.sleep(ANALYSIS_POLL_SECONDS)
+
+        ok = state == "done"
+        if ok:
+            status, _, _ = self.request("GET /document/jobs/<id>/result", "GET", f"/document/jobs/{job_id}/result")
+            ok = status == 200
+        self.recorder.add("flow: upload -> analysis result", time.perf_counter() - started, ok)
+
+    def run(self, deadline, think_seconds):
+        mix = STUDENT_MIX if self.role == "student" else CITIZEN_MIX
+        actions, weights = list(mix), list(mix.values())
+        try:
+            self.signup()
+        except Exception as e:
+            print(f"⚠️ {self.username}: signup failed: {e}")
+            return
+        while time.monotonic() < deadline:
+            action = self.rng.choices(actions, weights)[0]
+            try:
+                getattr(self, action)()
+            except Rejected:
+                pass
+            except Exception as e:
+                self.recorder.add(f"error: {action}", 0.0, False)
+                print(f"⚠️ {action} failed: {e}")
+            if think_seconds:
+                time.sleep(self.rng.expovariate(1 / think_seconds))
+
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8"))
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def load_documents():
+    documents = []
+    for name in sorted(os.listdir(DOCS_DIR)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(DOCS_DIR, name), "rb") as f:
+                documents.append((name, f.read()))
+    if not documents:
+        raise SystemExit(f"No sample PDFs found in {DOCS_DIR}")
+    return documents
+
+
+# =========================================================
+# Stages and reporting
+# =========================================================
+def run_stage(base_url, users, args, documents, seed):
+    recorder = Recorder()
+    deadline = time.monotonic() + args.duration
+    threads = []
+    for i in range(users):
+        rng = random.Random(seed * 1000 + i)
+        role = "student" if rng.random() < args.student_share else "citizen"
+        user = VirtualUser(base_url, role, recorder, rng, documents, args.unique_uploads)
+        thread = threading.Thread(target=user.run, args=(deadline, args.think_ms / 1000), daemon=True)
+        threads.append(thread)
+        thread.start()
+    started = time.monotonic()
+    for thread in threads:
+        thread.join()
+    return summarize(users, recorder.samples, time.monotonic() - started)
+
+
+def summarize(users, samples, elapsed):
+    routes = {}
+    for label, seconds, ok in samples:
+        routes.setdefault(label, []).append((seconds, ok))
+
+    rows = {}
+    for label, items in sorted(routes.items()):
+        latencies = [seconds for seconds, _ in items]
+        errors = sum(1 for _, ok in items if not ok)
+        rows[label] = {
+            "count": len(items),
+            "errors": errors,
+            "rps": round(len(items) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+        }
+
+    # Flows and synthetic error markers are not requests
+    requests = [(s, ok) for label, s, ok in samples if label.startswith(("GET ", "POST "))]
+    latencies = [s for s, _ in requests] or [0.0]
+    errors = sum(1 for _, ok in requests if not ok) + sum(
+        1 for label, _, _ in samples if label.startswith(("rejected: ", "error: "))
+    )
+    return {
+        "users": users,
+        "seconds": round(elapsed, 1),
+        "requests": len(requests),
+        "throughput_rps": round(len(requests) / elapsed, 2),
+        "error_rate": round(errors / max(1, len(requests)), 4),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "routes": rows,
+    }
+
+
+def find_saturation(stages):
+    """First stage where more users stopped adding throughput or errors appeared."""
+    for previous, stage in zip([None] + stages, stages):
+        if stage["error_rate"] > SATURATION_MAX_ERROR_RATE:
+            return {"users": stage["users"], "reason": f"error rate {stage['error_rate']:.1%}"}
+        if previous and stage["throughput_rps"] < previous["throughput_rps"] * (1 + SATURATION_MIN_GAIN):
+            return {
+                "users": stage["users"],
+                "reason": f"throughput {previous['throughput_rps']} -> {stage['throughput_rps']} req/s "
+                          f"for {previous['users']} -> {stage['users']} users",
+            }
+    return None
+
+
+def print_stage(stage):
+    print(f"\n👥 {stage['users']} users: {stage['throughput_rps']} req/s, "
+          f"p50/p95/p99 {stage['p50_ms']}/{stage['p95_ms']}/{stage['p99_ms']} ms, "
+          f"errors {stage['error_rate']:.2%}")
+    print(f"  {'route':<42} {'count':>6} {'err':>4} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, row in stage["routes"].items():
+        print(f"  {label:<42} {row['count']:>6} {row['errors']:>4} {row['rps']:>7} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}")
+
+
+def compare(report, baseline, tolerance):
+    """Regressions of this run against a saved baseline (matching stages and routes)."""
+    regressions = []
+    previous = {stage["users"]: stage for stage in baseline["stages"]}
+    for stage in report["stages"]:
+        base = previous.get(stage["users"])
+        if not base:
+            continue
+        if stage["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{stage['users']} users: throughput {base['throughput_rps']} -> {stage['throughput_rps']} req/s")
+        for label, row in stage["routes"].items():
+            old = base["routes"].get(label)
+            # Ignore sub-5ms differences: scheduler noise, not regressions
+            if old and row["p95_ms"] > old["p95_ms"] * (1 + tolerance) and row["p95_ms"] - old["p95_ms"] > 5:
+                regressions.append(f"{stage['users']} users: {label} p95 {old['p95_ms']} -> {row['p95_ms']} ms")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stages", default="1,2,4,8,16,32", help="concurrent users per stage")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per stage")
+    parser.add_argument("--threads", type=int, default=8, help="server worker threads (in-process server)")
+    parser.add_argument("--url", help="load an already running server instead of an in-process one")
+    parser.add_argument("--student-share", type=float, default=0.5, help="fraction of users who are students")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean pause between a user's actions")
+    parser.add_argument("--unique-uploads", action="store_true", help="make every upload unique (defeat content caches)")
+    parser.add_argument("--ai-median-ms", type=float, help="simulated Gemini median latency")
+    parser.add_argument("--ai-p99-ms", type=float, help="simulated Gemini p99 latency")
+    parser.add_argument("--ai-error-rate", type=float, help="simulated Gemini error rate")
+    parser.add_argument("--firestore-median-ms", type=float, default=15)
+    parser.add_argument("--firestore-p99-ms", type=float, default=80)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results (a baseline for --compare) to this file")
+    parser.add_argument("--compare", help="baseline JSON to check this run against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a regression is reported")
+    args = parser.parse_args()
+
+    for flag, env in (("ai_median_ms", "SIM_LATENCY_MEDIAN_MS"), ("ai_p99_ms", "SIM_LATENCY_P99_MS"),
+                      ("ai_error_rate", "SIM_ERROR_RATE")):
+        if getattr(args, flag) is not None:
+            os.environ[env] = str(getattr(args, flag))
+    os.environ.setdefault("SIM_SEED", str(args.seed))
+
+    documents = load_documents()
+    base_url = args.url
+    if not base_url:
+        app = stubbed_app(args.firestore_median_ms, args.firestore_p99_ms)
+        server, base_url = serve(app, args.threads)
+        print(f"🚀 Serving the stubbed app at {base_url} on {args.threads} threads")
+
+    stages = []
+    for users in [int(n) for n in args.stages.split(",")]:
+        stage = run_stage(base_url, users, args, documents, args.seed + users)
+        stages.append(stage)
+        print_stage(stage)
+
+    saturation = find_saturation(stages)
+    peak = max(stages, key=lambda s: s["throughput_rps"])
+    print(f"\n📈 Peak throughput: {peak['throughput_rps']} req/s at {peak['users']} users")
+    print(f"🧱 Saturation: {saturation['users']} users ({saturation['reason']})" if saturation
+          else "🧱 No saturation within the tested stages")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "target": args.url or f"in-process, {args.threads} threads",
+            "settings": {
+                key: value for key, value in vars(args).items()
+                if key not in ("json", "compare", "url")
+            },
+            "ai_backend": os.environ.get("AI_BACKEND"),
+        },
+        "stages": stages,
+        "peak": {"users": peak["users"], "throughput_rps": peak["throughput_rps"]},
+        "saturation": saturation,
+    }
+
+    if not args.url:
+        from benchmarks import fakes
+        report["meta"]["fakes"] = fakes.stats()
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📊 Results written to {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        changed = sorted(
+            key for key, value in report["meta"]["settings"].items()
+            if key != "tolerance" and baseline["meta"]["settings"].get(key) != value
+        )
+        if changed:
+            print(f"\n⚠️ Baseline was recorded with different settings: {', '.join(changed)}")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 class Config:
     # ===============================
@@ -14,13 +15,160 @@ class Config:
         "credentials.json"  # local dev fallback
     )
 
+    # Model of every Gemini call. Defaults to the model the services have
+    # always called; set GEMINI_MODEL_NAME to switch them all at once
     GEMINI_MODEL_NAME = os.environ.get(
         "GEMINI_MODEL_NAME",
-        "models/gemini-1.5-flash"
+        "gemini-2.0-flash-exp"
     )
+    # Per-call deadline (including retries), retry backoff and circuit breaker
+    GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "60"))
+    GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "3"))
+    GEMINI_RETRY_BASE_SECONDS = float(os.environ.get("GEMINI_RETRY_BASE_SECONDS", "0.5"))
+    GEMINI_RETRY_MAX_SECONDS = float(os.environ.get("GEMINI_RETRY_MAX_SECONDS", "8"))
+    GEMINI_BREAKER_THRESHOLD = int(os.environ.get("GEMINI_BREAKER_THRESHOLD", "5"))
+    GEMINI_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("GEMINI_BREAKER_COOLDOWN_SECONDS", "30"))
+    # Process-wide admission control in front of every Gemini call (rate 0 = unlimited)
+    GEMINI_RATE_PER_SECOND = float(os.environ.get("GEMINI_RATE_PER_SECOND", "5"))
+    GEMINI_BURST = int(os.environ.get("GEMINI_BURST", "10"))
+    GEMINI_MAX_IN_FLIGHT = int(os.environ.get("GEMINI_MAX_IN_FLIGHT", "6"))
+
+    # ===============================
+    # AI Backend (services/ai/simulator.py)
+    # ===============================
+    # "live" (Gemini / Document AI), "simulated" (no network: replay the
+    # cassette or synthesize responses) or "record" (live, appending to the cassette)
+    AI_BACKEND = os.environ.get("AI_BACKEND", "live")
+    AI_CASSETTE_PATH = os.environ.get("AI_CASSETTE_PATH", "cassettes/ai.jsonl")
+    SIM_LATENCY_MEDIAN_MS = float(os.environ.get("SIM_LATENCY_MEDIAN_MS", "800"))
+    SIM_LATENCY_P99_MS = float(os.environ.get("SIM_LATENCY_P99_MS", "4000"))
+    SIM_OCR_LATENCY_MEDIAN_MS = float(os.environ.get("SIM_OCR_LATENCY_MEDIAN_MS", "1500"))
+    SIM_OCR_LATENCY_P99_MS = float(os.environ.get("SIM_OCR_LATENCY_P99_MS", "6000"))
+    SIM_ERROR_RATE = float(os.environ.get("SIM_ERROR_RATE", "0"))
+    # 429 storms: SIM_STORM_SECONDS out of every SIM_STORM_EVERY_SECONDS (0 = off)
+    SIM_STORM_EVERY_SECONDS = float(os.environ.get("SIM_STORM_EVERY_SECONDS", "0"))
+    SIM_STORM_SECONDS = float(os.environ.get("SIM_STORM_SECONDS", "10"))
+    SIM_STORM_ERROR_RATE = float(os.environ.get("SIM_STORM_ERROR_RATE", "0.9"))
+    SIM_STREAM_CHUNK_CHARS = int(os.environ.get("SIM_STREAM_CHUNK_CHARS", "60"))
+    SIM_SEED = int(os.environ["SIM_SEED"]) if os.environ.get("SIM_SEED") else None
 
     # ===============================
     # App Mode
     # ===============================
     ENV = os.environ.get("FLASK_ENV", "development")
     DEBUG = ENV == "development"
+
+    # ===============================
+    # Upload Ingestion
+    # ===============================
+    UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+    UPLOAD_SPOOL_DIR = os.environ.get(
+        "UPLOAD_SPOOL_DIR",
+        os.path.join(tempfile.gettempdir(), "justiplay-uploads")
+    )
+
+    # ===============================
+    # Background Cloud Storage Uploads
+    # ===============================
+    UPLOAD_JOURNAL_DIR = os.environ.get("UPLOAD_JOURNAL_DIR", "upload_journal")
+    UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "2"))
+    UPLOAD_MAX_ATTEMPTS = int(os.environ.get("UPLOAD_MAX_ATTEMPTS", "8"))
+    UPLOAD_RETRY_BASE_SECONDS = float(os.environ.get("UPLOAD_RETRY_BASE_SECONDS", "5"))
+    UPLOAD_RETRY_MAX_SECONDS = float(os.environ.get("UPLOAD_RETRY_MAX_SECONDS", "600"))
+
+    # ===============================
+    # Background Analysis Queue
+    # ===============================
+    ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "2"))
+    ANALYSIS_QUEUE_SIZE = int(os.environ.get("ANALYSIS_QUEUE_SIZE", "16"))
+    ANALYSIS_JOB_RETENTION_SECONDS = int(os.environ.get("ANALYSIS_JOB_RETENTION_SECONDS", "3600"))
+    # Shortest-job-first aging: a waiting upload counts this many bytes smaller per second waited
+    ANALYSIS_JOB_AGING_BYTES_PER_SECOND = float(os.environ.get("ANALYSIS_JOB_AGING_BYTES_PER_SECOND", str(256 * 1024)))
+    # Stream Gemini's response and push fields/clauses to the status page over SSE
+    ANALYSIS_STREAMING = os.environ.get("ANALYSIS_STREAMING", "true").lower() == "true"
+    ANALYSIS_SSE_KEEPALIVE_SECONDS = float(os.environ.get("ANALYSIS_SSE_KEEPALIVE_SECONDS", "15"))
+    ANALYSIS_SSE_MAX_STREAMS = int(os.environ.get("ANALYSIS_SSE_MAX_STREAMS", "4"))
+
+    # ===============================
+    # Local Caches
+    # ===============================
+    CACHE_DIR = os.environ.get("CACHE_DIR", "cache")
+    ANALYSIS_CACHE_MEMORY_ITEMS = int(os.environ.get("ANALYSIS_CACHE_MEMORY_ITEMS", "128"))
+    ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get("ANALYSIS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    ANALYSIS_CACHE_TTL_SECONDS = int(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    OCR_CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+    OCR_CACHE_TTL_SECONDS = int(os.environ.get("OCR_CACHE_TTL_SECONDS", str(90 * 24 * 3600)))
+    # Mock-client question evaluations: exact + near-duplicate (cosine >= similarity) tiers
+    QUESTION_CACHE_MAX_ITEMS = int(os.environ.get("QUESTION_CACHE_MAX_ITEMS", "1024"))
+    QUESTION_CACHE_TTL_SECONDS = int(os.environ.get("QUESTION_CACHE_TTL_SECONDS", str(24 * 3600)))
+    QUESTION_CACHE_SIMILARITY = float(os.environ.get("QUESTION_CACHE_SIMILARITY", "0.8"))
+
+    # ===============================
+    # PDF Extraction Worker Pool
+    # ===============================
+    PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "2"))
+    PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+    PDF_JOB_TIMEOUT_SECONDS = float(os.environ.get("PDF_JOB_TIMEOUT_SECONDS", "60"))
+    PDF_WORKER_MAX_RSS_MB = int(os.environ.get("PDF_WORKER_MAX_RSS_MB", "512"))
+    # Hard address-space cap per worker (0 = disabled); RSS is checked per page regardless
+    PDF_WORKER_ADDRESS_SPACE_MB = int(os.environ.get("PDF_WORKER_ADDRESS_SPACE_MB", "0"))
+
+    # ===============================
+    # PDF Report Rendering
+    # ===============================
+    # "xhtml2pdf" (HTML/CSS template) or "fpdf" (direct drawing, much faster)
+    PDF_RENDER_ENGINE = os.environ.get("PDF_RENDER_ENGINE", "xhtml2pdf")
+    PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", "1"))
+    PDF_RENDER_TIMEOUT_SECONDS = float(os.environ.get("PDF_RENDER_TIMEOUT_SECONDS", "60"))
+
+    # ===============================
+    # Long-Document Analysis
+    # ===============================
+    # Analyze whole documents in concurrent sections instead of the first 10k characters
+    LONG_DOCUMENT_ANALYSIS = os.environ.get("LONG_DOCUMENT_ANALYSIS", "true").lower() == "true"
+    LONG_DOCUMENT_MAX_CHARS = int(os.environ.get("LONG_DOCUMENT_MAX_CHARS", "200000"))
+    LONG_DOCUMENT_CONCURRENCY = int(os.environ.get("LONG_DOCUMENT_CONCURRENCY", "4"))
+
+    # ===============================
+    # Revision Analysis
+    # ===============================
+    # Re-uploads that mostly match a recent document of the same user only
+    # send the changed paragraphs to Gemini
+    REVISION_ANALYSIS = os.environ.get("REVISION_ANALYSIS", "true").lower() == "true"
+    REVISION_MIN_OVERLAP = float(os.environ.get("REVISION_MIN_OVERLAP", "0.6"))
+    REVISION_HISTORY_PER_USER = int(os.environ.get("REVISION_HISTORY_PER_USER", "5"))
+
+    # ===============================
+    # Mock Client
+    # ===============================
+    # Client reply and question evaluation run concurrently; an evaluation
+    # still running this long after the reply is filled in by the page later
+    MOCK_CLIENT_WORKERS = int(os.environ.get("MOCK_CLIENT_WORKERS", "8"))
+    MOCK_CLIENT_EVALUATION_GRACE_SECONDS = float(os.environ.get("MOCK_CLIENT_EVALUATION_GRACE_SECONDS", "1.0"))
+    # Client replies see the last N turns verbatim and a rolling summary of older ones
+    MOCK_CLIENT_CONTEXT_TURNS = int(os.environ.get("MOCK_CLIENT_CONTEXT_TURNS", "6"))
+    MOCK_CLIENT_SUMMARY_CACHE_ITEMS = int(os.environ.get("MOCK_CLIENT_SUMMARY_CACHE_ITEMS", "512"))
+    # Question evaluations arriving within EVALUATION_BATCH_WAIT_MS of each other
+    # share one Gemini request (up to EVALUATION_BATCH_MAX_ITEMS questions)
+    EVALUATION_BATCHING = os.environ.get("EVALUATION_BATCHING", "true").lower() == "true"
+    EVALUATION_BATCH_MAX_ITEMS = int(os.environ.get("EVALUATION_BATCH_MAX_ITEMS", "8"))
+    EVALUATION_BATCH_WAIT_MS = float(os.environ.get("EVALUATION_BATCH_WAIT_MS", "25"))
+    EVALUATION_BATCH_WORKERS = int(os.environ.get("EVALUATION_BATCH_WORKERS", "4"))
+    # "llm" (Gemini, local score as fallback), "tiered" (local score unless borderline
+    # or sampled) or "local" (no Gemini)
+    EVALUATION_MODE = os.environ.get("EVALUATION_MODE", "llm").lower()
+    EVALUATION_SAMPLE_RATE = float(os.environ.get("EVALUATION_SAMPLE_RATE", "0.1"))
+    EVALUATION_BORDERLINE_MARGIN = float(os.environ.get("EVALUATION_BORDERLINE_MARGIN", "5"))
+
+    # ===============================
+    # Report Store
+    # ===============================
+    # "local" (single instance) or "gcs" (shared bucket + local LRU disk cache)
+    REPORT_STORE_BACKEND = os.environ.get("REPORT_STORE_BACKEND", "local")
+    REPORT_STORE_DIR = os.environ.get("REPORT_STORE_DIR", "reports")
+    REPORT_GCS_PREFIX = os.environ.get("REPORT_GCS_PREFIX", "reports/")
+    REPORT_TTL_SECONDS = int(os.environ.get("REPORT_TTL_SECONDS", str(7 * 24 * 3600)))
+    REPORT_STORE_MAX_BYTES = int(os.environ.get("REPORT_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Reports saved before the report store, under sequential doc_N IDs (still downloadable)
+    REPORT_LEGACY_DIR = os.environ.get("REPORT_LEGACY_DIR", "tmp_docs")
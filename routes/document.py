@@ -1,69 +1,22 @@
 # routes/document.py
 
-import os
-import re
-from flask import Blueprint, render_template, request, redirect, send_file, flash
-from services.ai.ocr_client import extract_text
-from services.ai.document_analyzer import analyze_document
-from services.pdf_exporter import generate_pdf
+import json
+import threading
+
+from flask import Blueprint, Response, render_template, request, redirect, send_file, flash, session, url_for, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import Config
+from services.document_pipeline import analysis_queue, submit_analysis
+from services.report_store import is_valid_report_id, legacy_report_path
+from services.report_service import get_report_pdf
+from services.job_queue import QueueFullError, DONE, FAILED
+from services.highlighter import highlight_text, highlight_offsets
+from services.upload_ingest import ingest_file, UploadRejected
 
 document_bp = Blueprint("document", __name__, url_prefix="/document")
 
-TMP = "tmp_docs"
-os.makedirs(TMP, exist_ok=True)
-
-
-def highlight_text(text: str, clauses: list) -> str:
-    """
-    Highlight clause text in the document based on risk levels.
-    
-    Args:
-        text: Full document text
-        clauses: List of clause dictionaries with 'text' and 'risk' fields
-        
-    Returns:
-        str: HTML with highlighted text using <mark> tags
-    """
-    highlighted = text
-    
-    # Sort clauses by text length (longest first) to avoid partial matches
-    sorted_clauses = sorted(clauses, key=lambda c: len(c.get('text', '')), reverse=True)
-    
-    for clause in sorted_clauses:
-        clause_text = clause.get('text', '').strip()
-        risk = clause.get('risk', 'Medium')
-        
-        if not clause_text or len(clause_text) < 10:
-            continue
-        
-        # Map risk to CSS class
-        risk_class = f"risk-{risk.lower()}"
-        
-        # Try exact match first
-        if clause_text in highlighted:
-            highlighted = highlighted.replace(
-                clause_text,
-                f'<mark class="{risk_class}">{clause_text}</mark>',
-                1  # Replace only first occurrence
-            )
-        else:
-            # Try fuzzy match: normalize whitespace and try again
-            normalized_clause = ' '.join(clause_text.split())
-            
-            # Create a regex pattern that allows flexible whitespace
-            pattern = re.escape(normalized_clause)
-            pattern = pattern.replace(r'\ ', r'\s+')
-            
-            match = re.search(pattern, highlighted, re.IGNORECASE)
-            if match:
-                matched_text = match.group(0)
-                highlighted = highlighted.replace(
-                    matched_text,
-                    f'<mark class="{risk_class}">{matched_text}</mark>',
-                    1
-                )
-    
-    return highlighted
+# Each open SSE stream holds a server thread; beyond this, clients poll instead
+_sse_slots = threading.BoundedSemaphore(Config.ANALYSIS_SSE_MAX_STREAMS)
 
 
 @document_bp.route("/upload")
@@ -74,115 +27,223 @@ def upload():
 
 @document_bp.route("/analyze", methods=["POST"])
 def analyze():
-    """Process uploaded document and display analysis results."""
-    from flask import session
-    from services.storage_service import upload_document
-    from services.firestore_service import create_document, get_user, create_user
-    
-    file = request.files.get("doc")
-    if not file:
-        flash("Please select a document to upload.", "error")
+    """Accept an upload, queue it for analysis and redirect to its status page."""
+    # The upload is streamed to a spool file while the form is parsed;
+    # oversize and unsupported files are rejected mid-stream
+    request.spool_uploads()
+    try:
+        file = request.files.get("doc")
+        if not file:
+            flash("Please select a document to upload.", "error")
+            return redirect("/document/upload")
+        upload = ingest_file(file)
+    except RequestEntityTooLarge:
+        flash(f"File is too large (limit {Config.UPLOAD_MAX_BYTES // (1024 * 1024)} MB).", "error")
+        return redirect("/document/upload")
+    except UploadRejected as e:
+        flash(str(e), "error")
         return redirect("/document/upload")
 
-    # Read file content
-    content = file.read()
-    mime = file.mimetype
-    
-    if not content:
-        flash("Uploaded file is empty.", "error")
+    try:
+        job = submit_analysis(
+            upload,
+            user_id=session.get("user_id", "default_user"),
+            username=session.get("full_name", "Anonymous User")
+        )
+    except QueueFullError:
+        upload.discard()
+        flash("The analysis service is busy right now. Please try again in a minute.", "error")
         return redirect("/document/upload")
 
-    # Extract text (with smart OCR detection)
-    print(f"📤 Processing: {file.filename} ({mime})")
-    text = extract_text(content, mime)
-    
-    if not text or len(text.strip()) < 50:
-        flash("Could not extract meaningful text from document.", "error")
+    # POST-redirect-GET: refreshing the status/result page never re-runs analysis
+    return redirect(url_for("document.job_status", job_id=job.id), code=303)
+
+
+def _get_owned_job(job_id):
+    """Look up a job, returning None unless it belongs to the current session."""
+    job = analysis_queue.get(job_id)
+    if not job or job.owner != session.get("user_id", "default_user"):
+        return None
+    return job
+
+
+@document_bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Status page that polls until the analysis job is finished."""
+    job = _get_owned_job(job_id)
+    if not job:
+        flash("Analysis job not found or expired.", "error")
         return redirect("/document/upload")
 
-    # Analyze document with Gemini
-    result = analyze_document(text)
-    
-    if "error" in result and not result.get("clauses"):
-        flash("Analysis failed. Please try again.", "error")
+    if job.status == DONE:
+        return redirect(url_for("document.job_result", job_id=job.id))
+
+    return render_template("citizen/analysis_status.html", job=job.to_dict())
+
+
+@document_bp.route("/jobs/<job_id>/status")
+def job_status_json(job_id):
+    """JSON job status for polling clients."""
+    job = _get_owned_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    data = job.to_dict()
+    if job.status == DONE:
+        data["result_url"] = url_for("document.job_result", job_id=job.id)
+    return jsonify(data)
+
+
+@document_bp.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """Server-Sent Events stream of the job's partial results as Gemini generates them."""
+    job = _get_owned_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if not _sse_slots.acquire(blocking=False):
+        return jsonify({"error": "Too many streams, poll the status instead"}), 503
+
+    result_url = url_for("document.job_result", job_id=job.id)
+    last_id = request.headers.get("Last-Event-ID", "")
+    index = int(last_id) if last_id.isdigit() else 0
+
+    def stream(index):
+        while True:
+            events, finished = job.events_since(index, timeout=Config.ANALYSIS_SSE_KEEPALIVE_SECONDS)
+            for event, data in events:
+                index += 1
+                yield f"id: {index}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+            if finished:
+                done = {"status": job.status, "result_url": result_url}
+                yield f"event: done\ndata: {json.dumps(done)}\n\n"
+                return
+            if not events:
+                # Keeps proxies from timing out and detects disconnected clients
+                yield ": keepalive\n\n"
+
+    response = Response(
+        stream(index),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Runs when the server closes the response, even if it never started streaming
+    response.call_on_close(_sse_slots.release)
+    return response
+
+
+@document_bp.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    """Display the analysis results of a finished job."""
+    job = _get_owned_job(job_id)
+    if not job:
+        flash("Analysis job not found or expired.", "error")
         return redirect("/document/upload")
 
-    # Highlight clause text in document
-    highlighted = highlight_text(text, result.get("clauses", []))
+    if job.status == FAILED:
+        flash(job.error or "Analysis failed. Please try again.", "error")
+        return redirect("/document/upload")
 
-    # Generate PDF report
-    doc_id = "doc_" + str(len(os.listdir(TMP)))
-    pdf_path = os.path.join(TMP, f"{doc_id}.pdf")
-    
-    try:
-        generate_pdf(result, pdf_path)
-    except Exception as e:
-        print(f"⚠️ PDF generation failed: {e}")
-        # Continue anyway, user can still see web results
+    if job.status != DONE:
+        return redirect(url_for("document.job_status", job_id=job.id))
 
-    # ========== FIREBASE INTEGRATION ==========
-    try:
-        # Get user ID from session (or create a default one)
-        user_id = session.get("user_id", "default_user")
-        username = session.get("full_name", "Anonymous User")
-        
-        # Ensure user exists in Firestore
-        user = get_user(user_id)
-        if not user:
-            create_user(user_id, username, role="citizen")
-        
-        # Try to upload to Cloud Storage (optional)
-        file_url = None
-        try:
-            # Reset file pointer for upload
-            file.seek(0)
-            storage_result = upload_document(file, user_id, file.filename)
-            file_url = storage_result['file_url']
-            print(f"✅ File uploaded to Cloud Storage")
-        except Exception as storage_error:
-            print(f"⚠️ Cloud Storage upload failed: {storage_error}")
-            # Use local PDF path as fallback
-            file_url = f"/document/download_pdf/{doc_id}"
-        
-        # Extract risk data
-        risk_flags = [clause.get('text', '')[:100] for clause in result.get('clauses', []) if clause.get('risk') in ['High', 'Critical']]
-        risk_score = result.get('overall_risk_score', 50)
-        
-        # Save to Firestore (even if storage failed)
-        firestore_doc_id = create_document(
-            owner_id=user_id,
-            title=file.filename or "Untitled Document",
-            summary=result.get('summary', 'No summary available')[:500],
-            risk_flags=risk_flags[:5],  # Limit to 5 flags
-            risk_score=risk_score,
-            file_url=file_url
-        )
-        
-        print(f"✅ Document saved to Firestore: {firestore_doc_id}")
-        
+    output = job.result
+    if output.get("firestore_doc_id"):
         # Store Firestore doc ID in session for later retrieval
-        session['last_doc_id'] = firestore_doc_id
-        
-    except Exception as e:
-        print(f"⚠️ Firebase save failed: {e}")
-        # Continue anyway - analysis still works without Firebase
+        session['last_doc_id'] = output["firestore_doc_id"]
+
+    # ?highlights=client: ship the plain text once and let the browser
+    # apply the highlight offsets from job_highlights
+    if request.args.get("highlights") == "client":
+        return render_template(
+            "citizen/analysis_result.html",
+            result=output["result"],
+            document_text=output["text"],
+            highlights_url=url_for("document.job_highlights", job_id=job.id),
+            doc_id=output["doc_id"]
+        )
+
+    # Highlight clause text in document
+    highlighted = highlight_text(output["text"], output["result"].get("clauses", []))
 
     return render_template(
         "citizen/analysis_result.html",
-        result=result,
+        result=output["result"],
         highlighted_text=highlighted,
-        doc_id=doc_id
+        doc_id=output["doc_id"]
     )
 
 
+@document_bp.route("/jobs/<job_id>/highlights")
+def job_highlights(job_id):
+    """Clause highlight offsets (UTF-16) into the job's document text."""
+    job = _get_owned_job(job_id)
+    if not job or job.status != DONE:
+        return jsonify({"error": "Job not found"}), 404
+
+    output = job.result
+    return jsonify({
+        "length": len(output["text"].encode("utf-16-le")) // 2,
+        "spans": highlight_offsets(output["text"], output["result"].get("clauses", []))
+    })
+
+
+@document_bp.route("/queue/stats")
+def queue_stats():
+    """Analysis queue depth and wait-time metrics."""
+    return jsonify(analysis_queue.stats())
+
+
+@document_bp.route("/uploads/stats")
+def upload_stats():
+    """Background Cloud Storage uploader metrics."""
+    from services.upload_queue import upload_queue
+    return jsonify(upload_queue.stats())
+
+
+@document_bp.route("/gemini/stats")
+def gemini_stats():
+    """Gemini call latency, retries, circuit breaker, governor, coalescing, batching, tier and simulator state."""
+    from services.ai.gemini_client import gemini
+    from services.ai.simulator import simulator
+    from services.ai.evaluator_ai import evaluation_batcher
+    from services.ai.local_scorer import tier_stats
+    return jsonify({
+        **gemini.stats(),
+        "evaluation_batching": evaluation_batcher.stats(),
+        "evaluation_tiers": tier_stats.to_dict(),
+        "simulator": simulator.stats() if simulator else None
+    })
+
+
+@document_bp.route("/cache/stats")
+def cache_stats():
+    """Analysis, text-extraction, question-evaluation and conversation-summary cache counters."""
+    from services.ai.analysis_cache import cache_stats as analysis_cache_stats
+    from services.ai.ocr_cache import cache_stats as ocr_cache_stats
+    from services.ai.ocr_client import extraction_stats
+    from services.ai.question_cache import question_cache
+    from services.ai.conversation_context import summary_stats
+    return jsonify({
+        "analysis": analysis_cache_stats(),
+        "extraction": ocr_cache_stats(),
+        "extraction_coalescing": extraction_stats(),
+        "questions": question_cache.stats(),
+        "conversation_summaries": summary_stats()
+    })
+
+
 @document_bp.route("/download_pdf/<doc_id>")
 def download(doc_id):
-    """Download the generated PDF report."""
-    # Sanitize doc_id to prevent directory traversal
-    doc_id = re.sub(r'[^a-zA-Z0-9_-]', '', doc_id)
-    pdf_path = os.path.join(TMP, f"{doc_id}.pdf")
+    """Download the PDF report, rendering it on first request."""
+    # Only well-formed report IDs ever reach the filesystem
+    pdf_path = legacy_report_path(doc_id)
+    if is_valid_report_id(doc_id):
+        try:
+            pdf_path = get_report_pdf(doc_id)
+        except Exception as e:
+            print(f"❌ PDF generation failed: {e}")
     
-    if not os.path.exists(pdf_path):
+    if not pdf_path:
         flash("PDF report not found.", "error")
         return redirect("/document/upload")
     
@@ -1,6 +1,5 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request
-from services.ai.client_ai import get_client_reply
-from services.ai.evaluator_ai import evaluate_student_question
+from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
+from services.ai.mock_turns import run_turn, get_pending_evaluation, peek_pending_evaluation
 
 
 
@@ -152,6 +151,93 @@ def profile():
 # -------------------------------------------------
 # AI Mock Client (Dynamic & Leveled)
 # -------------------------------------------------
+def award_mock_client_xp(scenario, evaluation, turn_number):
+    """Award XP for an evaluated mock-client question (mutates the session)."""
+    # Initialize history if not exists
+    if "student_history" not in session:
+        session["student_history"] = []
+
+    # Calculate XP: Higher reward for harder scenarios
+    base_score = evaluation.get("total_score", 50)
+    difficulty_mult = {
+        "Easy": 0.5,
+        "Medium": 0.8,
+        "Hard": 1.2,
+        "Expert": 1.5,
+        "Legendary": 2.0
+    }.get(scenario.get("difficulty", "Easy"), 0.5)
+
+    xp_reward = int(base_score * 0.1 * difficulty_mult)
+
+    # Only log significant interactions to history to avoid clutter
+    if turn_number % 5 == 0:
+        session["student_history"].insert(0, {
+            "case_name": f"Session: {scenario['title']}",
+            "type": "Mock Client",
+            "date": "Today",
+            "score": base_score,
+            "xp_earned": xp_reward
+        })
+
+    # Award XP immediately
+    session["student_xp"] = session.get("student_xp", 0) + xp_reward
+    session.modified = True
+
+
+def collect_pending_evaluation(index):
+    """
+    Fill in a chat turn's evaluation if it has completed since the reply.
+
+    Returns:
+        "done", "pending" or "unknown"
+    """
+    item = session.get("mock_chat", [])[index]
+    if item.get("evaluation"):
+        return "done"
+
+    status, evaluation = get_pending_evaluation(item.get("evaluation_id", ""))
+    if status == "done":
+        item["evaluation"] = evaluation
+        item.pop("evaluation_id", None)
+        award_mock_client_xp(session["current_scenario"], evaluation, index + 1)
+    elif status == "unknown":
+        # Lost (expired or another worker): stop waiting for it
+        item.pop("evaluation_id", None)
+        session.modified = True
+    return status
+
+
+@student_bp.before_request
+def apply_finished_evaluations():
+    """
+    Apply evaluations that completed after their turn was shown (and their
+    XP) on the student's next page request. The background poll below
+    never writes the session: its cookie would race the next turn's.
+    """
+    if request.endpoint == "student.mock_client_evaluation" or session.get("role") != "student":
+        return
+    for index, item in enumerate(session.get("mock_chat", [])):
+        if item.get("evaluation_id"):
+            collect_pending_evaluation(index)
+
+
+@student_bp.route("/mock-client/evaluation/<int:index>")
+def mock_client_evaluation(index):
+    """Pending question evaluation of a chat turn, polled by the page (read-only)."""
+    if session.get("role") != "student":
+        return jsonify({"error": "Unauthorized"}), 401
+
+    chat = session.get("mock_chat", [])
+    if not 0 <= index < len(chat):
+        return jsonify({"status": "unknown"}), 404
+
+    item = chat[index]
+    if item.get("evaluation"):
+        return jsonify({"status": "done", "evaluation": item["evaluation"]})
+    status, evaluation = peek_pending_evaluation(item.get("evaluation_id", ""))
+    return jsonify({"status": status, "evaluation": evaluation})
+
+
 @student_bp.route("/mock-client", methods=["GET", "POST"])
 def mock_client():
     if session.get("role") != "student":
@@ -187,52 +273,28 @@ def mock_client():
         question = request.form.get("question", "").strip()
 
         if question:
-            # Pass scenario context to AI
-            reply = get_client_reply(
+            # Reply and evaluation run concurrently; a slow evaluation is
+            # filled in later instead of holding up the reply
+            reply, evaluation, evaluation_id = run_turn(
                 conversation_history=session.get("mock_chat", []),
                 student_question=question,
                 scenario_context=scenario
             )
 
-            evaluation = evaluate_student_question(question)
-
             # Append to chat history
-            session["mock_chat"].append({
+            turn = {
                 "question": question,
                 "reply": reply,
                 "evaluation": evaluation
-            })
-            
-            # Initialize history if not exists
-            if "student_history" not in session:
-                session["student_history"] = []
-
-            # Calculate XP: Higher reward for harder scenarios
-            base_score = evaluation.get("total_score", 50)
-            difficulty_mult = {
-                "Easy": 0.5,
-                "Medium": 0.8,
-                "Hard": 1.2,
-                "Expert": 1.5,
-                "Legendary": 2.0
-            }.get(scenario.get("difficulty", "Easy"), 0.5)
-
-            xp_reward = int(base_score * 0.1 * difficulty_mult) 
-            
-            # Only log significant interactions to history to avoid clutter
-            if len(session["mock_chat"]) % 5 == 0:
-                session["student_history"].insert(0, {
-                    "case_name": f"Session: {scenario['title']}",
-                    "type": "Mock Client",
-                    "date": "Today",
-                    "score": base_score,
-                    "xp_earned": xp_reward
-                })
-            
-            # Award XP immediately
-            session["student_xp"] = session.get("student_xp", 0) + xp_reward
+            }
+            if evaluation_id:
+                turn["evaluation_id"] = evaluation_id
+            session["mock_chat"].append(turn)
             session.modified = True
 
+            if evaluation:
+                award_mock_client_xp(scenario, evaluation, len(session["mock_chat"]))
+
     return render_template(
         "student/mock_client.html", 
         chat=session.get("mock_chat", []),
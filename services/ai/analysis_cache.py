@@ -0,0 +1,91 @@
+# services/ai/analysis_cache.py
+
+import os
+import copy
+import json
+import hashlib
+from config import Config
+from services.cache import LRUCache, SQLiteCache
+from services.ai.document_analyzer import PROMPT_VERSION, MODEL_NAME
+
+# Entries are tagged with the prompt/model they were produced under, so a
+# prompt edit, model switch or analysis mode change never serves stale
+# analyses.
+ANALYSIS_MODE = "long" if Config.LONG_DOCUMENT_ANALYSIS else "short"
+CACHE_VERSION = f"{PROMPT_VERSION}:{MODEL_NAME}:{ANALYSIS_MODE}"
+
+_memory = LRUCache(
+    max_items=Config.ANALYSIS_CACHE_MEMORY_ITEMS,
+    ttl_seconds=Config.ANALYSIS_CACHE_TTL_SECONDS
+)
+_disk = SQLiteCache(
+    os.path.join(Config.CACHE_DIR, "analysis_cache.sqlite3"),
+    max_bytes=Config.ANALYSIS_CACHE_MAX_BYTES,
+    ttl_seconds=Config.ANALYSIS_CACHE_TTL_SECONDS
+)
+
+# Drop results produced by older prompts/models on startup
+_stale = _disk.delete_tag_not_in([CACHE_VERSION])
+if _stale:
+    print(f"🧹 Dropped {_stale} cached analyses from an older prompt version")
+
+
+def cache_key(content_hash: str) -> str:
+    """Cache key for a document: content hash + prompt version + model name."""
+    return hashlib.sha256(f"{content_hash}:{CACHE_VERSION}".encode("utf-8")).hexdigest()
+
+
+def get_cached_analysis(content_hash: str):
+    """
+    Look up a previous analysis of the same document bytes.
+
+    Args:
+        content_hash: SHA-256 hex digest of the uploaded bytes
+
+    Returns:
+        dict with "text" and "result", or None on a miss
+    """
+    key = cache_key(content_hash)
+    entry = _memory.get(key)
+    if entry is not None:
+        # Callers may annotate the result; never hand out the cached object
+        return copy.deepcopy(entry)
+
+    row = _disk.get(key)
+    if row is None:
+        return None
+
+    value, tag = row
+    if tag != CACHE_VERSION:
+        _disk.delete(key)
+        return None
+
+    entry = json.loads(value.decode("utf-8"))
+    _memory.set(key, copy.deepcopy(entry))
+    return entry
+
+
+def set_cached_analysis(content_hash: str, text: str, result: dict):
+    """Store a successful analysis in both cache tiers."""
+    if "error" in result:
+        return
+
+    key = cache_key(content_hash)
+    entry = {"text": text, "result": copy.deepcopy(result)}
+    _memory.set(key, entry)
+    _disk.set(key, json.dumps(entry).encode("utf-8"), tag=CACHE_VERSION)
+
+
+def invalidate_all():
+    """Drop every cached analysis (e.g. after a prompt change in a live process)."""
+    _memory.clear()
+    _disk.clear()
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters and sizes for both tiers."""
+    return {
+        "version": CACHE_VERSION,
+        "memory": _memory.stats(),
+        "disk": _disk.stats(),
+    }
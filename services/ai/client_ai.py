@@ -1,16 +1,12 @@
-import os
-import google.generativeai as genai
-
-# Initialize Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-model = genai.GenerativeModel("gemini-2.0-flash-exp")
+from services.ai.gemini_client import gemini, CLIENT_REPLY
+from services.ai.conversation_context import build_context
 
 
 def get_client_reply(conversation_history, student_question, scenario_context=None):
     """
     Generates a client-style reply using Gemini,
     while preserving conversation context and using dynamic scenario.
+    Only recent turns are sent verbatim; older ones as a rolling summary.
     """
     
     # Default scenario if none provided (Fallback)
@@ -54,17 +50,20 @@ STYLE:
 Remember: You are a CLIENT, not an advisor.
 """.strip() + "\n\n"
 
-    if conversation_history:
-        prompt += "Conversation so far:\n"
-        for turn in conversation_history:
+    summary, recent_turns = build_context(conversation_history, scenario_context, scenario_role)
+    if summary:
+        prompt += f"What you have told the student earlier (stay consistent with it):\n{summary}\n\n"
+
+    if recent_turns:
+        prompt += "Conversation so far:\n" if not summary else "Most recent conversation:\n"
+        for turn in recent_turns:
             prompt += f"Student: {turn['question']}\n"
             prompt += f"Client: {turn['reply']}\n"
 
     prompt += f"\nStudent: {student_question}\nClient:"
 
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return gemini.generate(prompt, name="client_ai", priority=CLIENT_REPLY).strip()
     except Exception as e:
         print(f"Error generating client reply: {e}")
         return "I... I'm not sure what to say about that. Can you explain?"
@@ -0,0 +1,137 @@
+# services/ai/conversation_context.py
+"""
+Bounded conversation context for the mock client.
+
+Only the last ``MOCK_CLIENT_CONTEXT_TURNS`` turns are sent verbatim; older
+turns are folded into a rolling summary of what the client has said so
+far, so the reply prompt stays the same size however long the interview
+runs.
+
+Summaries are produced in the background (at the lowest Gemini priority)
+and cached by a chained hash of the turns they cover, so each session's
+summary is found again on the next turn without storing it in the cookie
+session. A turn never waits for a summary: until the summary catches up,
+the few not-yet-summarized turns are sent verbatim instead.
+"""
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from services.cache import LRUCache
+from services.ai.gemini_client import gemini, PROGRESS
+
+CONTEXT_TURNS = Config.MOCK_CLIENT_CONTEXT_TURNS
+# Older turns not yet covered by a summary that are still sent verbatim
+MAX_UNSUMMARIZED_TURNS = CONTEXT_TURNS
+SUMMARY_MAX_WORDS = 150
+
+SUMMARY_PROMPT = """
+You are keeping notes for a role-play in which a law student interviews a
+simulated legal client ({role}).
+
+Update the notes with the new exchanges below. Record, as short plain
+sentences written about the client:
+- every fact the client has stated (names, dates, amounts, documents, events)
+- what the client said they do not know or are unsure about
+- the client's emotional state and way of speaking
+- which topics the student has already asked about
+
+Never add facts the client did not state. Keep the notes under {max_words} words.
+
+CURRENT NOTES:
+{summary}
+
+NEW EXCHANGES:
+{turns}
+
+UPDATED NOTES:
+""".strip()
+
+_summaries = LRUCache(max_items=Config.MOCK_CLIENT_SUMMARY_CACHE_ITEMS, ttl_seconds=24 * 3600)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def _prefix_keys(scenario_context, history) -> list:
+    """keys[k] identifies the scenario plus the first k turns."""
+    digest = hashlib.blake2b(repr(sorted((scenario_context or {}).items())).encode("utf-8"), digest_size=16)
+    keys = [digest.hexdigest()]
+    for turn in history:
+        digest.update(f"\x00{turn['question']}\x01{turn['reply']}".encode("utf-8"))
+        keys.append(digest.copy().hexdigest())
+    return keys
+
+
+def _format_turns(turns) -> str:
+    return "".join(f"Student: {t['question']}\nClient: {t['reply']}\n" for t in turns)
+
+
+def _summarize(role, summary, turns, key):
+    try:
+        prompt = SUMMARY_PROMPT.format(
+            role=role,
+            max_words=SUMMARY_MAX_WORDS,
+            summary=summary or "(none yet)",
+            turns=_format_turns(turns)
+        )
+        text = gemini.generate(prompt, name="client_summary", priority=PROGRESS).strip()
+        if text:
+            _summaries.set(key, text)
+    except Exception as e:
+        # The older turns stay verbatim until a later summary succeeds
+        print(f"⚠️ Conversation summary failed: {e}")
+    finally:
+        with _scheduled_lock:
+            _scheduled.discard(key)
+
+
+def _schedule(role, summary, turns, key):
+    with _scheduled_lock:
+        if key in _scheduled:
+            return
+        _scheduled.add(key)
+    _executor.submit(_summarize, role, summary, turns, key)
+
+
+def build_context(conversation_history, scenario_context=None, role="Client"):
+    """
+    Bounded context for the next client reply.
+
+    Args:
+        conversation_history: All previous turns ({"question", "reply"} dicts)
+        scenario_context: Current scenario dict (part of the summary key)
+        role: The client's role, for the summary prompt
+
+    Returns:
+        (summary, turns): the rolling summary of older turns (or None) and
+        the turns to include verbatim
+    """
+    history = list(conversation_history or [])
+    older = len(history) - CONTEXT_TURNS
+    if older <= 0:
+        return None, history
+
+    # Longest prefix of the older turns that already has a summary
+    keys = _prefix_keys(scenario_context, history)
+    covered, summary = 0, None
+    for k in range(older, 0, -1):
+        summary = _summaries.get(keys[k])
+        if summary is not None:
+            covered = k
+            break
+
+    if covered < older:
+        # Fold the rest in the background for the next turn
+        _schedule(role, summary, history[covered:older], keys[older])
+
+    start = max(covered, older - MAX_UNSUMMARIZED_TURNS)
+    return summary, history[start:]
+
+
+def summary_stats() -> dict:
+    with _scheduled_lock:
+        pending = len(_scheduled)
+    return {**_summaries.stats(), "pending_summaries": pending}
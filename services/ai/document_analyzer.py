@@ -1,19 +1,20 @@
 # services/ai/document_analyzer.py
 
-import os
+import re
 import json
-import google.generativeai as genai
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from services.ai.json_stream import IncrementalJsonParser
+from services.ai.gemini_client import gemini, MODEL_NAME, ANALYSIS
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-# Configure model with JSON response mode
-model = genai.GenerativeModel(
-    "gemini-2.0-flash-exp",
-    generation_config={
-        "response_mime_type": "application/json",
-        "temperature": 0.3,
-    }
-)
+# JSON response mode
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "temperature": 0.3,
+}
 
 PROMPT = """
 You are a legal document analysis assistant for educational purposes only.
@@ -51,47 +52,106 @@ Example suggestion formats:
 ✗ "Negotiate for better terms." (legal advice)
 """
 
+# Characters of document text sent to Gemini (approximately 10k chars = ~2500 tokens)
+MAX_ANALYSIS_CHARS = 10000
+
+# Long-document mode: total characters analyzed and concurrent Gemini calls
+LONG_DOCUMENT_MAX_CHARS = Config.LONG_DOCUMENT_MAX_CHARS
+MAX_CONCURRENT_CHUNKS = Config.LONG_DOCUMENT_CONCURRENCY
+MAX_MERGED_RISK_DRIVERS = 6
+
+# Changes whenever the prompt text changes; used to version cached results
+PROMPT_VERSION = hashlib.sha256(PROMPT.encode("utf-8")).hexdigest()[:16]
+
+
+VALID_RISKS = ("Low", "Medium", "High")
+
+
+def _publish_partial(on_event, key, index, value):
+    """Forward a streamed field or array element as a progress event."""
+    if key == "clauses" and index is not None and isinstance(value, dict):
+        if value.get("risk") not in VALID_RISKS:
+            value["risk"] = "Medium"  # Default fallback
+        on_event("clause", value)
+    elif key == "risk_drivers" and index is not None:
+        on_event("risk_driver", value)
+    elif key == "overall_risk":
+        on_event(key, value if value in VALID_RISKS else "Medium")
+    elif key in ("document_type", "summary") and index is None:
+        on_event(key, value)
+
+
+def _generate_analysis(document_text: str, context: str = "", on_event=None) -> dict:
+    """
+    Run one Gemini analysis call and validate the result schema.
+
+    Args:
+        document_text: Text to analyze
+        context: Extra prompt context (e.g. which part of a document this is)
+        on_event: Optional callback ``on_event(name, value)``; if given, the
+            response is streamed and document_type, summary, overall_risk,
+            each risk driver and each clause are passed to it as soon as
+            they are complete
 
-def analyze_document(text: str) -> dict:
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+        ValueError: If a required field is missing
+    """
+    prompt = PROMPT + context + "\n\nDOCUMENT TEXT:\n" + document_text
+
+    # Generate analysis with JSON mode
+    if on_event is None:
+        raw = gemini.generate(prompt, name="document_analyzer", priority=ANALYSIS,
+                              generation_config=GENERATION_CONFIG)
+    else:
+        parser = IncrementalJsonParser()
+        stream = gemini.generate_stream(prompt, name="document_analyzer", priority=ANALYSIS,
+                                        generation_config=GENERATION_CONFIG)
+        for text in stream:
+            for key, index, value in parser.feed(text):
+                _publish_partial(on_event, key, index, value)
+        raw = parser.text
+
+    # Parse JSON response
+    result = json.loads(raw)
+
+    # Validate required fields
+    required_fields = ["document_type", "summary", "overall_risk", "risk_drivers", "clauses"]
+    for field in required_fields:
+        if field not in result:
+            raise ValueError(f"Missing required field: {field}")
+
+    # Validate risk levels
+    if result["overall_risk"] not in VALID_RISKS:
+        result["overall_risk"] = "Medium"  # Default fallback
+
+    for clause in result.get("clauses", []):
+        if clause.get("risk") not in VALID_RISKS:
+            clause["risk"] = "Medium"  # Default fallback
+
+    return result
+
+
+def analyze_document(text: str, on_event=None) -> dict:
     """
     Analyze a legal document using Gemini AI.
     
     Args:
         text: Extracted document text
+        on_event: Optional callback for streamed partial results (see
+            _generate_analysis)
         
     Returns:
         dict: Structured analysis with document_type, summary, risks, and clauses
     """
-    # Limit text to avoid token limits (approximately 10k chars = ~2500 tokens)
-    truncated_text = text[:10000]
+    # Limit text to avoid token limits
+    truncated_text = text[:MAX_ANALYSIS_CHARS]
     
-    if len(text) > 10000:
-        print(f"⚠️ Document truncated from {len(text)} to 10000 characters for analysis")
+    if len(text) > MAX_ANALYSIS_CHARS:
+        print(f"⚠️ Document truncated from {len(text)} to {MAX_ANALYSIS_CHARS} characters for analysis")
     
     try:
-        # Generate analysis with JSON mode
-        response = model.generate_content(
-            PROMPT + "\n\nDOCUMENT TEXT:\n" + truncated_text
-        )
-        
-        # Parse JSON response
-        result = json.loads(response.text)
-        
-        # Validate required fields
-        required_fields = ["document_type", "summary", "overall_risk", "risk_drivers", "clauses"]
-        for field in required_fields:
-            if field not in result:
-                raise ValueError(f"Missing required field: {field}")
-        
-        # Validate risk levels
-        valid_risks = {"Low", "Medium", "High"}
-        if result["overall_risk"] not in valid_risks:
-            result["overall_risk"] = "Medium"  # Default fallback
-        
-        for clause in result.get("clauses", []):
-            if clause.get("risk") not in valid_risks:
-                clause["risk"] = "Medium"  # Default fallback
-        
+        result = _generate_analysis(truncated_text, on_event=on_event)
         print(f"✅ Analysis complete: {result['document_type']} - {result['overall_risk']} risk")
         return result
         
@@ -116,3 +176,271 @@ def analyze_document(text: str) -> dict:
             "risk_drivers": ["Analysis error occurred"],
             "clauses": []
         }
+
+
+PARTS_SUMMARY_PROMPT = """
+You are a legal document analysis assistant for educational purposes only.
+
+You are given parts of ONE legal document, in document order, separated by "---".
+A part is a summary of a section, the text of a section, or the summary of an
+earlier version of the document; later parts take precedence where they differ.
+
+Return a JSON object describing the WHOLE document:
+
+{
+  "document_type": "string (e.g., 'Rental Agreement', 'Employment Contract', 'NDA')",
+  "summary": "string (5-6 sentences summarizing the document's purpose and key terms)"
+}
+
+Mention the key terms from every part (amounts, dates, notice periods, parties).
+Do not provide legal advice.
+"""
+
+PART_SEPARATOR = "\n\n---\n\n"
+
+
+def summarize_parts(parts: list) -> dict:
+    """
+    Document type and summary of a whole document from parts of it, e.g.
+    its section summaries; the call is sized by the parts, not the document.
+
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+        ValueError: If a required field is missing
+    """
+    prompt = PARTS_SUMMARY_PROMPT + "\n\nDOCUMENT TEXT:\n" + PART_SEPARATOR.join(parts)[:MAX_ANALYSIS_CHARS]
+    result = json.loads(gemini.generate(prompt, name="parts_summary", priority=ANALYSIS,
+                                        generation_config=GENERATION_CONFIG))
+    for field in ("document_type", "summary"):
+        if not isinstance(result.get(field), str) or not result[field].strip():
+            raise ValueError(f"Missing required field: {field}")
+    return {"document_type": result["document_type"], "summary": result["summary"]}
+
+
+# ===============================
+# Long-document (map-reduce) mode
+# ===============================
+
+# Lines that start a new clause/section: "1.", "2.3", "(a)", "Section 4",
+# "ARTICLE IV", "Clause 7", or a short ALL-CAPS heading
+SECTION_BOUNDARY = re.compile(
+    r"^\s*(?:"
+    r"\d+(?:\.\d+)*[.)]\s"
+    r"|\([a-z0-9]{1,4}\)\s"
+    r"|(?:section|article|clause|schedule|annex(?:ure)?|exhibit)\s+[\dIVXLC]+"
+    r"|[A-Z][A-Z0-9 ,&'-]{3,60}$"
+    r")",
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def split_into_chunks(text: str, max_chars: int = MAX_ANALYSIS_CHARS) -> list:
+    """
+    Split a document into chunks of at most ``max_chars`` characters,
+    cutting on clause/section boundaries where possible.
+
+    Sections are packed greedily into chunks; a single section longer than
+    ``max_chars`` is split on paragraph, then line, boundaries.
+    """
+    starts = sorted({0, *(m.start() for m in SECTION_BOUNDARY.finditer(text))})
+    sections = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+
+    pieces = []
+    for section in sections:
+        while len(section) > max_chars:
+            cut = section.rfind("\n\n", 0, max_chars)
+            if cut <= 0:
+                cut = section.rfind("\n", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(section[:cut])
+            section = section[cut:]
+        pieces.append(section)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current.strip():
+        chunks.append(current)
+    return [c for c in chunks if c.strip()]
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+class ClauseDeduplicator:
+    """Drops clauses already seen: same excerpt, or same title with the same excerpt start."""
+
+    def __init__(self):
+        self._seen_text = set()
+        self._seen_title = {}
+        self._lock = threading.Lock()
+
+    def add(self, clause: dict) -> bool:
+        """True if the clause is new (and remember it)."""
+        text_key = _normalize(clause.get("text", ""))
+        title_key = _normalize(clause.get("title", ""))
+        with self._lock:
+            if text_key and text_key in self._seen_text:
+                return False
+            if title_key in self._seen_title and self._seen_title[title_key][:60] == text_key[:60]:
+                return False
+            self._seen_text.add(text_key)
+            self._seen_title[title_key] = text_key
+            return True
+
+
+def merge_analyses(results: list) -> dict:
+    """
+    Reduce per-chunk analyses into one result with the standard schema.
+
+    - document_type: most common non-"Unknown" answer
+    - summary: one summary pass over the chunk summaries (summarize_parts),
+      so terms from every section reach it; if that call fails, the chunk
+      summaries in document order
+    - overall_risk: the highest chunk risk
+    - risk_drivers / clauses: concatenated in document order, deduplicated
+    """
+    types = [r["document_type"] for r in results if r.get("document_type") not in (None, "", "Unknown")]
+    document_type = Counter(types).most_common(1)[0][0] if types else "Unknown"
+
+    overall_risk = max((r["overall_risk"] for r in results), key=VALID_RISKS.index)
+
+    risk_drivers, seen_drivers = [], set()
+    # Drivers from the riskiest chunks first
+    for r in sorted(results, key=lambda r: -VALID_RISKS.index(r["overall_risk"])):
+        for driver in r.get("risk_drivers", []):
+            key = _normalize(driver)
+            if key not in seen_drivers:
+                seen_drivers.add(key)
+                risk_drivers.append(driver)
+
+    deduplicator = ClauseDeduplicator()
+    clauses = [c for r in results for c in r.get("clauses", []) if deduplicator.add(c)]
+
+    section_summaries = [r["summary"] for r in results]
+    if len(results) > 1:
+        try:
+            summary = summarize_parts(section_summaries)["summary"]
+        except Exception as e:
+            print(f"⚠️ Merged summary failed, joining section summaries: {e}")
+            summary = " ".join(section_summaries)
+    else:
+        summary = section_summaries[0]
+
+    return {
+        "document_type": document_type,
+        "summary": summary,
+        "overall_risk": overall_risk,
+        "risk_drivers": risk_drivers[:MAX_MERGED_RISK_DRIVERS],
+        "clauses": clauses,
+        "sections_analyzed": len(results)
+    }
+
+
+def analyze_chunks(chunks: list, context, on_event=None) -> list:
+    """
+    Analyze text chunks concurrently (at most MAX_CONCURRENT_CHUNKS at once).
+    Chunks that fail are retried once.
+
+    Args:
+        chunks: Text chunks, each at most MAX_ANALYSIS_CHARS long
+        context: ``context(index, total)`` -> prompt context for a chunk
+        on_event: Optional callback; receives each streamed clause (clauses
+            already sent for another chunk are skipped) and a "section"
+            event per finished chunk
+
+    Returns:
+        list of per-chunk results in chunk order, None for chunks that failed
+    """
+    finished = []
+    finished_lock = threading.Lock()
+    deduplicator = ClauseDeduplicator()
+
+    def forward_clauses(name, value):
+        if name == "clause" and deduplicator.add(value):
+            on_event(name, value)
+
+    def analyze_chunk(index, final_attempt):
+        result = None
+        try:
+            result = _generate_analysis(chunks[index], context(index, len(chunks)),
+                                        on_event=forward_clauses if on_event else None)
+            return result
+        except Exception as e:
+            print(f"⚠️ Section {index + 1}/{len(chunks)} analysis failed: {e}")
+            return None
+        finally:
+            # A section is finished once it succeeded or failed its retry
+            if on_event and (result is not None or final_attempt):
+                with finished_lock:
+                    finished.append(index)
+                    done = len(finished)
+                on_event("section", {"done": done, "total": len(chunks)})
+
+    results = [None] * len(chunks)
+    pending = list(range(len(chunks)))
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_CHUNKS, len(chunks))) as executor:
+        for attempt in range(2):
+            for index, result in zip(pending, executor.map(analyze_chunk, pending, [attempt == 1] * len(pending))):
+                results[index] = result
+            pending = [index for index in pending if results[index] is None]
+            if not pending:
+                break
+            if attempt == 0:
+                print(f"🔁 Retrying {len(pending)} failed section(s)")
+    return results
+
+
+def analyze_long_document(text: str, on_event=None) -> dict:
+    """
+    Analyze a document of any length.
+
+    Short documents take the single-call path. Longer ones are split on
+    section boundaries and the chunks are analyzed concurrently (at most
+    MAX_CONCURRENT_CHUNKS at once), so latency tracks the slowest chunk
+    rather than the document length. Results are merged into the same
+    schema as analyze_document.
+
+    With ``on_event``, sections stream their clauses as they are generated
+    and a "section" event reports each finished section; the merged
+    summary and risk only exist once all sections are done.
+
+    Failed sections are retried once; if some still fail, the merged
+    result of the others carries ``sections_failed``.
+    """
+    if len(text) <= MAX_ANALYSIS_CHARS:
+        return analyze_document(text, on_event=on_event)
+
+    chunks = split_into_chunks(text, MAX_ANALYSIS_CHARS)
+    print(f"📚 Long document: analyzing {len(text)} characters in {len(chunks)} sections")
+
+    results = analyze_chunks(
+        chunks,
+        lambda index, total: f"\n\nThis is part {index + 1} of {total} of a longer document. Analyze only this part.",
+        on_event=on_event
+    )
+    failed = sum(1 for r in results if r is None)
+    results = [r for r in results if r is not None]
+
+    if not results:
+        return {
+            "error": "All document sections failed to analyze",
+            "document_type": "Unknown",
+            "summary": "An error occurred during analysis. Please try again.",
+            "overall_risk": "Medium",
+            "risk_drivers": ["Analysis error occurred"],
+            "clauses": []
+        }
+
+    result = merge_analyses(results)
+    if failed:
+        # Incomplete: shown to the user, but never cached (see document_pipeline)
+        result["sections_failed"] = failed
+    print(f"✅ Analysis complete: {result['document_type']} - {result['overall_risk']} risk ({len(results)}/{len(chunks)} sections)")
+    return result
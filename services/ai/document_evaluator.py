@@ -1,10 +1,32 @@
 # services/ai/document_evaluator.py
 
-import os
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
+from services.ai.gemini_client import gemini, EVALUATION
+from services.ai.local_scorer import score_document, use_llm, tier_stats
+
+_calibration = ThreadPoolExecutor(max_workers=1, thread_name_prefix="document-sample")
+
+
+def assign_grade(total_score: int) -> str:
+    if total_score >= 90:
+        return "A+"
+    elif total_score >= 85:
+        return "A"
+    elif total_score >= 80:
+        return "A-"
+    elif total_score >= 75:
+        return "B+"
+    elif total_score >= 70:
+        return "B"
+    elif total_score >= 65:
+        return "B-"
+    elif total_score >= 60:
+        return "C+"
+    elif total_score >= 55:
+        return "C"
+    else:
+        return "Needs Improvement"
 
-# Initialize Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 def evaluate_document(document_text: str, document_type: str = "Legal Document") -> dict:
     """
@@ -14,6 +36,9 @@ def evaluate_document(document_text: str, document_type: str = "Legal Document")
     - Clarity (structure, language, readability)
     - Relevance (legal accuracy, appropriate content)
     - Ethics (ethical compliance, professional standards)
+
+    In the tiered mode the local score is returned unless it is borderline
+    (or sampled); it also replaces Gemini whenever Gemini is unavailable.
     """
     
     if not document_text or len(document_text.strip()) < 50:
@@ -30,7 +55,36 @@ def evaluate_document(document_text: str, document_type: str = "Legal Document")
             "suggestions": ["Write at least 50 characters to receive evaluation."],
             "grade": "Incomplete"
         }
-    
+
+    local = score_document(document_text, document_type)
+    tier = use_llm(local)
+    local.pop("borderline")
+    local["grade"] = assign_grade(local["total_score"])
+
+    if tier == "sample":
+        _calibration.submit(_calibrate, document_text, document_type, local)
+    if tier != "llm":
+        tier_stats.record("document", "local")
+        return local
+
+    result = _evaluate_with_llm(document_text, document_type)
+    if result is None:
+        tier_stats.record("document", "fallback")
+        return local
+
+    tier_stats.record("document", "llm")
+    return result
+
+
+def _calibrate(document_text, document_type, local):
+    """Background Gemini evaluation of a sampled document, to track agreement."""
+    result = _evaluate_with_llm(document_text, document_type)
+    if result is not None:
+        tier_stats.compare(abs(result["total_score"] - local["total_score"]) <= 10)
+
+
+def _evaluate_with_llm(document_text: str, document_type: str):
+    """Gemini evaluation of a document, or None if it failed."""
     prompt = f"""You are an expert legal educator evaluating a law student's drafted document.
 
 Document Type: {document_type}
@@ -74,12 +128,10 @@ Respond in JSON format:
 Be constructive and educational in your feedback."""
 
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash-exp")
-        response = model.generate_content(prompt)
+        text = gemini.generate(prompt, name="document_evaluator", priority=EVALUATION).strip()
         
         # safe JSON parsing
         import json
-        text = response.text.strip()
         if text.startswith("```json"):
             text = text[7:-3].strip()
         elif text.startswith("```"):
@@ -95,43 +147,11 @@ Be constructive and educational in your feedback."""
         # Calculate total score and grade
         total_score = round((result["clarity_score"] + result["relevance_score"] + result["ethics_score"]) / 3)
         result["total_score"] = total_score
-        
-        # Assign grade
-        if total_score >= 90:
-            result["grade"] = "A+"
-        elif total_score >= 85:
-            result["grade"] = "A"
-        elif total_score >= 80:
-            result["grade"] = "A-"
-        elif total_score >= 75:
-            result["grade"] = "B+"
-        elif total_score >= 70:
-            result["grade"] = "B"
-        elif total_score >= 65:
-            result["grade"] = "B-"
-        elif total_score >= 60:
-            result["grade"] = "C+"
-        elif total_score >= 55:
-            result["grade"] = "C"
-        else:
-            result["grade"] = "Needs Improvement"
+        result["grade"] = assign_grade(total_score)
         
         return result
         
     except Exception as e:
+        # The caller falls back to the local score
         print(f"Error evaluating document: {e}")
-        return {
-            "clarity_score": 50,
-            "relevance_score": 50,
-            "ethics_score": 50,
-            "total_score": 50,
-            "grade": "C",
-            "feedback": {
-                "clarity": "Unable to evaluate at this time.",
-                "relevance": "Please try again.",
-                "ethics": "Evaluation service temporarily unavailable."
-            },
-            "suggestions": ["Ensure your document is well-formatted and try again."],
-            "strengths": ["Document submitted successfully."],
-            "overall_comment": "Technical error occurred during evaluation."
-        }
+        return None
@@ -1,43 +1,162 @@
 import json
-import os
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 
-# Initialize Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from config import Config
+from services.ai.prompts.evaluation_prompt import EVALUATION_PROMPT, BATCH_EVALUATION_PROMPT
+from services.ai.gemini_client import gemini, EVALUATION
+from services.ai.question_cache import question_cache, normalize_question
+from services.ai.local_scorer import score_question, ethics_guard, use_llm, tier_stats
+from services.micro_batcher import MicroBatcher
 
-from services.ai.prompts.evaluation_prompt import EVALUATION_PROMPT
+EVALUATION_FIELDS = ("clarity", "relevance", "ethics", "feedback")
 
-model = genai.GenerativeModel("gemini-2.0-flash-exp")
+# Shown when a question could not be evaluated at all
+FALLBACK_EVALUATION = {
+    "clarity": "Average",
+    "relevance": "Medium",
+    "ethics": "Safe",
+    "total_score": 50,
+    "feedback": "Try to ask clearer, more specific questions to understand the client's situation better."
+}
+BATCH_GENERATION_CONFIG = {"response_mime_type": "application/json"}
 
 
-def evaluate_student_question(student_question):
-    """
-    Evaluates the quality of a student's question.
-    Returns structured educational feedback.
-    """
+def _parse_json(text):
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:-3].strip()
+    elif text.startswith("```"):
+        text = text[3:-3].strip()
+    return json.loads(text)
+
 
+def _evaluate_one(student_question):
     prompt = (
         EVALUATION_PROMPT.strip()
         + "\n\nStudent Question:\n"
         + student_question
         + "\n\nEvaluation:"
     )
+    return _parse_json(gemini.generate(prompt, name="evaluator_ai", priority=EVALUATION))
+
+
+def _evaluate_batch(questions):
+    """
+    Evaluate several questions with one Gemini call.
+
+    Returns:
+        list of evaluation dicts (or exceptions, for questions the batch
+        response left out or malformed) in the order of ``questions``
+    """
+    # Students often ask the same thing: send each distinct question once
+    ids, items = {}, []
+    for question in questions:
+        key = normalize_question(question)
+        if key not in ids:
+            ids[key] = f"q{len(items) + 1}"
+            items.append({"id": ids[key], "question": question})
+
+    if len(items) == 1:
+        evaluation = _evaluate_one(items[0]["question"])
+        return [evaluation] * len(questions)
+
+    prompt = (
+        BATCH_EVALUATION_PROMPT.strip()
+        + "\n\nStudent Questions:\n"
+        + json.dumps(items, ensure_ascii=False, indent=1)
+        + "\n\nEvaluations:"
+    )
+    response = _parse_json(gemini.generate(
+        prompt, name="evaluator_ai_batch", priority=EVALUATION, generation_config=BATCH_GENERATION_CONFIG
+    ))
+
+    by_id = {}
+    for entry in response if isinstance(response, list) else []:
+        if isinstance(entry, dict) and all(field in entry for field in EVALUATION_FIELDS):
+            by_id[entry.get("id")] = {field: entry[field] for field in entry if field != "id"}
+
+    results = []
+    for question in questions:
+        evaluation = by_id.get(ids[normalize_question(question)])
+        results.append(evaluation if evaluation is not None else ValueError("missing from batch response"))
+    return results
+
 
-    response = model.generate_content(prompt)
+# Concurrent evaluations (across all sessions) share the rubric in one request
+evaluation_batcher = MicroBatcher(
+    _evaluate_batch,
+    max_batch=Config.EVALUATION_BATCH_MAX_ITEMS,
+    max_wait_seconds=Config.EVALUATION_BATCH_WAIT_MS / 1000,
+    workers=Config.EVALUATION_BATCH_WORKERS,
+    name="evaluation-batch"
+)
+
+
+def _evaluate_with_llm(student_question, local):
+    """Gemini evaluation (cached, micro-batched), or None if it failed."""
+    # A near-duplicate must share the ethics-relevant phrases, and its cached
+    # ethics verdict must agree with this question's local one
+    guard = ethics_guard(student_question, local)
+    cached = question_cache.get(
+        student_question, guard=guard, accept=lambda cached: cached.get("ethics") == local["ethics"]
+    )
+    if cached is not None:
+        return cached
 
     try:
-        text = response.text.strip()
-        if text.startswith("```json"):
-            text = text[7:-3].strip()
-        elif text.startswith("```"):
-            text = text[3:-3].strip()
-        return json.loads(text)
-    except Exception:
+        if Config.EVALUATION_BATCHING:
+            evaluation = evaluation_batcher.submit(student_question)
+            if isinstance(evaluation, Exception):
+                # Left out of its batch: ask on its own
+                evaluation = _evaluate_one(student_question)
+        else:
+            evaluation = _evaluate_one(student_question)
+        question_cache.set(student_question, evaluation, guard=guard)
+        return evaluation
+    except Exception as e:
+        print(f"⚠️ Question evaluation failed, using local score: {e}")
+        return None
+
+
+def _calibrate(student_question, local):
+    """Background Gemini evaluation of a sampled question, to track agreement."""
+    evaluation = _evaluate_with_llm(student_question, local)
+    if evaluation is not None:
+        tier_stats.compare(all(evaluation.get(f) == local[f] for f in ("clarity", "relevance", "ethics")))
+
+
+_calibration = ThreadPoolExecutor(max_workers=1, thread_name_prefix="evaluation-sample")
+
+
+def evaluate_student_question(student_question, scenario_context=None):
+    """
+    Evaluates the quality of a student's question.
+    Returns structured educational feedback.
+    Repeated and near-duplicate questions are served from the question cache;
+    concurrent questions are evaluated together in micro-batches. In the
+    tiered mode only borderline (or sampled) questions go to Gemini, and the
+    local score is used whenever Gemini is unavailable.
+    """
+
+    local = score_question(student_question, scenario_context)
+    tier = use_llm(local)
+    local.pop("borderline")
+
+    if tier == "sample":
+        _calibration.submit(_calibrate, student_question, local)
+    if tier != "llm":
+        tier_stats.record("question", "local")
+        return local
+
+    evaluation = _evaluate_with_llm(student_question, local)
+    if evaluation is None:
         # Safe fallback (never break the app)
-        return {
-            "clarity": "Average",
-            "relevance": "Medium",
-            "ethics": "Safe",
-            "total_score": 50,
-            "feedback": "Try to ask clearer, more specific questions to understand the client's situation better."
-        }
+        tier_stats.record("question", "fallback")
+        return local
+
+    tier_stats.record("question", "llm")
+    if Config.EVALUATION_MODE != "tiered":
+        return evaluation
+    # The rubric has no overall score; in the tiered mode XP uses the local
+    # one, so borderline questions score on the same scale as the rest
+    return {"total_score": local["total_score"], **evaluation}
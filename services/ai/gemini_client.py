@@ -1,39 +1,408 @@
-import google.generativeai as genai
+# services/ai/gemini_client.py
+"""
+Shared Gemini client.
+
+Every AI module calls Gemini through this one layer:
+
+- the API key is configured once and models are built once per
+  (model, generation config) and reused, so calls share the SDK's
+  underlying connection instead of building clients per request
+- each call has a deadline that also bounds its retries
+- retryable errors (rate limits, 5xx, timeouts, dropped connections) are
+  retried with jittered exponential backoff
+- a circuit breaker fails fast while Gemini is down, instead of tying up
+  request threads on calls that will time out
+- a process-wide governor (services/ai/gemini_governor.py) admits calls
+  by priority class under a shared rate and in-flight limit
+- identical concurrent requests (same model settings and whitespace-
+  normalized prompt) share one in-flight call or stream
+- per-caller latency and error counters are kept for /document/gemini/stats
+- with AI_BACKEND=simulated/record, models come from services/ai/simulator.py
+"""
+
 import os
 import json
+import hashlib
+import time
+import random
+import threading
+from collections import deque
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+from config import Config
+from services.singleflight import SingleFlight
+from services.ai.simulator import simulator, SIMULATED, RECORD
+from services.ai.gemini_governor import (
+    Governor, GeminiThrottledError, ANALYSIS, CLIENT_REPLY, EVALUATION, PROGRESS
+)
 
-# Configure Gemini API
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+MODEL_NAME = Config.GEMINI_MODEL_NAME
+
+RETRYABLE_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.GatewayTimeout,
+    api_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+)
+
+RATE_LIMIT_ERRORS = (api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted)
+
+# Latency samples kept per caller for percentiles
+_LATENCY_WINDOW = 512
+
+
+class GeminiUnavailableError(Exception):
+    """Raised without calling Gemini while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures; after ``cooldown_seconds``
+    lets a single trial call through (half-open), which closes it again on
+    success or re-opens it on failure.
+    """
+
+    def __init__(self, threshold=5, cooldown_seconds=30.0):
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown_seconds:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    print(f"🔌 Gemini circuit breaker opened after {self.failures} failure(s)")
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class _CallStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.latencies = deque(maxlen=_LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency=None, error=False, retry=False, rejected=False, throttled=False):
+        with self._lock:
+            if retry:
+                self.retries += 1
+            elif throttled:
+                self.throttled += 1
+            elif rejected:
+                self.rejected += 1
+            else:
+                self.calls += 1
+                self.errors += int(error)
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def to_dict(self):
+        with self._lock:
+            samples = sorted(self.latencies)
+
+        def pct(p):
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000, 1)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+        }
+
+
+class GeminiClient:
+    """Pooled, deadline-bounded, retrying Gemini caller (see module docstring)."""
+
+    def __init__(self, model_name=MODEL_NAME, timeout_seconds=60.0, max_retries=3,
+                 retry_base_seconds=0.5, retry_max_seconds=8.0, breaker=None, governor=None):
+        self.model_name = model_name
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self.governor = governor or Governor()
+        self._models = {}
+        self._stats = {}
+        self._flights = SingleFlight("gemini")
+        self._lock = threading.Lock()
+
+    def model(self, model_name=None, generation_config=None):
+        """Shared GenerativeModel for a model name and generation config."""
+        model_name = model_name or self.model_name
+        key = (model_name, json.dumps(generation_config, sort_keys=True))
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                if Config.AI_BACKEND == SIMULATED:
+                    model = simulator.model(model_name, generation_config)
+                else:
+                    model = genai.GenerativeModel(model_name, generation_config=generation_config)
+                    if Config.AI_BACKEND == RECORD:
+                        model = simulator.recording_model(model, model_name, generation_config)
+                self._models[key] = model
+            return model
+
+    def _caller_stats(self, name) -> _CallStats:
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _CallStats()
+            return stats
+
+    def _request_key(self, kind, prompt, model_name, generation_config):
+        """Coalescing key: model settings plus whitespace-normalized prompt."""
+        if not isinstance(prompt, str):
+            prompt = json.dumps(prompt, sort_keys=True, default=str)
+        material = json.dumps(
+            [kind, model_name or self.model_name, generation_config, " ".join(prompt.split())],
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _backoff(self, attempt, deadline):
+        """Sleep with full jitter; False if the deadline leaves no time to retry."""
+        delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempt)))
+        if time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _admit(self, name, priority, timeout):
+        """Take a governor slot and rate token for one attempt; counts the call if it is shed."""
+        try:
+            self.governor.acquire(priority, timeout)
+        except GeminiThrottledError as e:
+            self._caller_stats(name).record(throttled=True)
+            print(f"🚦 Gemini call ({name}) throttled: {e}")
+            raise
+
+    def _attempt(self, priority, attempt_fn, request_options, hold):
+        """Run one admitted attempt; its slot is released unless ``hold`` and it succeeds."""
+        try:
+            result = attempt_fn(request_options)
+        except BaseException:
+            self.governor.release(priority)
+            raise
+        if not hold:
+            self.governor.release(priority)
+        return result
+
+    def _call(self, name, priority, attempt_fn, timeout, hold=False):
+        """
+        Call ``attempt_fn`` with retries under one deadline.
+
+        Every attempt is admitted by the governor separately and its slot
+        is released before the backoff sleep, so a retry after a 429 waits
+        for a fresh rate token like every other caller. With ``hold`` the
+        slot of the successful attempt is kept and the caller releases it.
+        """
+        stats = self._caller_stats(name)
+        timeout = timeout or self.timeout_seconds
+        deadline = time.monotonic() + timeout
+        self._admit(name, priority, timeout)
+        if not self.breaker.allow():
+            self.governor.release(priority)
+            stats.record(rejected=True)
+            raise GeminiUnavailableError("Gemini is temporarily unavailable (circuit open)")
+
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                result = self._attempt(priority, attempt_fn, {"timeout": max(remaining, 0.1)}, hold)
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, RATE_LIMIT_ERRORS):
+                    self.governor.on_rate_limited()
+                if attempt < self.max_retries and self._backoff(attempt, deadline):
+                    attempt += 1
+                    stats.record(retry=True)
+                    print(f"⚠️ Gemini call ({name}) failed, retry {attempt}/{self.max_retries}: {e}")
+                    try:
+                        self._admit(name, priority, max(deadline - time.monotonic(), 0.01))
+                    except GeminiThrottledError:
+                        self.breaker.record_failure()
+                        raise
+                    continue
+                stats.record(error=True)
+                self.breaker.record_failure()
+                raise
+            except Exception:
+                # Bad request, blocked prompt etc.: Gemini itself is healthy
+                stats.record(error=True)
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def generate(self, prompt, name="default", priority=EVALUATION, model_name=None,
+                 generation_config=None, timeout=None) -> str:
+        """
+        Generate a complete response.
+
+        Concurrent calls with the same key (see _request_key) share the
+        first caller's request and its result.
+
+        Args:
+            prompt: Prompt text (or contents accepted by generate_content)
+            name: Caller label for metrics
+            priority: Governor priority class (ANALYSIS, CLIENT_REPLY, EVALUATION, PROGRESS)
+            model_name: Model override (default Config.GEMINI_MODEL_NAME)
+            generation_config: Optional generation config dict
+            timeout: Deadline in seconds for the call including retries
+
+        Returns:
+            str response text
+
+        Raises:
+            GeminiUnavailableError: While the circuit breaker is open
+            GeminiThrottledError: If the governor sheds the call under load
+        """
+        model = self.model(model_name, generation_config)
+
+        def call():
+            return self._call(
+                name,
+                priority,
+                lambda request_options: model.generate_content(prompt, request_options=request_options).text,
+                timeout
+            )
+
+        started = time.monotonic()
+        key = self._request_key("generate", prompt, model_name, generation_config)
+        text = self._flights.do(key, call)
+        self._caller_stats(name).record(latency=time.monotonic() - started)
+        return text
+
+    def generate_stream(self, prompt, name="default", priority=EVALUATION, model_name=None,
+                        generation_config=None, timeout=None):
+        """
+        Generate a response as a stream of text chunks.
+
+        Only the start of the stream (up to the first chunk) is retried;
+        a failure after that is raised to the caller, who has already
+        consumed partial output. The governor slot of the attempt that
+        started the stream is held until the stream ends.
+
+        Identical concurrent streams are shared: late callers replay the
+        chunks received so far, then follow the live stream.
+        """
+        model = self.model(model_name, generation_config)
+
+        def start(request_options):
+            stream = iter(model.generate_content(prompt, stream=True, request_options=request_options))
+            return stream, next(stream, None)
+
+        def chunks():
+            stream, first = self._call(name, priority, start, timeout, hold=True)
+            try:
+                if first is not None:
+                    yield first.text
+                for chunk in stream:
+                    yield chunk.text
+            finally:
+                self.governor.release(priority)
+
+        started = time.monotonic()
+        key = self._request_key("stream", prompt, model_name, generation_config)
+        yield from self._flights.stream(key, chunks)
+        # Latency of a stream is its full duration
+        self._caller_stats(name).record(latency=time.monotonic() - started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            callers = {name: stats.to_dict() for name, stats in self._stats.items()}
+        return {
+            "model": self.model_name,
+            "breaker": {"state": self.breaker.state, "consecutive_failures": self.breaker.failures},
+            "governor": self.governor.stats(),
+            "coalescing": self._flights.stats(),
+            "callers": callers,
+        }
+
+
+gemini = GeminiClient(
+    MODEL_NAME,
+    timeout_seconds=Config.GEMINI_TIMEOUT_SECONDS,
+    max_retries=Config.GEMINI_MAX_RETRIES,
+    retry_base_seconds=Config.GEMINI_RETRY_BASE_SECONDS,
+    retry_max_seconds=Config.GEMINI_RETRY_MAX_SECONDS,
+    breaker=CircuitBreaker(Config.GEMINI_BREAKER_THRESHOLD, Config.GEMINI_BREAKER_COOLDOWN_SECONDS),
+    governor=Governor(Config.GEMINI_RATE_PER_SECOND, Config.GEMINI_BURST, Config.GEMINI_MAX_IN_FLIGHT)
+)
+
+
 def generate_text_response(prompt: str) -> dict:
     """
     Generate a text response using Gemini API.
-    
+
     Args:
         prompt: The prompt to send to Gemini
-        
+
     Returns:
         A dictionary containing the parsed JSON response from Gemini
     """
     try:
-        # Use gemini-pro model (compatible with current library version)
-        model = genai.GenerativeModel("gemini-pro")
-        
-        # Generate content
-        response = model.generate_content(prompt)
-        
+        text = gemini.generate(prompt, name="generate_text_response")
+
         # Try to parse as JSON
         try:
-            result = json.loads(response.text)
+            result = json.loads(text)
             return result
         except json.JSONDecodeError:
             # If not valid JSON, return the text wrapped in a dict
             return {
-                "summary": response.text,
+                "summary": text,
                 "risk_level": "Medium",
                 "suggestions": []
             }
-            
+
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
         return {
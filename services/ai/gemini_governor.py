@@ -0,0 +1,198 @@
+# services/ai/gemini_governor.py
+"""
+Process-wide Gemini concurrency governor.
+
+All Gemini calls pass through one admission gate combining a token bucket
+(request rate) and a max-in-flight limit, served in strict priority order:
+
+    ANALYSIS > CLIENT_REPLY > EVALUATION > PROGRESS
+
+Lower classes may only use a share of the in-flight slots, queue in
+shorter queues and give up sooner, so under load they degrade (callers
+fall back to their canned responses) before interactive document
+analysis is delayed. A 429 from Gemini drains the bucket so every class
+backs off together. A rate of 0 disables the token bucket (only the
+in-flight limit applies).
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Priority classes, highest first
+ANALYSIS = 0
+CLIENT_REPLY = 1
+EVALUATION = 2
+PROGRESS = 3
+
+PRIORITY_NAMES = {
+    ANALYSIS: "analysis",
+    CLIENT_REPLY: "client_reply",
+    EVALUATION: "evaluation",
+    PROGRESS: "progress",
+}
+
+# Per class: (share of in-flight slots, max queued, max wait in seconds)
+DEFAULT_POLICY = {
+    ANALYSIS: (1.0, 32, 60.0),
+    CLIENT_REPLY: (0.75, 16, 20.0),
+    EVALUATION: (0.5, 16, 10.0),
+    PROGRESS: (0.25, 8, 5.0),
+}
+
+
+class GeminiThrottledError(Exception):
+    """Raised when a call is shed by the governor (queue full or wait too long)."""
+
+
+class _ClassStats:
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class Governor:
+    """Token bucket + max-in-flight admission control with priority classes."""
+
+    def __init__(self, rate_per_second=5.0, burst=10, max_in_flight=6, policy=None):
+        if rate_per_second < 0:
+            raise ValueError(f"rate_per_second must be >= 0 (0 = unlimited), got {rate_per_second}")
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+        self.max_in_flight = max(1, max_in_flight)
+        self.policy = policy or DEFAULT_POLICY
+
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._in_flight = {p: 0 for p in self.policy}
+        self._queues = {p: deque() for p in self.policy}
+        self._cond = threading.Condition()
+        self._stats = {p: _ClassStats() for p in self.policy}
+        self._rate_limited = 0
+
+    def _refill(self, now):
+        if not self.rate_per_second:
+            # Unlimited rate: the bucket is always full
+            self._tokens = float(self.burst)
+            self._refilled_at = now
+            return
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_second)
+        self._refilled_at = now
+
+    def _limit(self, priority):
+        return max(1, int(self.max_in_flight * self.policy[priority][0]))
+
+    def _blocked_by_higher(self, priority):
+        return any(self._queues[p] for p in self.policy if p < priority)
+
+    def acquire(self, priority, timeout=None):
+        """
+        Wait for admission.
+
+        Args:
+            priority: Priority class (ANALYSIS, CLIENT_REPLY, ...)
+            timeout: Optional cap on the wait (the class max wait applies too)
+
+        Raises:
+            GeminiThrottledError: If the class queue is full or the wait expires
+        """
+        _, max_queued, max_wait = self.policy[priority]
+        max_wait = min(max_wait, timeout) if timeout else max_wait
+        stats = self._stats[priority]
+        started = time.monotonic()
+        deadline = started + max_wait
+        ticket = object()
+
+        with self._cond:
+            queue = self._queues[priority]
+            if len(queue) >= max_queued:
+                stats.rejected += 1
+                raise GeminiThrottledError(f"Gemini {PRIORITY_NAMES[priority]} queue is full")
+            queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    in_flight = sum(self._in_flight.values())
+                    ready = (
+                        queue[0] is ticket
+                        and not self._blocked_by_higher(priority)
+                        and in_flight < self.max_in_flight
+                        and self._in_flight[priority] < self._limit(priority)
+                    )
+                    if ready and self._tokens >= 1:
+                        self._tokens -= 1
+                        self._in_flight[priority] += 1
+                        waited = now - started
+                        stats.admitted += 1
+                        stats.total_wait += waited
+                        stats.max_wait = max(stats.max_wait, waited)
+                        return
+
+                    if now >= deadline:
+                        stats.timed_out += 1
+                        raise GeminiThrottledError(
+                            f"Gemini {PRIORITY_NAMES[priority]} call waited over {max_wait:g}s for capacity"
+                        )
+                    wait = deadline - now
+                    if ready:
+                        # Only short of tokens: sleep until the next one
+                        wait = min(wait, (1 - self._tokens) / self.rate_per_second)
+                    self._cond.wait(wait)
+            finally:
+                queue.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self, priority):
+        with self._cond:
+            self._in_flight[priority] -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority, timeout=None):
+        """Hold one admission for the duration of a call."""
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def on_rate_limited(self):
+        """Gemini answered 429: drain the bucket so all classes back off."""
+        with self._cond:
+            self._rate_limited += 1
+            if self.rate_per_second:
+                self._refill(time.monotonic())
+                self._tokens = 0.0
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            classes = {}
+            for p, name in PRIORITY_NAMES.items():
+                s = self._stats[p]
+                classes[name] = {
+                    "queued": len(self._queues[p]),
+                    "in_flight": self._in_flight[p],
+                    "in_flight_limit": self._limit(p),
+                    "admitted": s.admitted,
+                    "rejected": s.rejected,
+                    "timed_out": s.timed_out,
+                    "avg_wait_seconds": round(s.total_wait / s.admitted, 3) if s.admitted else 0.0,
+                    "max_wait_seconds": round(s.max_wait, 3),
+                }
+            return {
+                "rate_per_second": self.rate_per_second,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 2),
+                "max_in_flight": self.max_in_flight,
+                "in_flight": sum(self._in_flight.values()),
+                "rate_limited_events": self._rate_limited,
+                "throttle_events": sum(s.rejected + s.timed_out for s in self._stats.values()),
+                "classes": classes,
+            }
+
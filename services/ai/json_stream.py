@@ -0,0 +1,114 @@
+# services/ai/json_stream.py
+"""
+Incremental parsing of a streamed JSON object.
+
+Gemini streams its JSON response in arbitrary text chunks. The parser
+tracks just enough structure (nesting, strings, escapes) to notice when a
+top-level field or an element of a top-level array is complete, and
+decodes only that finished slice, so partial values are never emitted.
+"""
+
+import json
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJsonParser:
+    """
+    Feed text chunks of one JSON object; get back completed values.
+
+    ``feed(chunk)`` returns a list of ``(key, index, value)`` tuples:
+
+    - ``(key, None, value)`` when a top-level field's value is complete
+    - ``(key, i, value)`` when element ``i`` of a top-level array is complete
+      (before the array itself)
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._stack = []        # (bracket, role, start) of open containers
+        self._atom = None       # (role, start) of the open string or scalar
+        self._in_string = False
+        self._escape = False
+        self._expect_value = False
+        self._key = None
+        self._item_index = 0
+
+    def _role(self):
+        """Role of a value starting at the current position."""
+        depth = len(self._stack)
+        if depth == 1:
+            return "field" if self._expect_value else "key"
+        if depth == 2 and self._stack[-1][0] == "[":
+            return "item"
+        return None
+
+    def _begin(self, pos):
+        role = self._role()
+        if role == "field":
+            self._item_index = 0
+        return role, pos
+
+    def _end(self, role, start, end, events):
+        if role is None:
+            return
+        try:
+            value = json.loads(self.text[start:end])
+        except ValueError:
+            return
+        if role == "key":
+            self._key = value
+        elif role == "field":
+            events.append((self._key, None, value))
+        elif role == "item":
+            events.append((self._key, self._item_index, value))
+            self._item_index += 1
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        events = []
+        text = self.text
+
+        for pos in range(self._pos, len(text)):
+            ch = text[pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    role, start = self._atom
+                    self._atom = None
+                    self._end(role, start, pos + 1, events)
+                continue
+
+            # Numbers, true/false/null end at the next structural character
+            if self._atom is not None and (ch in _WHITESPACE or ch in ",}]"):
+                role, start = self._atom
+                self._atom = None
+                self._end(role, start, pos, events)
+
+            if ch == '"':
+                self._in_string = True
+                self._atom = self._begin(pos)
+            elif ch in "{[":
+                role, start = self._begin(pos)
+                self._stack.append((ch, role, start))
+            elif ch in "}]":
+                if self._stack:
+                    _, role, start = self._stack.pop()
+                    self._end(role, start, pos + 1, events)
+            elif ch == ":":
+                if len(self._stack) == 1:
+                    self._expect_value = True
+            elif ch == ",":
+                if len(self._stack) == 1:
+                    self._expect_value = False
+            elif ch not in _WHITESPACE and self._atom is None:
+                self._atom = self._begin(pos)
+
+        self._pos = len(text)
+        return events
@@ -0,0 +1,428 @@
+# services/ai/local_scorer.py
+"""
+Local heuristic scoring of student questions and drafted documents.
+
+Cheap text features (question form, open vs. closed questions, overlap
+with the scenario's or drafting task's vocabulary, legal and interview
+terms, and a banned-phrase lexicon) form a feature vector; one matrix
+product with a fixed weight matrix turns it into clarity / relevance /
+ethics scores (0-100). Scoring takes well under a millisecond.
+
+The scores back the tiered evaluation mode (local score first, Gemini only
+for borderline or sampled cases) and replace the fixed fallback scores
+when Gemini is unavailable.
+"""
+
+import re
+import random
+import threading
+
+import numpy as np
+
+from config import Config
+from services.ai.scenarios_data import SCENARIOS, DRAFTING_TASKS
+
+_WORD = re.compile(r"[a-z][a-z']*")
+
+STOPWORDS = frozenset("""
+a about after again all am an and any are as at be been before being but by can could did do
+does doing for from had has have having he her here him his how i if in into is it its just me
+my no not now of on or our out over own said same she should so some than that the their them
+then there these they this those to too under until up very was we were what when where which
+while who whom why will with would you your yours you're i'm it's don't didn't
+""".split())
+
+OPEN_STARTS = frozenset("what when where why how who whom which tell describe explain walk".split())
+CLOSED_STARTS = frozenset("did do does is are was were can could have has had will would should shall may".split())
+POLITE_WORDS = frozenset("please thank thanks kindly sorry".split())
+
+INTERVIEW_TERMS = frozenset("""
+date dates when notice letter written document documents contract agreement paid payment amount
+receipt receipts evidence witness witnesses email emails message messages photo photos record
+records signed sign copy happened timeline first last before after told said promised
+""".split())
+
+LEGAL_TERMS = frozenset("""
+hereby whereas party parties agreement notice pursuant clause section shall plaintiff defendant
+court damages breach liability jurisdiction dated signed terms obligations herein thereof
+witness claim claims demand remedy remedies compensation settlement contract tenant landlord
+respectfully undersigned counsel motion relief
+""".split())
+
+# Unethical, abusive or discriminatory phrasing
+BANNED_PHRASES = (
+    "stupid", "idiot", "shut up", "liar", "you're lying", "you are lying", "dumb",
+    "bribe", "fake evidence", "fabricate", "forge", "forged", "forgery", "backdate", "destroy the evidence",
+    "hide the evidence", "lie to the court", "lie in court", "don't tell anyone",
+    "or else", "we will hurt", "we will harm", "threaten", "your religion", "your caste",
+    "your race", "illegal immigrant",
+)
+LEADING_PHRASES = ("admit", "isn't it true", "you must have", "surely you", "confess", "why didn't you just")
+NEGATIONS = ("not", "no", "never", "nobody", "nothing", "none", "neither", "nor", "without")
+PLACEHOLDERS = ("[", "___", "xxx", "lorem", "<insert", "tbd")
+INFORMAL_WORDS = frozenset("gonna wanna gotta lol ok okay yeah guys stuff kinda".split())
+
+
+def _content_words(text: str) -> list:
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS and len(w) > 2]
+
+
+# =========================================================
+# Scenario / drafting-task vocabularies as a keyword matrix
+# =========================================================
+def _build_keyword_matrix(sources: dict):
+    vocab = {}
+    rows = {}
+    for key, text in sources.items():
+        rows[key] = {vocab.setdefault(w, len(vocab)) for w in _content_words(text)}
+    matrix = np.zeros((len(rows), len(vocab)), dtype=np.float32)
+    index = {}
+    for i, (key, columns) in enumerate(rows.items()):
+        matrix[i, list(columns)] = 1.0
+        index[key] = i
+    return vocab, matrix, index
+
+
+_SCENARIO_VOCAB, _SCENARIO_MATRIX, _SCENARIO_INDEX = _build_keyword_matrix({
+    s["id"]: f"{s['title']} {s['role']} {s['context']}"
+    for level in SCENARIOS.values() for s in level
+})
+_ALL_SCENARIOS = _SCENARIO_MATRIX.max(axis=0)
+
+_TASK_VOCAB, _TASK_MATRIX, _TASK_INDEX = _build_keyword_matrix({
+    task: task for tasks in DRAFTING_TASKS.values() for task in tasks
+})
+
+
+def _overlap(words, vocab, keywords) -> float:
+    """Share of the words found in a keyword row (vectorized lookup)."""
+    if not words:
+        return 0.0
+    columns = [vocab[w] for w in words if w in vocab]
+    if not columns:
+        return 0.0
+    return float(keywords[columns].sum()) / len(words)
+
+
+# =========================================================
+# Feature weights: one row per feature, columns are
+# (clarity, relevance, ethics)
+# =========================================================
+QUESTION_FEATURES = (
+    ("is_question",       (10, 0, 0)),
+    ("open_question",     (8, 12, 0)),
+    ("closed_question",   (4, 2, 0)),
+    ("too_short",         (-25, -20, 0)),
+    ("too_long",          (-20, -5, 0)),
+    ("multi_question",    (-12, 0, 0)),
+    ("scenario_overlap",  (0, 40, 0)),
+    ("interview_terms",   (0, 20, 0)),
+    ("polite",            (3, 0, 5)),
+    ("banned",            (-10, -15, -60)),
+    ("leading",           (-5, 0, -15)),
+    ("shouting",          (-10, 0, -10)),
+)
+QUESTION_BIAS = np.array([60, 40, 90], dtype=np.float32)
+QUESTION_WEIGHTS = np.array([w for _, w in QUESTION_FEATURES], dtype=np.float32)
+
+DOCUMENT_FEATURES = (
+    ("too_short",         (-20, -20, 0)),
+    ("good_length",       (8, 8, 0)),
+    ("paragraphs",        (10, 0, 0)),
+    ("headings",          (10, 5, 0)),
+    ("long_sentences",    (-15, 0, 0)),
+    ("legal_terms",       (5, 30, 0)),
+    ("task_overlap",      (0, 25, 0)),
+    ("placeholders",      (-10, -10, 0)),
+    ("formalities",       (5, 5, 0)),
+    ("banned",            (-5, -10, -45)),
+    ("informal",          (-10, -5, -5)),
+)
+DOCUMENT_BIAS = np.array([55, 35, 90], dtype=np.float32)
+DOCUMENT_WEIGHTS = np.array([w for _, w in DOCUMENT_FEATURES], dtype=np.float32)
+
+# Category thresholds (score >= threshold), highest first
+CLARITY_LEVELS = ((85, "Excellent"), (70, "Good"), (50, "Average"), (0, "Poor"))
+RELEVANCE_LEVELS = ((70, "High"), (45, "Medium"), (0, "Low"))
+ETHICS_LEVELS = ((70, "Safe"), (0, "Caution"))
+DOCUMENT_PASS_MARK = 55
+
+
+def _level(score, levels):
+    for threshold, name in levels:
+        if score >= threshold:
+            return name
+    return levels[-1][1]
+
+
+def _margin(score, levels):
+    """Distance to the nearest category boundary."""
+    return min(abs(score - threshold) for threshold, _ in levels[:-1])
+
+
+def _phrase_pattern(phrases):
+    return re.compile(r"\b(?:" + "|".join(re.escape(p) for p in phrases) + r")\b")
+
+
+_BANNED = _phrase_pattern(BANNED_PHRASES)
+_LEADING = _phrase_pattern(LEADING_PHRASES)
+_NEGATIONS = re.compile(r"\b(?:" + "|".join(NEGATIONS) + r"|[a-z]+n't)\b")
+_FORMALITIES = _phrase_pattern(("date", "dated", "signature", "signed", "sincerely", "regards", "dear"))
+
+
+def _count(pattern, text: str) -> int:
+    """Number of distinct lexicon phrases in the text."""
+    return len(set(pattern.findall(text)))
+
+
+def _contains_any(text: str, phrases) -> int:
+    return sum(1 for phrase in phrases if phrase in text)
+
+
+def _scores(features, weights, bias):
+    return np.clip(bias + features @ weights, 0, 100).round()
+
+
+# =========================================================
+# Questions
+# =========================================================
+def question_features(question: str, scenario_context=None) -> np.ndarray:
+    text = question.strip()
+    lower = text.lower()
+    words = _WORD.findall(lower)
+    content = _content_words(lower)
+    first = words[0] if words else ""
+    letters = [c for c in text if c.isalpha()]
+
+    if scenario_context and scenario_context.get("id") in _SCENARIO_INDEX:
+        keywords = _SCENARIO_MATRIX[_SCENARIO_INDEX[scenario_context["id"]]]
+    else:
+        keywords = _ALL_SCENARIOS
+
+    return np.array([
+        text.endswith("?"),
+        first in OPEN_STARTS or lower.startswith(("tell me", "can you tell", "could you tell", "can you describe")),
+        first in CLOSED_STARTS,
+        len(words) < 4,
+        len(words) > 35,
+        text.count("?") > 1,
+        min(1.0, 2 * _overlap(content, _SCENARIO_VOCAB, keywords)),
+        min(1.0, sum(w in INTERVIEW_TERMS for w in words) / 2),
+        any(w in POLITE_WORDS for w in words) or lower.startswith(("could you", "would you")),
+        min(1, _count(_BANNED, lower)),
+        min(1, _count(_LEADING, lower)),
+        len(letters) > 8 and sum(c.isupper() for c in letters) / len(letters) > 0.6,
+    ], dtype=np.float32)
+
+
+def _question_feedback(named) -> str:
+    if named["banned"]:
+        return "Keep your questions respectful and professional; avoid accusatory, abusive or unethical language."
+    if named["too_short"]:
+        return "Your question is very short. Add enough detail so the client knows exactly what you are asking."
+    if named["multi_question"] or named["too_long"]:
+        return "Ask one thing at a time; long or multi-part questions are hard for a client to answer."
+    if named["leading"]:
+        return "Avoid leading questions that push the client toward an answer; let them tell their story."
+    if named["scenario_overlap"] < 0.3 and named["interview_terms"] == 0:
+        return "Focus on the client's situation: ask about dates, documents, amounts and what happened."
+    if named["closed_question"] and not named["open_question"]:
+        return "Good focus. Try open questions (what, how, when) to let the client explain in their own words."
+    return "Clear, relevant question. Keep building a timeline of facts and evidence."
+
+
+def score_question(question: str, scenario_context=None) -> dict:
+    """
+    Score a mock-client question locally.
+
+    Returns:
+        dict in the evaluate_student_question schema, plus "total_score",
+        "source": "local" and "borderline" (close to a category boundary
+        or flagged for ethics, i.e. worth a second opinion)
+    """
+    features = question_features(question, scenario_context)
+    clarity, relevance, ethics = _scores(features, QUESTION_WEIGHTS, QUESTION_BIAS)
+    named = dict(zip((name for name, _ in QUESTION_FEATURES), features))
+
+    margin = Config.EVALUATION_BORDERLINE_MARGIN
+    borderline = bool(
+        _margin(clarity, CLARITY_LEVELS) < margin
+        or _margin(relevance, RELEVANCE_LEVELS) < margin
+        or ethics < ETHICS_LEVELS[0][0] + margin
+    )
+    return {
+        "clarity": _level(clarity, CLARITY_LEVELS),
+        "relevance": _level(relevance, RELEVANCE_LEVELS),
+        "ethics": _level(ethics, ETHICS_LEVELS),
+        "total_score": int(round((clarity + relevance + ethics) / 3)),
+        "feedback": _question_feedback(named),
+        "source": "local",
+        "borderline": borderline,
+    }
+
+
+def ethics_guard(question: str, local: dict) -> tuple:
+    """
+    What a near-duplicate question must share to reuse a cached evaluation:
+    the same banned, leading and negation phrases and the same local
+    ethics verdict.
+    """
+    lower = question.lower().replace("\u2019", "'")
+    return (
+        tuple(sorted(set(_BANNED.findall(lower)))),
+        tuple(sorted(set(_LEADING.findall(lower)))),
+        tuple(sorted(set(_NEGATIONS.findall(lower)))),
+        local["ethics"],
+    )
+
+
+# =========================================================
+# Documents
+# =========================================================
+def document_features(document_text: str, document_type: str = "") -> np.ndarray:
+    lower = document_text.lower()
+    words = _WORD.findall(lower)
+    n_words = max(len(words), 1)
+    lines = [line.strip() for line in document_text.splitlines() if line.strip()]
+    paragraphs = [p for p in re.split(r"\n\s*\n", document_text) if p.strip()]
+    sentences = [s for s in re.split(r"[.!?]+\s", document_text) if s.strip()]
+    # Headings and numbered clauses
+    headings = sum(
+        1 for line in lines
+        if (len(line) < 80 and (line.isupper() or line.endswith(":")))
+        or re.match(r"^(\d+|[ivx]+|[a-z])[.)]\s", line.lower())
+    )
+
+    task_words = _content_words(document_type)
+    if document_type in _TASK_INDEX:
+        keywords = _TASK_MATRIX[_TASK_INDEX[document_type]]
+    else:
+        keywords = np.zeros(len(_TASK_VOCAB), dtype=np.float32)
+        keywords[[_TASK_VOCAB[w] for w in task_words if w in _TASK_VOCAB]] = 1.0
+    content = _content_words(lower)
+    task_hits = _overlap(content, _TASK_VOCAB, keywords) if keywords.any() else 0.0
+
+    return np.array([
+        n_words < 40,
+        120 <= n_words <= 1500,
+        min(1.0, len(paragraphs) / 4),
+        min(1.0, headings / 3),
+        n_words / max(len(sentences), 1) > 35,
+        min(1.0, sum(w in LEGAL_TERMS for w in words) / n_words * 25),
+        min(1.0, task_hits * 10),
+        min(1, _contains_any(lower, PLACEHOLDERS)),
+        min(1.0, _count(_FORMALITIES, lower) / 2),
+        min(1, _count(_BANNED, lower)),
+        min(1.0, (sum(w in INFORMAL_WORDS for w in words) + document_text.count("!!")) / 3),
+    ], dtype=np.float32)
+
+
+def score_document(document_text: str, document_type: str = "Legal Document") -> dict:
+    """
+    Score a drafted document locally.
+
+    Returns:
+        dict in the evaluate_document schema (without "grade"), plus
+        "source": "local" and "borderline" (near the pass mark or flagged
+        for ethics)
+    """
+    features = document_features(document_text, document_type)
+    clarity, relevance, ethics = (int(s) for s in _scores(features, DOCUMENT_WEIGHTS, DOCUMENT_BIAS))
+    named = dict(zip((name for name, _ in DOCUMENT_FEATURES), features))
+    total = int(round((clarity + relevance + ethics) / 3))
+
+    suggestions, strengths = [], []
+    if named["paragraphs"] < 0.75 or named["headings"] < 0.5:
+        suggestions.append("Organize the document into clearly headed sections and paragraphs.")
+    else:
+        strengths.append("Clear structure with sections and paragraphs.")
+    if named["long_sentences"]:
+        suggestions.append("Break long sentences into shorter, precise statements.")
+    if named["legal_terms"] < 0.5:
+        suggestions.append("Use the formal legal terms expected in this type of document.")
+    else:
+        strengths.append("Appropriate use of legal terminology.")
+    if named["task_overlap"] < 0.3:
+        suggestions.append(f"Address the specific purpose of the {document_type} more directly.")
+    if named["placeholders"]:
+        suggestions.append("Fill in all placeholders before submitting.")
+    if not named["formalities"]:
+        suggestions.append("Include the date, parties and a signature block.")
+    if named["banned"] or named["informal"]:
+        suggestions.append("Keep the tone professional; remove threatening, improper or informal wording.")
+    if not strengths:
+        strengths.append("Document submitted for review.")
+
+    margin = Config.EVALUATION_BORDERLINE_MARGIN
+    return {
+        "clarity_score": clarity,
+        "relevance_score": relevance,
+        "ethics_score": ethics,
+        "total_score": total,
+        "feedback": {
+            "clarity": "Well organized and readable." if clarity >= 70 else "Structure and readability need work.",
+            "relevance": "Addresses the task with suitable legal content." if relevance >= 70 else "Content could address the task more directly.",
+            "ethics": "No ethical concerns detected." if ethics >= 70 else "Some wording raises professional or ethical concerns.",
+        },
+        "suggestions": suggestions[:3] or ["Review the document once more for precision."],
+        "strengths": strengths[:2],
+        "overall_comment": "Automatic assessment based on structure, terminology and tone.",
+        "source": "local",
+        "borderline": bool(abs(total - DOCUMENT_PASS_MARK) < margin or ethics < 70 + margin),
+    }
+
+
+# =========================================================
+# Tiered evaluation
+# =========================================================
+class TierStats:
+    """How evaluations were served, and how often local scores agree with Gemini."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.compared = 0
+        self.agreed = 0
+
+    def record(self, kind, source):
+        with self._lock:
+            key = f"{kind}:{source}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def compare(self, agreed: bool):
+        with self._lock:
+            self.compared += 1
+            self.agreed += int(agreed)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "mode": Config.EVALUATION_MODE,
+                "served": dict(self.counts),
+                "compared": self.compared,
+                "agreement_rate": round(self.agreed / self.compared, 3) if self.compared else 0.0,
+            }
+
+
+tier_stats = TierStats()
+
+
+def use_llm(local: dict) -> str:
+    """
+    Decide whether Gemini should evaluate, given the local score.
+
+    Returns:
+        "llm" (evaluate with Gemini and use its result), "sample" (return
+        the local result, evaluate with Gemini in the background for
+        calibration) or "local" (local result only)
+    """
+    mode = Config.EVALUATION_MODE
+    if mode == "llm":
+        return "llm"
+    if mode == "local":
+        return "local"
+    if local["borderline"]:
+        return "llm"
+    if random.random() < Config.EVALUATION_SAMPLE_RATE:
+        return "sample"
+    return "local"
@@ -0,0 +1,132 @@
+# services/ai/mock_turns.py
+"""
+Mock-client chat turns.
+
+The client reply and the evaluation of the student's question are
+independent Gemini calls, so they are dispatched together on a bounded
+executor and a turn takes as long as the slower of the two instead of
+their sum. The reply is always waited for; the evaluation gets a short
+grace period after it and, if still running, is left behind as a pending
+evaluation. Pending evaluations live only in this server-side store: the
+page polls it read-only (peek_pending_evaluation) and the evaluation is
+applied to the session on the student's next page request
+(get_pending_evaluation). A collected evaluation stays readable for a
+short while, because concurrent requests may still carry a session
+cookie without it.
+"""
+
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from config import Config
+from services.ai.client_ai import get_client_reply
+from services.ai.evaluator_ai import evaluate_student_question, FALLBACK_EVALUATION
+
+EVALUATION_GRACE_SECONDS = Config.MOCK_CLIENT_EVALUATION_GRACE_SECONDS
+# Pending evaluations nobody collected are dropped after this long
+PENDING_TTL_SECONDS = 600
+# Collected evaluations stay available this long for requests with an older session
+COLLECTED_TTL_SECONDS = 60
+MAX_PENDING = 256
+
+_executor = ThreadPoolExecutor(max_workers=Config.MOCK_CLIENT_WORKERS, thread_name_prefix="mock-turn")
+_pending = {}  # evaluation_id -> [future, created_at, collected_at or None]
+_pending_lock = threading.Lock()
+
+
+def _prune(now):
+    """Drop expired entries (call with _pending_lock held)."""
+    for key, (_, created_at, collected_at) in list(_pending.items()):
+        if now - created_at > PENDING_TTL_SECONDS or (
+            collected_at is not None and now - collected_at > COLLECTED_TTL_SECONDS
+        ):
+            del _pending[key]
+
+
+def _remember(future) -> str:
+    evaluation_id = uuid.uuid4().hex
+    now = time.monotonic()
+    with _pending_lock:
+        _prune(now)
+        while len(_pending) >= MAX_PENDING:
+            del _pending[next(iter(_pending))]
+        _pending[evaluation_id] = [future, now, None]
+    return evaluation_id
+
+
+def _evaluation_result(future, timeout=None) -> dict:
+    """The evaluation of a finished future; the fallback evaluation if it raised."""
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        raise
+    except Exception as e:
+        print(f"⚠️ Question evaluation failed, using the fallback evaluation: {e}")
+        return dict(FALLBACK_EVALUATION)
+
+
+def run_turn(conversation_history, student_question, scenario_context=None):
+    """
+    Get the client's reply and the question's evaluation concurrently.
+
+    Args:
+        conversation_history: Previous chat turns
+        student_question: The student's question
+        scenario_context: Current scenario dict
+
+    Returns:
+        (reply, evaluation, evaluation_id): ``evaluation`` is None when it
+        missed the grace period; collect it later with
+        get_pending_evaluation(evaluation_id)
+    """
+    history = list(conversation_history)
+    evaluation_future = _executor.submit(evaluate_student_question, student_question, scenario_context)
+    reply_future = _executor.submit(get_client_reply, history, student_question, scenario_context)
+
+    reply = reply_future.result()
+    try:
+        return reply, _evaluation_result(evaluation_future, EVALUATION_GRACE_SECONDS), None
+    except FutureTimeout:
+        print("⏳ Question evaluation still running; it will be filled in later")
+        return reply, None, _remember(evaluation_future)
+
+
+def _lookup(evaluation_id: str, collect: bool):
+    now = time.monotonic()
+    with _pending_lock:
+        _prune(now)
+        item = _pending.get(evaluation_id)
+        if item is None:
+            return "unknown", None
+        future = item[0]
+        if not future.done():
+            return "pending", None
+        if collect and item[2] is None:
+            item[2] = now
+    return "done", _evaluation_result(future)
+
+
+def peek_pending_evaluation(evaluation_id: str):
+    """
+    Status of a pending evaluation, without collecting it.
+
+    Returns:
+        ("done", evaluation), ("pending", None) or ("unknown", None) if the
+        ID was never issued or has expired
+    """
+    return _lookup(evaluation_id, collect=False)
+
+
+def get_pending_evaluation(evaluation_id: str):
+    """
+    Collect a pending evaluation to apply it to the session.
+
+    Collection is idempotent: a completed evaluation can be read again for
+    COLLECTED_TTL_SECONDS after its first collection.
+
+    Returns:
+        Same as peek_pending_evaluation
+    """
+    return _lookup(evaluation_id, collect=True)
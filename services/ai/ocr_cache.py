@@ -0,0 +1,93 @@
+# services/ai/ocr_cache.py
+
+import os
+import json
+import zlib
+import hashlib
+import threading
+from config import Config
+from services.cache import SQLiteCache
+
+_disk = SQLiteCache(
+    os.path.join(Config.CACHE_DIR, "ocr_cache.sqlite3"),
+    max_bytes=Config.OCR_CACHE_MAX_BYTES,
+    ttl_seconds=Config.OCR_CACHE_TTL_SECONDS
+)
+
+_lock = threading.Lock()
+_saved = {"ocr_hits": 0, "ocr_seconds_saved": 0.0, "digital_hits": 0}
+
+
+def cache_key(content_hash: str, mime_type: str) -> str:
+    """Cache key for extracted text: content hash + MIME type."""
+    return hashlib.sha256(f"{content_hash}:{mime_type}".encode("utf-8")).hexdigest()
+
+
+def prune_extractors(current_extractors):
+    """
+    Drop entries produced by extractors that are no longer configured
+    (e.g. after switching Document AI processors or upgrading pypdf).
+    """
+    removed = _disk.delete_tag_not_in(current_extractors)
+    if removed:
+        print(f"🧹 Dropped {removed} cached extractions from retired extractors")
+    return removed
+
+
+def get_cached_text(content_hash: str, mime_type: str, valid_extractors, max_chars: int = None):
+    """
+    Look up previously extracted text.
+
+    Args:
+        content_hash: SHA-256 hex digest of the document bytes
+        mime_type: Document MIME type
+        valid_extractors: Extractor IDs whose output is still acceptable
+        max_chars: Caller's character budget; a partial extraction only
+            counts as a hit if it already covers the budget
+
+    Returns:
+        tuple (text, extractor) or None on a miss
+    """
+    key = cache_key(content_hash, mime_type)
+    row = _disk.get(key)
+    if row is None:
+        return None
+
+    value, extractor = row
+    if extractor not in valid_extractors:
+        _disk.delete(key)
+        return None
+
+    entry = json.loads(zlib.decompress(value).decode("utf-8"))
+    if not entry.get("complete", True) and (not max_chars or len(entry["text"]) < max_chars):
+        return None
+
+    with _lock:
+        if "documentai:" in extractor:
+            _saved["ocr_hits"] += 1
+            _saved["ocr_seconds_saved"] += entry.get("seconds", 0.0)
+        else:
+            _saved["digital_hits"] += 1
+    return entry["text"], extractor
+
+
+def set_cached_text(content_hash: str, mime_type: str, text: str, extractor: str, seconds: float, complete: bool = True):
+    """
+    Store extracted text, compressed, tagged with the extractor that produced it.
+
+    Args:
+        seconds: Time the extraction took (the Document AI part, if any),
+            reported as savings on later hits
+        complete: False if extraction stopped early at a character budget
+    """
+    entry = {"text": text, "seconds": round(seconds, 3), "complete": complete}
+    value = zlib.compress(json.dumps(entry).encode("utf-8"), 6)
+    _disk.set(cache_key(content_hash, mime_type), value, tag=extractor)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters plus the Document AI time saved by cache hits."""
+    with _lock:
+        saved = dict(_saved)
+    saved["ocr_seconds_saved"] = round(saved["ocr_seconds_saved"], 3)
+    return {"disk": _disk.stats(), **saved}
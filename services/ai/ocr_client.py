@@ -2,47 +2,75 @@
 
 import os
 import io
+import mmap
+import time
+import hashlib
+import PyPDF2
 from google.cloud import documentai
-from PyPDF2 import PdfReader
+from services.ai.ocr_cache import get_cached_text, set_cached_text, prune_extractors
+from services.ai.pdf_workers import (
+    extract_pdf_text, extract_pdf_pages, is_scanned_page, PdfExtractionError, PAGE_SEPARATOR
+)
+from services.upload_ingest import open_view, read_bytes
+from services.singleflight import SingleFlight
+from services.ai.simulator import simulator, SIMULATED, RECORD
+from config import Config
 
 PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 LOCATION = os.getenv("GCP_LOCATION")
 PROCESSOR_ID = os.getenv("DOC_OCR_PROCESSOR_ID")
 
-client = documentai.DocumentProcessorServiceClient()
+if Config.AI_BACKEND == SIMULATED:
+    client = simulator.documentai_client()
+else:
+    client = documentai.DocumentProcessorServiceClient()
+    if Config.AI_BACKEND == RECORD:
+        client = simulator.recording_documentai_client(client)
+# The simulated processor needs no project or processor ID
+OCR_CONFIGURED = bool(PROJECT_ID and PROCESSOR_ID) or Config.AI_BACKEND == SIMULATED
 
+# Extractor IDs recorded with cached text; changing either invalidates old entries
+DIGITAL_EXTRACTOR = f"pypdf:{PyPDF2.__version__}"
+OCR_EXTRACTOR = (
+    "documentai:simulated" if Config.AI_BACKEND == SIMULATED
+    else f"documentai:{PROJECT_ID}/{LOCATION}/{PROCESSOR_ID}"
+)
+MIXED_EXTRACTOR = f"{DIGITAL_EXTRACTOR}+{OCR_EXTRACTOR}"
+CURRENT_EXTRACTORS = (DIGITAL_EXTRACTOR, OCR_EXTRACTOR, MIXED_EXTRACTOR)
 
-def has_digital_text(content: bytes, mime_type: str) -> bool:
+OCR_RASTER_DPI = 200
+# Document AI's synchronous page limit per process_document request
+OCR_MAX_PAGES_PER_REQUEST = 15
+
+# Concurrent extractions of the same bytes share one pass
+_extractions = SingleFlight("extract-text")
+
+prune_extractors(CURRENT_EXTRACTORS)
+
+
+def has_digital_text(content, mime_type: str) -> bool:
     """
     Check if a PDF has extractable digital text.
     Returns True if text can be extracted directly, False if OCR is needed.
     """
     if mime_type != "application/pdf":
         return False
-    
+
     try:
-        pdf = PdfReader(io.BytesIO(content))
-        # Check first few pages for text
-        for page_num in range(min(3, len(pdf.pages))):
-            text = pdf.pages[page_num].extract_text()
-            if text and len(text.strip()) > 50:  # Has meaningful text
-                return True
-        return False
-    except Exception:
+        text, _ = extract_pdf_text(content, max_chars=1)
+    except PdfExtractionError:
         return False
+    return text is not None
 
 
-def extract_text_from_pdf(content: bytes) -> str:
+def extract_text_from_pdf(content, max_chars: int = None) -> str:
     """Extract text directly from a PDF with digital text."""
     try:
-        pdf = PdfReader(io.BytesIO(content))
-        text_parts = []
-        for page in pdf.pages:
-            text_parts.append(page.extract_text())
-        return "\n\n".join(text_parts)
-    except Exception as e:
+        text, _ = extract_pdf_text(content, max_chars)
+    except PdfExtractionError as e:
         print(f"Error extracting PDF text: {e}")
         return ""
+    return text or ""
 
 
 def extract_text_with_ocr(content: bytes, mime_type: str) -> str:
@@ -58,26 +86,228 @@ def extract_text_with_ocr(content: bytes, mime_type: str) -> str:
     return result.document.text or ""
 
 
-def extract_text(content: bytes, mime_type: str) -> str:
+def _layout_text(document, layout) -> str:
+    """Resolve a Document AI layout's text anchor against the document text."""
+    return "".join(
+        document.text[int(segment.start_index or 0):int(segment.end_index)]
+        for segment in layout.text_anchor.text_segments
+    )
+
+
+def _rasterize(content, page_numbers: list) -> list:
+    """Render the given pages (ascending) to images, one poppler call per contiguous run."""
+    from pdf2image import convert_from_bytes, convert_from_path
+
+    # poppler reads spooled uploads straight from disk
+    convert = convert_from_path if isinstance(content, str) else convert_from_bytes
+    images = []
+    run_start = prev = None
+    for page_num in page_numbers + [None]:
+        if run_start is not None and (page_num is None or page_num != prev + 1):
+            images.extend(convert(
+                content, dpi=OCR_RASTER_DPI, first_page=run_start + 1, last_page=prev + 1
+            ))
+            run_start = None
+        if page_num is not None and run_start is None:
+            run_start = page_num
+        prev = page_num
+    return images
+
+
+def _ocr_batch(name: str, pdf_bytes: bytes, page_numbers: list, texts: dict):
+    """Send one PDF of at most OCR_MAX_PAGES_PER_REQUEST pages and record each page's text."""
+    result = client.process_document(request={
+        "name": name,
+        "raw_document": {"content": pdf_bytes, "mime_type": "application/pdf"}
+    })
+
+    document = result.document
+    for page_num, page in zip(page_numbers, document.pages):
+        texts[page_num] = _layout_text(document, page.layout).strip()
+
+
+def ocr_pdf_pages(content, page_numbers: list) -> dict:
+    """
+    OCR selected pages of a PDF.
+
+    Pages are processed one Document AI request (OCR_MAX_PAGES_PER_REQUEST
+    pages) at a time: each batch is rasterized (pdf2image), bundled into one
+    image PDF and sent before the next batch is rendered, so memory stays
+    bounded by one batch of images and OCR bytes and latency scale with the
+    number of scanned pages rather than the whole file.
+
+    Args:
+        content: PDF bytes, or the path of a spooled upload
+        page_numbers: Zero-based page numbers to OCR, in ascending order
+
+    Returns:
+        dict mapping page number -> OCR text
+    """
+    name = client.processor_path(PROJECT_ID, LOCATION, PROCESSOR_ID)
+    texts = {}
+    for batch_start in range(0, len(page_numbers), OCR_MAX_PAGES_PER_REQUEST):
+        batch_pages = page_numbers[batch_start:batch_start + OCR_MAX_PAGES_PER_REQUEST]
+        images = _rasterize(content, batch_pages)
+
+        buffer = io.BytesIO()
+        images[0].save(buffer, format="PDF", save_all=True, append_images=images[1:], resolution=OCR_RASTER_DPI)
+        del images
+
+        _ocr_batch(name, buffer.getvalue(), batch_pages, texts)
+
+    return texts
+
+
+def _page_ranges(content, page_count: int, whole: bool):
+    """
+    Yield (page numbers, PDF bytes) per Document AI request over the first
+    ``page_count`` pages, cut from the original PDF with PyPDF2.
+
+    A ``whole`` file that fits in one request is sent unchanged.
+    """
+    if whole and page_count <= OCR_MAX_PAGES_PER_REQUEST:
+        yield list(range(page_count)), read_bytes(content)
+        return
+
+    with open_view(content) as data:
+        reader = PyPDF2.PdfReader(data if isinstance(data, mmap.mmap) else io.BytesIO(data))
+        for start in range(0, page_count, OCR_MAX_PAGES_PER_REQUEST):
+            end = min(start + OCR_MAX_PAGES_PER_REQUEST, page_count)
+            writer = PyPDF2.PdfWriter()
+            for page_num in range(start, end):
+                writer.add_page(reader.pages[page_num])
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            yield list(range(start, end)), buffer.getvalue()
+
+
+def ocr_scanned_pdf_pages(content, page_count: int, whole: bool = True) -> dict:
+    """
+    OCR the first pages of a PDF that has no text layer at all.
+
+    Unlike ocr_pdf_pages nothing is rasterized: Document AI reads the
+    original page content, sent in page ranges of at most
+    OCR_MAX_PAGES_PER_REQUEST pages, one request at a time.
+
+    Args:
+        content: PDF bytes, or the path of a spooled upload
+        page_count: Number of leading pages to OCR
+        whole: Whether ``page_count`` is every page of the file
+
+    Returns:
+        dict mapping page number -> OCR text
+    """
+    name = client.processor_path(PROJECT_ID, LOCATION, PROCESSOR_ID)
+    texts = {}
+    for page_numbers, pdf_bytes in _page_ranges(content, page_count, whole):
+        _ocr_batch(name, pdf_bytes, page_numbers, texts)
+    return texts
+
+
+def extract_text(content, mime_type: str, content_hash: str = None, max_chars: int = None) -> str:
     """
     Smart text extraction:
-    - For PDFs with digital text: extract directly (fast, free)
-    - For scanned PDFs or images: use Document AI OCR
+    - Previously extracted bytes: served from the local extraction cache
+    - For PDFs: every page is classified on its own; pages with a text
+      layer are extracted directly (fast, free), stopping once
+      ``max_chars`` characters have been read, and only pages without one
+      (scanned pages or annexes) are OCR'd, in bounded batches
+    - For images: use Document AI OCR
+
+    ``content`` is the document bytes, or the path of a spooled upload;
+    paths are shared with the PDF workers and poppler instead of copied.
+    Concurrent calls on the same bytes share one extraction.
     """
-    # Check if PDF has digital text
-    if mime_type == "application/pdf" and has_digital_text(content, mime_type):
-        print("📄 Extracting text from digital PDF...")
-        return extract_text_from_pdf(content)
-    
+    if not content_hash:
+        with open_view(content) as data:
+            content_hash = hashlib.sha256(data).hexdigest()
+
+    key = (content_hash, mime_type, max_chars)
+    return _extractions.do(key, lambda: _extract_text(content, mime_type, content_hash, max_chars))
+
+
+def extraction_stats() -> dict:
+    """In-flight and coalesced extraction counters."""
+    return _extractions.stats()
+
+
+def _extract_text(content, mime_type: str, content_hash: str, max_chars: int) -> str:
+    cached = get_cached_text(content_hash, mime_type, CURRENT_EXTRACTORS, max_chars)
+    if cached:
+        print(f"⚡ Extraction cache hit ({cached[1]})")
+        return cached[0]
+
+    # Parse the PDF once, in the worker pool: digital detection and
+    # extraction share the same pass
+    if mime_type == "application/pdf":
+        started = time.monotonic()
+        try:
+            pages, complete = extract_pdf_pages(content, max_chars)
+        except PdfExtractionError as e:
+            print(f"❌ PDF extraction failed: {e}")
+            return f"ERROR: This PDF could not be processed. {e}. Please upload a smaller or simpler PDF."
+        scanned = [i for i, page_text in enumerate(pages) if is_scanned_page(page_text)]
+        if scanned and len(scanned) == len(pages):
+            # No page has a text layer: OCR them all (or report OCR as unconfigured below)
+            if OCR_CONFIGURED:
+                return _ocr_scanned_pdf(content, mime_type, content_hash, len(pages), complete)
+        else:
+            print("📄 Extracted text from digital PDF")
+            extractor = DIGITAL_EXTRACTOR
+            seconds = time.monotonic() - started
+            cacheable = True
+
+            if scanned and OCR_CONFIGURED:
+                print(f"🔍 Running OCR on {len(scanned)} scanned page(s) of {len(pages)}...")
+                try:
+                    started = time.monotonic()
+                    for page_num, page_text in ocr_pdf_pages(content, scanned).items():
+                        pages[page_num] = page_text
+                    extractor = MIXED_EXTRACTOR
+                    seconds = time.monotonic() - started
+                except Exception as e:
+                    # Keep the digital pages; the scanned ones stay empty (and uncached)
+                    print(f"⚠️ OCR of scanned pages failed: {e}")
+                    cacheable = False
+            elif scanned:
+                # Caching the digital pages alone would keep serving them
+                # without the scanned ones once OCR is configured
+                print(f"⚠️ OCR not configured - {len(scanned)} scanned page(s) left empty")
+                cacheable = False
+
+            text = PAGE_SEPARATOR.join(pages)
+            if cacheable:
+                set_cached_text(content_hash, mime_type, text, extractor, seconds, complete)
+            return text
+
     # Check if OCR is properly configured
-    if not PROJECT_ID or not PROCESSOR_ID:
+    if not OCR_CONFIGURED:
         print("⚠️ OCR not configured - cannot process scanned documents")
         return "ERROR: This document appears to be scanned or is an image. OCR is not configured. Please upload a PDF with digital text, or configure Document AI OCR processor in Google Cloud Console."
     
     # Use OCR for scanned documents or images
     print("🔍 Running OCR on scanned document/image...")
     try:
-        return extract_text_with_ocr(content, mime_type)
+        started = time.monotonic()
+        text = extract_text_with_ocr(read_bytes(content), mime_type)
+        if text:
+            set_cached_text(content_hash, mime_type, text, OCR_EXTRACTOR, time.monotonic() - started)
+        return text
+    except Exception as e:
+        print(f"❌ OCR failed: {e}")
+        return f"ERROR: OCR processing failed. This document may be scanned or an image. Please upload a PDF with digital text. (Technical error: {str(e)[:100]})"
+
+
+def _ocr_scanned_pdf(content, mime_type: str, content_hash: str, page_count: int, complete: bool) -> str:
+    """OCR a PDF none of whose pages has a text layer, in page ranges of the original file."""
+    print(f"🔍 Running OCR on scanned PDF ({page_count} page(s))...")
+    try:
+        started = time.monotonic()
+        texts = ocr_scanned_pdf_pages(content, page_count, whole=complete)
     except Exception as e:
         print(f"❌ OCR failed: {e}")
         return f"ERROR: OCR processing failed. This document may be scanned or an image. Please upload a PDF with digital text. (Technical error: {str(e)[:100]})"
+    text = PAGE_SEPARATOR.join(texts.get(page_num, "") for page_num in range(page_count))
+    if text.strip():
+        set_cached_text(content_hash, mime_type, text, OCR_EXTRACTOR, time.monotonic() - started, complete)
+    return text
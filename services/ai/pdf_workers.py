@@ -0,0 +1,256 @@
+# services/ai/pdf_workers.py
+"""
+Out-of-process PDF text extraction.
+
+pypdf is pure Python and CPU-bound, so extracting a large PDF in a request
+thread holds the GIL and slows every other gunicorn thread. Page ranges are
+extracted in a dedicated process pool instead; request threads only wait on
+futures. Spooled uploads are passed to the workers by path and memory-mapped
+there, so page ranges never pickle a copy of the file. Every job has a wall-clock deadline and every worker an RSS cap,
+so a pathological PDF fails with PdfExtractionError instead of pinning a
+thread forever.
+
+This module is imported by the spawned worker processes, so it must stay
+light: no Google clients or Flask imports at module level.
+"""
+
+import io
+import os
+import mmap
+import time
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from PyPDF2 import PdfReader
+from config import Config
+from services.upload_ingest import open_view
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Pages with no more text than this have no usable text layer (scanned)
+SCANNED_PAGE_MAX_CHARS = 10
+PAGE_SEPARATOR = "\n\n"
+
+# Extra time the parent waits beyond the job deadline before giving up on a worker
+_GRACE_SECONDS = 2.0
+
+
+class PdfExtractionError(Exception):
+    """Raised when a PDF cannot be extracted within the configured limits."""
+
+
+# -------------------------------------------------
+# Worker side
+# -------------------------------------------------
+
+def _on_alarm(signum, frame):
+    raise PdfExtractionError("PDF extraction exceeded its time limit")
+
+
+def _current_rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0.0
+        # Peak RSS (KB on Linux, bytes on macOS) - best effort fallback
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _init_worker(address_space_mb: int):
+    """Process-pool initializer: install the time-limit handler and memory cap."""
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+    if resource is not None and address_space_mb:
+        limit = address_space_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def is_scanned_page(text: str) -> bool:
+    """True if an extracted page has no usable text layer and needs OCR."""
+    return len(text.strip()) <= SCANNED_PAGE_MAX_CHARS
+
+
+def iter_pdf_pages(reader: PdfReader, start: int = 0, end: int = None):
+    """Lazily yield the extracted text of pages [start, end), in order."""
+    end = len(reader.pages) if end is None else min(end, len(reader.pages))
+    for page_num in range(start, end):
+        yield reader.pages[page_num].extract_text() or ""
+
+
+def extract_page_range(source, start: int, end: int, time_limit: float, max_rss_mb: int):
+    """
+    Extract the text of pages [start, end) inside a worker process.
+
+    Args:
+        source: PDF bytes, or the path of a spooled upload
+
+    Returns:
+        tuple (page_count, page_texts)
+
+    Raises:
+        PdfExtractionError: On a time or memory limit, or an unreadable PDF
+    """
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.setitimer(signal.ITIMER_REAL, max(time_limit, 0.01))
+    try:
+        with open_view(source) as data:
+            reader = PdfReader(data if isinstance(data, mmap.mmap) else io.BytesIO(data))
+            texts = []
+            for page_num, text in enumerate(iter_pdf_pages(reader, start, end), start):
+                texts.append(text)
+                if max_rss_mb and _current_rss_mb() > max_rss_mb:
+                    raise PdfExtractionError(f"PDF extraction exceeded the {max_rss_mb} MB memory limit at page {page_num + 1}")
+            return len(reader.pages), texts
+    except PdfExtractionError:
+        raise
+    except MemoryError:
+        raise PdfExtractionError("PDF extraction ran out of memory")
+    except Exception as e:
+        raise PdfExtractionError(f"Unreadable PDF: {str(e)[:200]}")
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+# -------------------------------------------------
+# Parent side
+# -------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: never fork a multi-threaded gunicorn worker
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(Config.PDF_WORKER_ADDRESS_SPACE_MB,)
+            )
+        return _pool
+
+
+def _reset_pool(pool):
+    """Discard a broken or wedged pool and kill its workers; the next job starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # A wedged worker ignores shutdown(); terminate its process as well
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def extract_pdf_pages(source, max_chars: int = None, timeout: float = None):
+    """
+    Extract per-page PDF text in the worker pool, page ranges in parallel.
+
+    Ranges are kept in flight up to the pool size and reassembled in page
+    order; no new ranges are submitted once the digital (non-scanned) pages
+    read so far meet ``max_chars``. Every page is returned, so callers can
+    classify each one with is_scanned_page and OCR only those.
+
+    Args:
+        source: PDF bytes, or the path of a spooled upload
+        max_chars: Optional character budget of the caller
+        timeout: Wall-clock limit for the whole job (default from Config)
+
+    Returns:
+        tuple (page_texts, complete): complete is False if extraction
+        stopped early at the budget
+
+    Raises:
+        PdfExtractionError: If the job hits its time or memory limit
+    """
+    timeout = timeout or Config.PDF_JOB_TIMEOUT_SECONDS
+    deadline = time.monotonic() + timeout
+    per_task = max(Config.PDF_PAGES_PER_TASK, 1)
+    max_rss_mb = Config.PDF_WORKER_MAX_RSS_MB
+    pool = _get_pool()
+
+    def submit(start):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise PdfExtractionError(f"PDF extraction exceeded its {timeout:g}s time limit")
+        try:
+            return pool.submit(extract_page_range, source, start, start + per_task, remaining, max_rss_mb)
+        except (RuntimeError, BrokenProcessPool):
+            # Another job's wedged worker reset the pool meanwhile
+            raise PdfExtractionError("PDF extraction was interrupted by a worker pool reset; please retry")
+
+    def result(future):
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0) + _GRACE_SECONDS)
+        except FutureTimeoutError:
+            # Only a range that is running past its alarm means a wedged
+            # worker; one still queued behind other jobs is just dropped
+            if future.running():
+                _reset_pool(pool)
+            else:
+                future.cancel()
+            raise PdfExtractionError(f"PDF extraction exceeded its {timeout:g}s time limit")
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            raise PdfExtractionError("PDF worker process crashed")
+        except CancelledError:
+            raise PdfExtractionError("PDF extraction was interrupted by a worker pool reset; please retry")
+
+    def digital_chars(texts):
+        # Scanned pages are OCR'd later; only text layers count toward the budget
+        return sum(len(t) + len(PAGE_SEPARATOR) for t in texts if not is_scanned_page(t))
+
+    pending = []
+    try:
+        # The first range also tells the page count
+        page_count, texts = result(submit(0))
+        parts = list(texts)
+        total = digital_chars(texts)
+        next_start = per_task
+
+        while total < (max_chars or float("inf")) and (pending or next_start < page_count):
+            # Keep the pool busy with the following ranges, in page order
+            while next_start < page_count and len(pending) < Config.PDF_WORKERS:
+                pending.append(submit(next_start))
+                next_start += per_task
+
+            _, texts = result(pending.pop(0))
+            parts.extend(texts)
+            total += digital_chars(texts)
+
+        complete = len(parts) >= page_count
+        if not complete:
+            print(f"📄 Stopped PDF extraction at page {len(parts)}/{page_count} (budget {max_chars} chars)")
+        return parts, complete
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def extract_pdf_text(source, max_chars: int = None, timeout: float = None):
+    """
+    Extract PDF text in the worker pool; see extract_pdf_pages.
+
+    Returns:
+        tuple (text, complete): text is None if no page has a text layer
+    """
+    pages, complete = extract_pdf_pages(source, max_chars, timeout)
+    if all(is_scanned_page(page_text) for page_text in pages):
+        return None, complete
+    return PAGE_SEPARATOR.join(pages), complete
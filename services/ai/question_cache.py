@@ -0,0 +1,223 @@
+# services/ai/question_cache.py
+"""
+Evaluation cache for mock-client questions.
+
+Students ask heavily overlapping questions ("When did you receive the
+notice?"), and a question's evaluation depends only on its text, so
+evaluations are cached in two tiers:
+
+- exact: keyed by the normalized question (case, punctuation and
+  whitespace folded), a dict lookup
+- near-duplicate: character trigram TF-IDF vectors (hashed into a fixed
+  number of dimensions) of every cached question are kept as rows of a
+  NumPy matrix; a miss in the exact tier is served by the most similar
+  cached question if its cosine similarity reaches the threshold, its
+  guard is identical and the caller's ``accept`` check passes
+
+Character similarity cannot tell "...your landlord?" from "...your
+landlord, you liar?", so callers pass a guard (the question's banned,
+leading and negation phrases and its local ethics verdict, see
+local_scorer.ethics_guard); lookups without one use the exact tier only.
+
+Entries expire after a TTL and the least recently used ones are evicted
+once the cache is full.
+"""
+
+import re
+import copy
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from config import Config
+
+NGRAM = 3
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, fold unicode and drop punctuation and extra whitespace."""
+    question = unicodedata.normalize("NFKC", question).lower()
+    return " ".join(_NON_WORD.sub(" ", question).split())
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "row", "guard")
+
+    def __init__(self, value, expires_at, row, guard):
+        self.value = value
+        self.expires_at = expires_at
+        self.row = row
+        self.guard = guard
+
+
+class QuestionCache:
+    """Exact + near-duplicate question cache (see module docstring)."""
+
+    def __init__(self, max_items=1024, ttl_seconds=24 * 3600, similarity=0.8, dimensions=2048):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.dimensions = dimensions
+
+        self._entries = OrderedDict()          # normalized question -> _Entry
+        self._row_keys = [None] * max_items    # matrix row -> normalized question
+        self._free_rows = list(range(max_items - 1, -1, -1))
+        self._tf = np.zeros((max_items, dimensions), dtype=np.float32)
+        self._df = np.zeros(dimensions, dtype=np.float32)
+        self._weighted = None                  # L2-normalized TF-IDF rows, rebuilt lazily
+        self._idf = None
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._exact_seconds = 0.0
+        self._near_seconds = 0.0
+
+    def _term_frequencies(self, normalized: str) -> np.ndarray:
+        padded = f" {normalized} "
+        tf = np.zeros(self.dimensions, dtype=np.float32)
+        indices = [hash(padded[i:i + NGRAM]) % self.dimensions for i in range(len(padded) - NGRAM + 1)]
+        np.add.at(tf, indices, 1.0)
+        # Sublinear term frequency
+        np.log1p(tf, out=tf, where=tf > 0)
+        return tf
+
+    def _rebuild(self):
+        n = len(self._entries)
+        self._idf = (np.log((1.0 + n) / (1.0 + self._df)) + 1.0).astype(np.float32)
+        weighted = self._tf * self._idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        np.divide(weighted, norms, out=weighted, where=norms > 0)
+        self._weighted = weighted
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._df -= self._tf[entry.row] > 0
+        self._tf[entry.row] = 0.0
+        self._row_keys[entry.row] = None
+        self._free_rows.append(entry.row)
+        self._weighted = None
+
+    def _lookup_near(self, normalized: str, guard, accept):
+        if guard is None or not self._entries or self.similarity > 1.0:
+            return None
+        if self._weighted is None:
+            self._rebuild()
+        query = self._term_frequencies(normalized) * self._idf
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        scores = self._weighted @ (query / norm)
+        candidates = np.flatnonzero(scores >= self.similarity)
+        # Most similar first; the first one with the same guard wins
+        for row in candidates[np.argsort(-scores[candidates])]:
+            key = self._row_keys[row]
+            entry = self._entries.get(key)
+            if entry is not None and entry.guard == guard and (accept is None or accept(entry.value)):
+                return key
+        return None
+
+    def get(self, question: str, guard=None, accept=None):
+        """
+        Cached evaluation of the question or of a near-duplicate of it.
+
+        Args:
+            question: The student's question
+            guard: Hashable features that must be identical for a
+                near-duplicate to be served (None: exact matches only)
+            accept: Optional ``accept(cached_value)`` check a near-duplicate
+                must also pass
+
+        Returns:
+            A copy of the cached evaluation dict, or None on a miss
+        """
+        started = time.perf_counter()
+        normalized = normalize_question(question)
+        now = time.time()
+
+        with self._lock:
+            key = normalized
+            entry = self._entries.get(key)
+            exact = entry is not None
+            if entry is None:
+                key = self._lookup_near(normalized, guard, accept)
+                entry = self._entries.get(key) if key is not None else None
+
+            if entry is not None and entry.expires_at < now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+
+            elapsed = time.perf_counter() - started
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            if exact:
+                self.exact_hits += 1
+                self._exact_seconds += elapsed
+            else:
+                self.near_hits += 1
+                self._near_seconds += elapsed
+            value = entry.value
+
+        return copy.deepcopy(value)
+
+    def set(self, question: str, evaluation: dict, guard=None):
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        tf = self._term_frequencies(normalized)
+        value = copy.deepcopy(evaluation)
+
+        with self._lock:
+            if normalized in self._entries:
+                self._remove(normalized)
+            while len(self._entries) >= self.max_items:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+            row = self._free_rows.pop()
+            self._tf[row] = tf
+            self._df += tf > 0
+            self._row_keys[row] = normalized
+            self._entries[normalized] = _Entry(value, time.time() + self.ttl_seconds, row, guard)
+            self._weighted = None
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.exact_hits + self.near_hits
+            total = hits + self.misses
+            return {
+                "items": len(self._entries),
+                "max_items": self.max_items,
+                "similarity_threshold": self.similarity,
+                "exact_hits": self.exact_hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+                "avg_exact_hit_us": round(self._exact_seconds / self.exact_hits * 1e6, 1) if self.exact_hits else 0.0,
+                "avg_near_hit_us": round(self._near_seconds / self.near_hits * 1e6, 1) if self.near_hits else 0.0,
+            }
+
+
+question_cache = QuestionCache(
+    max_items=Config.QUESTION_CACHE_MAX_ITEMS,
+    ttl_seconds=Config.QUESTION_CACHE_TTL_SECONDS,
+    similarity=Config.QUESTION_CACHE_SIMILARITY
+)
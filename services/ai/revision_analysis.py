@@ -0,0 +1,281 @@
+# services/ai/revision_analysis.py
+"""
+Incremental re-analysis of revised documents.
+
+Every analysis is remembered per user as paragraph fingerprints (hashes of
+whitespace/case-normalized paragraphs) plus the paragraph each clause was
+found in. When a new upload shares most of its paragraphs with one of the
+user's recent documents, only the changed or added paragraphs are sent to
+Gemini; clauses from unchanged paragraphs are reused, the summary is
+updated from the previous summary and the changes if any clause changed
+(so its cost tracks the size of the edit), and the risk changes between the two
+versions are reported under ``result["revision"]``. Anonymous sessions
+share one user ID, so their uploads are never treated as revisions.
+"""
+
+import os
+import copy
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from services.cache import SQLiteCache
+from services.ai.document_analyzer import (
+    SECTION_BOUNDARY, MAX_ANALYSIS_CHARS, MAX_MERGED_RISK_DRIVERS, VALID_RISKS,
+    split_into_chunks, analyze_chunks, summarize_parts
+)
+from services.ai.analysis_cache import CACHE_VERSION
+
+# Share of the new document's text that must be unchanged to count as a revision
+REVISION_MIN_OVERLAP = Config.REVISION_MIN_OVERLAP
+REVISION_HISTORY_PER_USER = Config.REVISION_HISTORY_PER_USER
+# Longer paragraphs are fingerprinted in line-aligned pieces of about this size
+PARAGRAPH_MAX_CHARS = 1200
+
+# Sessions without a login share this ID; their uploads are never diffed
+ANONYMOUS_USER_ID = "default_user"
+
+REVISION_CONTEXT = (
+    "\n\nThis text contains only the changed or newly added sections of a revised "
+    "document; the unchanged sections were analyzed before. Analyze only this text."
+)
+
+_history = SQLiteCache(
+    os.path.join(Config.CACHE_DIR, "revision_history.sqlite3"),
+    max_bytes=Config.ANALYSIS_CACHE_MAX_BYTES,
+    ttl_seconds=Config.ANALYSIS_CACHE_TTL_SECONDS
+)
+_history.delete_tag_not_in([CACHE_VERSION])
+_history_lock = threading.Lock()
+_summaries = ThreadPoolExecutor(max_workers=2, thread_name_prefix="revision-summary")
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+def split_paragraphs(text: str) -> list:
+    """Split text into paragraphs on section boundaries and blank lines."""
+    starts = sorted({0, *(m.start() for m in SECTION_BOUNDARY.finditer(text))})
+    paragraphs = []
+    for a, b in zip(starts, starts[1:] + [len(text)]):
+        for block in text[a:b].split("\n\n"):
+            # Keep fingerprints local: cut long blocks at line boundaries
+            while len(block) > PARAGRAPH_MAX_CHARS:
+                cut = block.rfind("\n", 0, PARAGRAPH_MAX_CHARS)
+                if cut <= 0:
+                    cut = PARAGRAPH_MAX_CHARS
+                paragraphs.append(block[:cut])
+                block = block[cut:]
+            if block.strip():
+                paragraphs.append(block)
+    return paragraphs
+
+
+def fingerprint(paragraph: str) -> str:
+    return hashlib.blake2b(_normalize(paragraph).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _clause_fingerprint(clause: dict, paragraphs: list, fingerprints: list):
+    """Fingerprint of the paragraph containing a clause's excerpt, or None."""
+    excerpt = _normalize(clause.get("text", ""))[:80]
+    if not excerpt:
+        return None
+    for paragraph, fp in zip(paragraphs, fingerprints):
+        if excerpt in _normalize(paragraph):
+            return fp
+    return None
+
+
+def _history_key(user_id: str) -> str:
+    return "user:" + hashlib.sha256(str(user_id).encode("utf-8")).hexdigest()
+
+
+def _load_history(user_id: str) -> list:
+    row = _history.get(_history_key(user_id))
+    if row is None or row[1] != CACHE_VERSION:
+        return []
+    return json.loads(row[0].decode("utf-8"))
+
+
+def tracks_revisions(user_id: str) -> bool:
+    """Whether uploads of this user are matched against their earlier documents."""
+    return Config.REVISION_ANALYSIS and bool(user_id) and user_id != ANONYMOUS_USER_ID
+
+
+def remember_analysis(user_id: str, doc_id: str, text: str, result: dict):
+    """Record an analysis so later revisions of the document can reuse it."""
+    if "error" in result or not tracks_revisions(user_id):
+        return
+
+    paragraphs = split_paragraphs(text)
+    fingerprints = [fingerprint(p) for p in paragraphs]
+    entry = {
+        "doc_id": doc_id,
+        "fingerprints": fingerprints,
+        "clause_fingerprints": [_clause_fingerprint(c, paragraphs, fingerprints) for c in result.get("clauses", [])],
+        "result": {k: v for k, v in result.items() if k != "revision"},
+    }
+
+    with _history_lock:
+        history = [h for h in _load_history(user_id) if h["doc_id"] != doc_id]
+        history = [entry] + history[:REVISION_HISTORY_PER_USER - 1]
+        _history.set(_history_key(user_id), json.dumps(history).encode("utf-8"), tag=CACHE_VERSION)
+
+
+def _find_previous(user_id: str, fingerprints: list, lengths: list):
+    """Most similar recent document of the user, with the unchanged text share."""
+    total = sum(lengths) or 1
+    best, best_overlap = None, 0.0
+    for entry in _load_history(user_id):
+        known = set(entry["fingerprints"])
+        unchanged = sum(n for fp, n in zip(fingerprints, lengths) if fp in known)
+        overlap = unchanged / total
+        if overlap > best_overlap:
+            best, best_overlap = entry, overlap
+    return best, best_overlap
+
+
+def _risk_changes(previous: list, current: list) -> list:
+    """Per-clause risk differences between two clause lists, matched by title."""
+    before = {_normalize(c.get("title", "")): c for c in previous}
+    after = {_normalize(c.get("title", "")): c for c in current}
+    changes = []
+    for key, clause in after.items():
+        if key not in before:
+            changes.append({"title": clause.get("title"), "before": None, "after": clause["risk"], "status": "added"})
+        elif before[key]["risk"] != clause["risk"]:
+            changes.append({"title": clause.get("title"), "before": before[key]["risk"], "after": clause["risk"], "status": "changed"})
+    for key, clause in before.items():
+        if key not in after:
+            changes.append({"title": clause.get("title"), "before": clause["risk"], "after": None, "status": "removed"})
+    return changes
+
+
+def analyze_revision(text: str, user_id: str, on_event=None):
+    """
+    Analyze a document as a revision of one of the user's recent documents.
+
+    Args:
+        text: Extracted document text
+        user_id: Owner's user ID
+        on_event: Optional callback for streamed partial results
+
+    Returns:
+        dict in the analyze_document schema plus a "revision" entry, or
+        None if the document is not a revision (analyze it in full instead)
+    """
+    if not tracks_revisions(user_id):
+        return None
+    paragraphs = split_paragraphs(text)
+    if not paragraphs:
+        return None
+    fingerprints = [fingerprint(p) for p in paragraphs]
+    lengths = [len(p) for p in paragraphs]
+
+    previous, overlap = _find_previous(user_id, fingerprints, lengths)
+    if previous is None or overlap < REVISION_MIN_OVERLAP:
+        return None
+
+    prior = copy.deepcopy(previous["result"])
+    current_fps = set(fingerprints)
+    known_fps = set(previous["fingerprints"])
+    normalized_text = _normalize(text)
+
+    # Clauses whose paragraph is unchanged (or whose excerpt is still present verbatim)
+    kept = []
+    for clause, fp in zip(prior.get("clauses", []), previous["clause_fingerprints"]):
+        excerpt = _normalize(clause.get("text", ""))
+        if (fp is not None and fp in current_fps) or (fp is None and excerpt and excerpt in normalized_text):
+            kept.append(clause)
+
+    changed = [p for p, fp in zip(paragraphs, fingerprints) if fp not in known_fps]
+    changed_chars = sum(len(p) for p in changed)
+    print(f"♻️ Revision of {previous['doc_id']}: {len(changed)}/{len(paragraphs)} paragraphs changed "
+          f"({changed_chars} chars), reusing {len(kept)} clause(s)")
+
+    if on_event:
+        on_event("stage", "Analyzing changes since your previous version")
+        for clause in kept:
+            on_event("clause", clause)
+
+    # Any changed or removed clause can change the key terms: update the
+    # summary from the previous one plus the changes only, alongside the
+    # analysis of the changed sections
+    kept_ids = {id(c) for c in kept}
+    removed = [c for c in prior.get("clauses", []) if id(c) not in kept_ids]
+    summary = None
+    if changed or removed:
+        parts = [f"Summary of the previous version:\n{prior['summary']}"]
+        if removed:
+            parts.append("Removed from this version:\n" + "\n".join(
+                f"- {c.get('title', '')}: {c.get('text', '')}" for c in removed
+            ))
+        parts.extend(changed)
+        summary = _summaries.submit(summarize_parts, parts)
+
+    results = []
+    if changed:
+        chunks = split_into_chunks("\n\n".join(changed), MAX_ANALYSIS_CHARS)
+        results = analyze_chunks(chunks, lambda index, total: REVISION_CONTEXT, on_event=on_event)
+        if None in results:
+            return None  # Fall back to a full analysis
+
+    if summary is not None:
+        try:
+            summary = summary.result()
+        except Exception as e:
+            print(f"⚠️ Revision summary failed, analyzing in full: {e}")
+            return None
+        if on_event:
+            on_event("document_type", summary["document_type"])
+            on_event("summary", summary["summary"])
+    else:
+        summary = {"document_type": prior["document_type"], "summary": prior["summary"]}
+
+    # Reused and new clauses in document order; drop excerpts seen twice
+    clauses, seen = [], set()
+    for clause in kept + [c for r in results for c in r.get("clauses", [])]:
+        key = _normalize(clause.get("text", "")) or _normalize(clause.get("title", ""))
+        if key not in seen:
+            seen.add(key)
+            clauses.append(clause)
+
+    def position(clause):
+        index = normalized_text.find(_normalize(clause.get("text", ""))[:80] or "\0")
+        return index if index >= 0 else len(normalized_text)
+
+    clauses.sort(key=position)
+
+    # The prior overall risk may have come from a removed clause: recompute it
+    # from the clauses that are still present and the changed sections
+    risks = [c["risk"] for c in clauses] + [r["overall_risk"] for r in results]
+    overall_risk = max(risks, key=VALID_RISKS.index) if risks else prior["overall_risk"]
+
+    risk_drivers, seen_drivers = [], set()
+    for driver in [d for r in results for d in r.get("risk_drivers", [])] + prior.get("risk_drivers", []):
+        key = _normalize(driver)
+        if key not in seen_drivers:
+            seen_drivers.add(key)
+            risk_drivers.append(driver)
+
+    result = {
+        "document_type": summary["document_type"],
+        "summary": summary["summary"],
+        "overall_risk": overall_risk,
+        "risk_drivers": risk_drivers[:MAX_MERGED_RISK_DRIVERS],
+        "clauses": clauses,
+        "revision": {
+            "previous_doc_id": previous["doc_id"],
+            "changed_paragraphs": len(changed),
+            "total_paragraphs": len(paragraphs),
+            "changed_chars": changed_chars,
+            "reused_clauses": len(kept),
+            "previous_overall_risk": prior["overall_risk"],
+            "risk_changes": _risk_changes(prior.get("clauses", []), clauses),
+        },
+    }
+    print(f"✅ Revision analysis complete: {result['overall_risk']} risk, "
+          f"{len(result['revision']['risk_changes'])} risk change(s)")
+    return result
@@ -0,0 +1,556 @@
+# services/ai/simulator.py
+"""
+Simulated Gemini and Document AI backends for load tests and benchmarks.
+
+Selected with ``AI_BACKEND``:
+
+- ``live``: the real services (default)
+- ``simulated``: no network calls. Requests found in the cassette are
+  replayed; anything else gets a synthesized, schema-valid response
+  (document analyses, question/document/progress evaluations, client
+  replies, conversation notes, OCR text). Every call waits for a latency
+  drawn from a log-normal distribution and may fail with an injected
+  error or, during periodic 429 storms, with TooManyRequests, so the
+  retry, circuit breaker and governor paths are exercised as in
+  production
+- ``record``: the real services, with every prompt/response pair appended
+  to the cassette
+
+The cassette is JSONL, one request per line, in the same shape as the
+project's request logs::
+
+    {"request_id": "<sha256 of the request>", "title": "<model or processor>",
+     "kind": "generate" | "ocr", "body": "<response text>", ...}
+"""
+
+import io
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+
+from google.api_core import exceptions as api_exceptions
+
+from config import Config
+
+LIVE = "live"
+SIMULATED = "simulated"
+RECORD = "record"
+
+
+def request_key(kind: str, title: str, payload, options=None) -> str:
+    """Cassette key of a request (prompt whitespace is normalized)."""
+    if isinstance(payload, str):
+        payload = " ".join(payload.split())
+    elif isinstance(payload, bytes):
+        payload = hashlib.sha256(payload).hexdigest()
+    else:
+        payload = json.dumps(payload, sort_keys=True, default=str)
+    material = json.dumps([kind, title, options, payload], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LatencyModel:
+    """Log-normal latency with the given median and 99th percentile."""
+
+    def __init__(self, median_ms: float, p99_ms: float):
+        self.median_ms = median_ms
+        self.p99_ms = max(p99_ms, median_ms)
+        # z(0.99) = 2.326
+        self.sigma = math.log(self.p99_ms / self.median_ms) / 2.326 if median_ms > 0 else 0.0
+
+    def sample(self, rng) -> float:
+        """Latency in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.median_ms), self.sigma) / 1000
+
+
+class FaultInjector:
+    """
+    Random server errors at ``error_rate``, plus 429 storms: for
+    ``storm_seconds`` out of every ``storm_every_seconds``, calls fail with
+    TooManyRequests at ``storm_error_rate``.
+    """
+
+    ERRORS = (api_exceptions.InternalServerError, api_exceptions.ServiceUnavailable, api_exceptions.DeadlineExceeded)
+
+    def __init__(self, error_rate=0.0, storm_every_seconds=0.0, storm_seconds=10.0, storm_error_rate=0.9):
+        self.error_rate = error_rate
+        self.storm_every_seconds = storm_every_seconds
+        self.storm_seconds = storm_seconds
+        self.storm_error_rate = storm_error_rate
+        self.started = time.monotonic()
+
+    def in_storm(self) -> bool:
+        if self.storm_every_seconds <= 0:
+            return False
+        return (time.monotonic() - self.started) % self.storm_every_seconds < self.storm_seconds
+
+    def check(self, rng):
+        """Raise the injected error for this call, if any."""
+        if self.in_storm() and rng.random() < self.storm_error_rate:
+            raise api_exceptions.TooManyRequests("Simulated 429 storm: quota exceeded")
+        if rng.random() < self.error_rate:
+            error = rng.choice(self.ERRORS)
+            raise error(f"Simulated {error.__name__}")
+
+
+class Cassette:
+    """Append-only JSONL store of recorded requests, indexed by request_id."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._records = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        record = json.loads(line)
+                        self._records[record["request_id"]] = record
+        except FileNotFoundError:
+            pass
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, key: str):
+        return self._records.get(key)
+
+    def append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._records[record["request_id"]] = record
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+# =========================================================
+# Response synthesis
+# =========================================================
+_SENTENCE = re.compile(r"[^.!?\n]{30,300}[.!?]")
+
+CLIENT_REPLIES = (
+    "I... I'm honestly not sure. It all happened so fast and nobody explained anything to me.",
+    "It was about two months ago, I think. I still have the messages on my phone somewhere.",
+    "No, I never got anything in writing. They just told me over the phone and I panicked.",
+    "I tried to talk to them twice, but they wouldn't listen. I'm really worried about what happens next.",
+    "I paid every time, on time. I don't understand why this is happening to me.",
+    "I think I signed something at the start, but I don't remember exactly what it said.",
+)
+
+RISK_KEYWORDS = (
+    ("High", ("terminat", "penalt", "liabil", "indemn", "forfeit", "evict", "waive")),
+    ("Medium", ("pay", "rent", "fee", "deposit", "notice", "renew", "interest")),
+)
+
+DOCUMENT_TYPES = (
+    ("Rental Agreement", ("lease", "tenant", "landlord", "rent")),
+    ("Employment Contract", ("employ", "salary", "employer")),
+    ("NDA", ("confidential", "disclos")),
+    ("Service Agreement", ("service", "contractor", "supplier")),
+)
+
+
+def _seeded(text: str) -> random.Random:
+    return random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+
+
+def _after(prompt: str, marker: str) -> str:
+    return prompt.split(marker, 1)[1] if marker in prompt else prompt
+
+
+def _synthesize_analysis(prompt: str) -> str:
+    document = _after(prompt, "DOCUMENT TEXT:")
+    lower = document.lower()
+    sentences = [s.strip() for s in _SENTENCE.findall(document)]
+    rng = _seeded(document[:2000])
+
+    clauses = []
+    picks = sentences if len(sentences) <= 5 else sorted(rng.sample(range(len(sentences)), 5))
+    for item in picks[:5]:
+        excerpt = sentences[item] if isinstance(item, int) else item
+        risk = next((level for level, words in RISK_KEYWORDS if any(w in excerpt.lower() for w in words)), "Low")
+        title = " ".join(excerpt.split()[:4]).strip(",;:").title() + " Clause"
+        clauses.append({
+            "title": title,
+            "text": excerpt,
+            "risk": risk,
+            "suggestion": "Understanding this clause is important. Consider reviewing it with a legal professional.",
+        })
+
+    risks = [c["risk"] for c in clauses] or ["Low"]
+    overall = "High" if "High" in risks else "Medium" if "Medium" in risks else "Low"
+    document_type = next(
+        (name for name, words in DOCUMENT_TYPES if any(w in lower for w in words)), "Legal Document"
+    )
+    return json.dumps({
+        "document_type": document_type,
+        "summary": " ".join(sentences[:3]) or "This document sets out the terms agreed between the parties.",
+        "overall_risk": overall,
+        "risk_drivers": [f"{c['title']} carries {c['risk'].lower()} risk" for c in clauses if c["risk"] != "Low"][:4]
+        or ["No significant risk factors identified"],
+        "clauses": clauses,
+    })
+
+
+def _public_evaluation(question: str) -> dict:
+    from services.ai.local_scorer import score_question
+    score = score_question(question)
+    return {field: score[field] for field in ("clarity", "relevance", "ethics", "feedback")}
+
+
+def _synthesize_batch_evaluation(prompt: str) -> str:
+    items = json.loads(_after(prompt, "Student Questions:").split("\n\nEvaluations:")[0])
+    return json.dumps([{"id": item["id"], **_public_evaluation(item["question"])} for item in items])
+
+
+def _synthesize_evaluation(prompt: str) -> str:
+    question = _after(prompt, "Student Question:").split("\n\nEvaluation:")[0].strip()
+    return json.dumps(_public_evaluation(question))
+
+
+def _synthesize_document_evaluation(prompt: str) -> str:
+    from services.ai.local_scorer import score_document
+    document_type = re.search(r"Document Type: (.*)", prompt)
+    text = _after(prompt, "Document Content:\n---").split("\n---")[0]
+    score = score_document(text, document_type.group(1) if document_type else "Legal Document")
+    return json.dumps({
+        "clarity_score": score["clarity_score"],
+        "relevance_score": score["relevance_score"],
+        "ethics_score": score["ethics_score"],
+        "feedback": score["feedback"],
+        "suggestions": score["suggestions"],
+        "strengths": score["strengths"],
+        "overall_comment": score["overall_comment"],
+    })
+
+
+def _synthesize_progress(prompt: str) -> str:
+    scores = [int(s) for s in re.findall(r"Score (\d+)/100", prompt)] or [70]
+    base = sum(scores) / len(scores)
+    rng = _seeded(prompt)
+
+    def skill(description):
+        score = int(max(0, min(100, base + rng.uniform(-8, 8))))
+        grade = next(g for threshold, g in ((90, "A"), (80, "B+"), (70, "B"), (60, "C+"), (0, "C")) if score >= threshold)
+        return {"grade": grade, "score": score, "description": description}
+
+    return json.dumps({
+        "skills": {
+            "Ethics": skill("Consistent professional conduct"),
+            "Logic": skill("Structured legal reasoning"),
+            "Research": skill("Gathers relevant facts"),
+            "Negotiation": skill("Developing client communication"),
+        },
+        "strengths": ["Regular practice", "Clear questioning"],
+        "areas_for_improvement": ["Explore more case types", "Ask more open questions"],
+        "recommendations": [
+            "Continue mock client interviews",
+            "Practice drafting formal documents",
+            "Review feedback after each session",
+        ],
+        "overall_assessment": "You are making steady progress. Keep practicing to build consistency.",
+        "progress_level": "Advanced" if base >= 85 else "Intermediate" if base >= 60 else "Beginner",
+    })
+
+
+def _synthesize_notes(prompt: str) -> str:
+    statements = re.findall(r"^Client: (.+)$", _after(prompt, "NEW EXCHANGES:"), re.MULTILINE)
+    notes = _after(prompt, "CURRENT NOTES:").split("NEW EXCHANGES:")[0].strip()
+    notes = "" if notes == "(none yet)" else notes
+    added = " ".join(f"The client said: {s.strip()}" for s in statements)
+    return " ".join((notes + " " + added).split()[-150:])
+
+
+def _synthesize_reply(prompt: str) -> str:
+    question = prompt.rsplit("Student:", 1)[-1]
+    return _seeded(question).choice(CLIENT_REPLIES)
+
+
+# (marker in prompt, synthesizer), first match wins
+SYNTHESIZERS = (
+    ("DOCUMENT TEXT:", _synthesize_analysis),
+    ("Student Questions:", _synthesize_batch_evaluation),
+    ("Student Question:", _synthesize_evaluation),
+    ('"clarity_score"', _synthesize_document_evaluation),
+    ("FOUR key skills", _synthesize_progress),
+    ("UPDATED NOTES:", _synthesize_notes),
+    ("LEGAL CLIENT", _synthesize_reply),
+)
+
+
+def synthesize_text(prompt: str) -> str:
+    for marker, synthesize in SYNTHESIZERS:
+        if marker in prompt:
+            return synthesize(prompt)
+    return "OK"
+
+
+def _ocr_pages(content: bytes, mime_type: str) -> int:
+    if mime_type != "application/pdf":
+        return 1
+    try:
+        import PyPDF2
+        return max(1, len(PyPDF2.PdfReader(io.BytesIO(content)).pages))
+    except Exception:
+        return max(1, len(re.findall(rb"/Type\s*/Page\b", content)))
+
+
+def synthesize_ocr(content: bytes, mime_type: str):
+    """Document AI style (text, [(start, end) per page]) for scanned content."""
+    rng = random.Random(hashlib.sha256(content).digest())
+    pages, text = [], ""
+    for number in range(_ocr_pages(content, mime_type)):
+        start = len(text)
+        text += f"Page {number + 1}\n" + " ".join(
+            rng.choice((
+                "The tenant shall pay the monthly rent on or before the fifth day of each month.",
+                "Either party may terminate this agreement by giving thirty days written notice.",
+                "The landlord may retain the security deposit to cover unpaid rent or damages.",
+                "The employee shall not disclose confidential information during or after employment.",
+                "Any dispute arising under this agreement shall be resolved by arbitration.",
+                "Late payments shall incur a penalty of two percent per month.",
+            ))
+            for _ in range(8)
+        ) + "\n"
+        pages.append((start, len(text)))
+    return text, pages
+
+
+def _ocr_result(text: str, pages) -> SimpleNamespace:
+    return SimpleNamespace(document=SimpleNamespace(
+        text=text,
+        pages=[
+            SimpleNamespace(layout=SimpleNamespace(text_anchor=SimpleNamespace(
+                text_segments=[SimpleNamespace(start_index=start, end_index=end)]
+            )))
+            for start, end in pages
+        ]
+    ))
+
+
+# =========================================================
+# Backends
+# =========================================================
+class Simulator:
+    """Shared state of the simulated backends: cassette, latency, faults, counters."""
+
+    def __init__(self, cassette_path, latency=None, ocr_latency=None, faults=None,
+                 stream_chunk_chars=60, seed=None):
+        self.cassette = Cassette(cassette_path)
+        self.latency = latency or LatencyModel(800, 4000)
+        self.ocr_latency = ocr_latency or LatencyModel(1500, 6000)
+        self.faults = faults or FaultInjector()
+        self.stream_chunk_chars = stream_chunk_chars
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.counts = {"replayed": 0, "synthesized": 0, "recorded": 0, "errors": 0, "throttled": 0}
+
+    @classmethod
+    def from_config(cls):
+        return cls(
+            Config.AI_CASSETTE_PATH,
+            latency=LatencyModel(Config.SIM_LATENCY_MEDIAN_MS, Config.SIM_LATENCY_P99_MS),
+            ocr_latency=LatencyModel(Config.SIM_OCR_LATENCY_MEDIAN_MS, Config.SIM_OCR_LATENCY_P99_MS),
+            faults=FaultInjector(
+                Config.SIM_ERROR_RATE, Config.SIM_STORM_EVERY_SECONDS,
+                Config.SIM_STORM_SECONDS, Config.SIM_STORM_ERROR_RATE
+            ),
+            stream_chunk_chars=Config.SIM_STREAM_CHUNK_CHARS,
+            seed=Config.SIM_SEED
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _draw(self, latency_model):
+        """(latency seconds, injected error or None) for one call."""
+        with self._rng_lock:
+            delay = latency_model.sample(self._rng)
+            try:
+                self.faults.check(self._rng)
+                error = None
+            except api_exceptions.GoogleAPICallError as e:
+                error = e
+        return delay, error
+
+    def _fail(self, error, delay):
+        # Errors come back faster than full responses
+        time.sleep(delay * 0.2)
+        self._count("throttled" if isinstance(error, api_exceptions.TooManyRequests) else "errors")
+        raise error
+
+    def respond(self, kind, title, payload, options, synthesize):
+        """Recorded body for the request, or a synthesized one."""
+        record = self.cassette.get(request_key(kind, title, payload, options))
+        if record is not None:
+            self._count("replayed")
+            return record
+        self._count("synthesized")
+        return synthesize()
+
+    def record(self, kind, title, payload, options, body, started, **extra):
+        self.cassette.append({
+            "request_id": request_key(kind, title, payload, options),
+            "title": title,
+            "kind": kind,
+            "prompt": payload if isinstance(payload, str) else None,
+            "options": options,
+            "body": body,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            **extra,
+        })
+        self._count("recorded")
+
+    def model(self, model_name, generation_config=None):
+        return SimulatedModel(self, model_name, generation_config)
+
+    def recording_model(self, model, model_name, generation_config=None):
+        return RecordingModel(self, model, model_name, generation_config)
+
+    def documentai_client(self):
+        return SimulatedDocumentAIClient(self)
+
+    def recording_documentai_client(self, client):
+        return RecordingDocumentAIClient(self, client)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "backend": Config.AI_BACKEND,
+            "cassette": {"path": self.cassette.path, "records": len(self.cassette)},
+            "latency_ms": {"median": self.latency.median_ms, "p99": self.latency.p99_ms},
+            "error_rate": self.faults.error_rate,
+            "in_429_storm": self.faults.in_storm(),
+            **counts,
+        }
+
+
+class SimulatedModel:
+    """Stands in for genai.GenerativeModel."""
+
+    def __init__(self, simulator, model_name, generation_config=None):
+        self.simulator = simulator
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        sim = self.simulator
+        delay, error = sim._draw(sim.latency)
+        timeout = (request_options or {}).get("timeout")
+        if error is None and timeout is not None and delay > timeout:
+            error = api_exceptions.DeadlineExceeded("Simulated deadline exceeded")
+            delay = timeout * 5  # _fail waits 20% of this: the full timeout
+        if error is not None:
+            sim._fail(error, delay)
+
+        text = sim.respond(
+            "generate", self.model_name, contents, self.generation_config,
+            lambda: {"body": synthesize_text(contents if isinstance(contents, str) else json.dumps(contents))}
+        )["body"]
+
+        if not stream:
+            time.sleep(delay)
+            return SimpleNamespace(text=text)
+        return self._stream(text, delay)
+
+    def _stream(self, text, delay):
+        size = max(1, self.simulator.stream_chunk_chars)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        # First chunk after 30% of the latency, the rest spread over the remainder
+        time.sleep(delay * 0.3)
+        yield SimpleNamespace(text=chunks[0])
+        for chunk in chunks[1:]:
+            time.sleep(delay * 0.7 / (len(chunks) - 1))
+            yield SimpleNamespace(text=chunk)
+
+
+class RecordingModel:
+    """Real model whose prompt/response pairs are appended to the cassette."""
+
+    def __init__(self, simulator, model, model_name, generation_config=None):
+        self.simulator = simulator
+        self.model = model
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        started = time.monotonic()
+        response = self.model.generate_content(contents, stream=stream, request_options=request_options)
+        if not stream:
+            self.simulator.record("generate", self.model_name, contents, self.generation_config, response.text, started)
+            return response
+        return self._stream(contents, response, started)
+
+    def _stream(self, contents, response, started):
+        texts = []
+        for chunk in response:
+            texts.append(chunk.text)
+            yield chunk
+        self.simulator.record("generate", self.model_name, contents, self.generation_config, "".join(texts), started)
+
+
+class SimulatedDocumentAIClient:
+    """Stands in for documentai.DocumentProcessorServiceClient."""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    @staticmethod
+    def processor_path(project, location, processor):
+        return f"projects/{project}/locations/{location}/processors/{processor}"
+
+    def process_document(self, request):
+        sim = self.simulator
+        raw = request["raw_document"]
+        delay, error = sim._draw(sim.ocr_latency)
+        if error is not None:
+            sim._fail(error, delay)
+
+        def synthesize():
+            text, pages = synthesize_ocr(raw["content"], raw["mime_type"])
+            return {"body": text, "pages": pages}
+
+        record = sim.respond("ocr", "documentai", raw["content"], raw["mime_type"], synthesize)
+        time.sleep(delay)
+        return _ocr_result(record["body"], record.get("pages") or [(0, len(record["body"]))])
+
+
+class RecordingDocumentAIClient:
+    """Real Document AI client whose results are appended to the cassette."""
+
+    def __init__(self, simulator, client):
+        self.simulator = simulator
+        self.client = client
+
+    def processor_path(self, *args):
+        return self.client.processor_path(*args)
+
+    def process_document(self, request):
+        started = time.monotonic()
+        result = self.client.process_document(request=request)
+        raw = request["raw_document"]
+        pages = [
+            (int(segment.start_index or 0), int(segment.end_index))
+            for page in result.document.pages
+            for segment in page.layout.text_anchor.text_segments[:1]
+        ]
+        self.simulator.record(
+            "ocr", "documentai", raw["content"], raw["mime_type"], result.document.text, started, pages=pages
+        )
+        return result
+
+
+simulator = Simulator.from_config() if Config.AI_BACKEND in (SIMULATED, RECORD) else None
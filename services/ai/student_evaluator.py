@@ -1,10 +1,6 @@
 # services/ai/student_evaluator.py
 
-import os
-import google.generativeai as genai
-
-# Initialize Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from services.ai.gemini_client import gemini, PROGRESS
 
 def evaluate_student_progress(student_history: list, xp: int, level_name: str) -> dict:
     """
@@ -86,12 +82,10 @@ Respond in JSON format:
 Be encouraging and constructive."""
 
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash-exp")
-        response = model.generate_content(prompt)
+        text = gemini.generate(prompt, name="student_evaluator", priority=PROGRESS).strip()
         
         # safe JSON parsing
         import json
-        text = response.text.strip()
         if text.startswith("```json"):
             text = text[7:-3].strip()
         elif text.startswith("```"):
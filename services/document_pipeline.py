@@ -0,0 +1,189 @@
+"""
+Document Analysis Pipeline
+OCR -> Gemini analysis -> report store -> Firestore, run as a background
+job so the upload request returns immediately. The Cloud Storage upload is
+handed to the durable background uploader.
+"""
+
+import sqlite3
+
+from config import Config
+from services.job_queue import JobQueue, current_job
+from services.ai.ocr_client import extract_text
+from services.ai.document_analyzer import analyze_document, analyze_long_document, MAX_ANALYSIS_CHARS, LONG_DOCUMENT_MAX_CHARS
+from services.ai.analysis_cache import get_cached_analysis, set_cached_analysis
+from services.ai.revision_analysis import analyze_revision, remember_analysis
+from services.report_store import new_report_id
+from services.report_service import save_analysis
+from services.upload_ingest import Upload
+from services.upload_queue import upload_queue
+
+analysis_queue = JobQueue(
+    "analysis",
+    workers=Config.ANALYSIS_WORKERS,
+    max_queued=Config.ANALYSIS_QUEUE_SIZE,
+    retention_seconds=Config.ANALYSIS_JOB_RETENTION_SECONDS,
+    aging_per_second=Config.ANALYSIS_JOB_AGING_BYTES_PER_SECOND
+)
+
+
+class AnalysisError(Exception):
+    """User-facing failure of the analysis pipeline."""
+
+
+def run_analysis(upload: Upload, user_id: str, username: str) -> dict:
+    """
+    Run the full analysis pipeline for one uploaded document.
+
+    Every stage reads the upload's spool file instead of a copy of its
+    bytes; the file is deleted when the pipeline finishes.
+
+    Args:
+        upload: Ingested upload (spool file, hash and detected type)
+        user_id: Owner's user ID
+        username: Owner's display name
+
+    Returns:
+        dict with text, result, doc_id and firestore_doc_id
+
+    Raises:
+        AnalysisError: If no text could be extracted or analysis failed
+    """
+    try:
+        return _run_analysis(upload, user_id, username)
+    finally:
+        upload.discard()
+
+
+def _run_analysis(upload: Upload, user_id: str, username: str) -> dict:
+    from services.storage_service import document_blob_name
+    from services.firestore_service import create_document, get_user, create_user
+
+    filename, mime, content_hash = upload.filename, upload.mime, upload.sha256
+    print(f"📤 Processing: {filename} ({mime}, {upload.size} bytes)")
+
+    # Stream partial results to SSE clients of this job
+    job = current_job()
+    on_event = job.publish if job and Config.ANALYSIS_STREAMING else None
+
+    # Only as much text as Gemini will see
+    budget = LONG_DOCUMENT_MAX_CHARS if Config.LONG_DOCUMENT_ANALYSIS else MAX_ANALYSIS_CHARS
+
+    # Same bytes under the same prompt/model: skip OCR and Gemini entirely
+    cached = get_cached_analysis(content_hash)
+    if cached:
+        print("⚡ Analysis cache hit")
+        text, result = cached["text"], cached["result"]
+    else:
+        # Extract text (with smart OCR detection)
+        if on_event:
+            on_event("stage", "Reading your document")
+        text = extract_text(upload.path, mime, content_hash=content_hash, max_chars=budget)
+
+        if text.startswith("ERROR:"):
+            raise AnalysisError(text[len("ERROR:"):].strip())
+
+        if not text or len(text.strip()) < 50:
+            raise AnalysisError("Could not extract meaningful text from document.")
+
+        # Analyze document with Gemini
+        if on_event:
+            on_event("stage", "Analyzing clauses")
+
+        # A revision of one of the user's recent documents: analyze only the changes
+        result = analyze_revision(text[:budget], user_id, on_event=on_event)
+        if result is None and Config.LONG_DOCUMENT_ANALYSIS:
+            result = analyze_long_document(text[:budget], on_event=on_event)
+        elif result is None:
+            result = analyze_document(text, on_event=on_event)
+
+        if "error" in result and not result.get("clauses"):
+            raise AnalysisError("Analysis failed. Please try again.")
+
+        # A revision result is derived from this user's history, and a partial
+        # one lacks failed sections; only complete analyses of the bytes
+        # themselves may be shared through the cache
+        if "revision" not in result and not result.get("sections_failed"):
+            set_cached_analysis(content_hash, text, result)
+
+    # Save the result; the PDF report is rendered on first download
+    doc_id = new_report_id()
+
+    try:
+        save_analysis(doc_id, result)
+    except Exception as e:
+        print(f"⚠️ Saving analysis for PDF report failed: {e}")
+        # Continue anyway, user can still see web results
+
+    try:
+        remember_analysis(user_id, doc_id, text[:budget], result)
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Recording analysis for revision matching failed: {e}")
+
+    # ========== FIREBASE INTEGRATION ==========
+    firestore_doc_id = None
+    try:
+        # Ensure user exists in Firestore
+        user = get_user(user_id)
+        if not user:
+            create_user(user_id, username, role="citizen")
+
+        # Extract risk data
+        risk_flags = [clause.get('text', '')[:100] for clause in result.get('clauses', []) if clause.get('risk') in ['High', 'Critical']]
+        risk_score = result.get('overall_risk_score', 50)
+
+        # Save to Firestore with the report link; the background uploader
+        # replaces it with the Cloud Storage URL once the file is stored
+        firestore_doc_id = create_document(
+            owner_id=user_id,
+            title=filename or "Untitled Document",
+            summary=result.get('summary', 'No summary available')[:500],
+            risk_flags=risk_flags[:5],  # Limit to 5 flags
+            risk_score=risk_score,
+            file_url=f"/document/download_pdf/{doc_id}"
+        )
+
+        print(f"✅ Document saved to Firestore: {firestore_doc_id}")
+
+    except Exception as e:
+        print(f"⚠️ Firebase save failed: {e}")
+        # Continue anyway - analysis still works without Firebase
+
+    # Upload to Cloud Storage in the background (optional); failures are
+    # retried there and never delay the analysis result
+    try:
+        upload_queue.enqueue(
+            upload.path,
+            document_blob_name(user_id, filename),
+            mime,
+            firestore_doc_id=firestore_doc_id
+        )
+    except Exception as storage_error:
+        print(f"⚠️ Queueing Cloud Storage upload failed: {storage_error}")
+
+    return {
+        "text": text,
+        "result": result,
+        "doc_id": doc_id,
+        "firestore_doc_id": firestore_doc_id
+    }
+
+
+def submit_analysis(upload: Upload, user_id: str, username: str):
+    """
+    Queue an upload for background analysis.
+
+    Smaller uploads are scheduled first, since their cost is roughly
+    proportional to their size (OCR pages, text length).
+
+    Returns:
+        Job
+
+    Raises:
+        QueueFullError: If the analysis queue is at capacity
+    """
+    return analysis_queue.submit(
+        run_analysis, upload, user_id, username,
+        cost=upload.size,
+        owner=user_id
+    )
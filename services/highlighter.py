@@ -0,0 +1,190 @@
+"""
+Clause Highlighter
+Finds analyzed clause excerpts in the document text in one pass and
+renders them as escaped HTML with <mark> tags, or as character offsets
+the browser can apply itself.
+"""
+
+from collections import deque
+from markupsafe import Markup, escape
+
+# Excerpts shorter than this are too ambiguous to highlight
+MIN_CLAUSE_CHARS = 10
+VALID_RISKS = ("low", "medium", "high")
+
+
+def _normalize_with_offsets(text: str):
+    """
+    Lowercase ``text`` and collapse whitespace runs to a single space.
+
+    Returns:
+        tuple (normalized, offsets) where offsets[i] is the index in
+        ``text`` of normalized character i
+    """
+    chars = []
+    offsets = []
+    in_space = False
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            if in_space:
+                continue
+            in_space = True
+            chars.append(" ")
+        else:
+            in_space = False
+            lower = ch.lower()
+            # Keep offsets 1:1 for characters whose lowercase form is longer
+            chars.append(lower if len(lower) == 1 else ch)
+        offsets.append(i)
+    return "".join(chars), offsets
+
+
+def _normalize(text: str) -> str:
+    return _normalize_with_offsets(text.strip())[0]
+
+
+class _AhoCorasick:
+    """Multi-pattern matcher: every occurrence of every pattern in one scan."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((index, len(pattern)))
+
+        # Breadth-first construction of failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def finditer(self, text):
+        """Yield (pattern_index, start, end) for every match in ``text``."""
+        node = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for index, length in out[node]:
+                yield index, i - length + 1, i + 1
+
+
+def find_clause_spans(text: str, clauses: list) -> list:
+    """
+    Locate each clause excerpt in the document text.
+
+    Matching is case-insensitive and whitespace-insensitive. Each clause is
+    highlighted at most once; longer clauses win when spans overlap, and a
+    clause falls back to a later occurrence if its first one is taken.
+
+    Args:
+        text: Full document text
+        clauses: List of clause dictionaries with 'text' and 'risk' fields
+
+    Returns:
+        List of dicts with start/end (offsets into ``text``), risk and
+        clause index, sorted by start
+    """
+    patterns = []
+    owners = []
+    seen = {}
+    for index, clause in enumerate(clauses):
+        pattern = _normalize(clause.get("text", "") or "")
+        if len(pattern) < MIN_CLAUSE_CHARS:
+            continue
+        if pattern in seen:
+            continue
+        seen[pattern] = len(patterns)
+        patterns.append(pattern)
+        owners.append(index)
+
+    if not patterns:
+        return []
+
+    normalized, offsets = _normalize_with_offsets(text)
+
+    occurrences = [[] for _ in patterns]
+    for pattern_index, start, end in _AhoCorasick(patterns).finditer(normalized):
+        occurrences[pattern_index].append((start, end))
+
+    # Longest clauses first, each at its earliest non-overlapping occurrence
+    taken = []
+    spans = []
+    for pattern_index in sorted(range(len(patterns)), key=lambda i: -len(patterns[i])):
+        for start, end in occurrences[pattern_index]:
+            if all(end <= s or start >= e for s, e in taken):
+                taken.append((start, end))
+                clause_index = owners[pattern_index]
+                risk = (clauses[clause_index].get("risk") or "Medium").lower()
+                spans.append({
+                    "start": offsets[start],
+                    "end": offsets[end - 1] + 1,
+                    "risk": risk if risk in VALID_RISKS else "medium",
+                    "clause": clause_index
+                })
+                break
+
+    spans.sort(key=lambda s: s["start"])
+    return spans
+
+
+def highlight_text(text: str, clauses: list) -> Markup:
+    """
+    Highlight clause text in the document based on risk levels.
+
+    Args:
+        text: Full document text
+        clauses: List of clause dictionaries with 'text' and 'risk' fields
+
+    Returns:
+        Markup: Escaped document HTML with highlighted text in <mark> tags
+    """
+    parts = []
+    pos = 0
+    for span in find_clause_spans(text, clauses):
+        parts.append(escape(text[pos:span["start"]]))
+        parts.append(Markup('<mark class="risk-{}">{}</mark>').format(span["risk"], text[span["start"]:span["end"]]))
+        pos = span["end"]
+    parts.append(escape(text[pos:]))
+    return Markup("").join(parts)
+
+
+def highlight_offsets(text: str, clauses: list) -> list:
+    """
+    Clause spans for client-side highlighting.
+
+    Offsets are converted to UTF-16 code units so they can be used directly
+    with JavaScript string indices.
+    """
+    spans = find_clause_spans(text, clauses)
+    if spans and any(ord(ch) > 0xFFFF for ch in text):
+        # Characters outside the BMP take two UTF-16 code units
+        extra = []
+        count = 0
+        for ch in text:
+            extra.append(count)
+            if ord(ch) > 0xFFFF:
+                count += 1
+        extra.append(count)
+        for span in spans:
+            span["start"] += extra[span["start"]]
+            span["end"] += extra[span["end"]]
+    return spans
@@ -0,0 +1,250 @@
+"""
+Background Job Queue
+Runs slow request work (OCR, Gemini analysis, uploads) on a small worker
+pool so request threads can return immediately with a job ID.
+"""
+
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the queue is at capacity and cannot accept new work."""
+
+
+_local = threading.local()
+
+
+def current_job():
+    """The Job running on the calling worker thread, or None."""
+    return getattr(_local, "job", None)
+
+
+class Job:
+    """A single unit of background work and its outcome."""
+
+    def __init__(self, fn, args, kwargs, cost, owner=None):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cost = cost
+        self.owner = owner
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+        # Progress events published while running, e.g. streamed results
+        self.events = []
+        self._events_cond = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def wait(self, timeout=None):
+        """Block until the job finishes. Returns True if it did."""
+        return self._done.wait(timeout)
+
+    def publish(self, event, data=None):
+        """Append a progress event for streaming clients."""
+        with self._events_cond:
+            self.events.append((event, data))
+            self._events_cond.notify_all()
+
+    def events_since(self, index, timeout=None):
+        """
+        Events after the first ``index``, waiting up to ``timeout`` seconds
+        for new ones while the job is unfinished.
+
+        Returns:
+            tuple (events, finished)
+        """
+        with self._events_cond:
+            if len(self.events) <= index and not self.finished:
+                self._events_cond.wait(timeout)
+            return self.events[index:], self.finished
+
+    def _notify_finished(self):
+        with self._events_cond:
+            self._events_cond.notify_all()
+
+    def to_dict(self):
+        """Public, JSON-safe view of the job (no result payload)."""
+        now = time.time()
+        started = self.started_at or now
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "wait_seconds": round(started - self.submitted_at, 3),
+            "run_seconds": round((self.finished_at or now) - started, 3) if self.started_at else 0.0,
+        }
+
+
+class JobQueue:
+    """
+    Bounded, shortest-job-first worker pool with aging.
+
+    Jobs are ordered by their estimated ``cost`` (e.g. upload size) so
+    small documents are not stuck behind large scanned ones. A waiting
+    job's cost is lowered by ``aging_per_second`` for every second it has
+    waited, so a steady stream of small jobs cannot starve a large one
+    (0 disables aging). Ties keep submission order. Finished jobs are
+    retained for ``retention_seconds`` after they finish so clients can
+    poll for their results.
+    """
+
+    def __init__(self, name, workers=2, max_queued=16, retention_seconds=3600, aging_per_second=0):
+        self.name = name
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self.aging_per_second = aging_per_second
+
+        self._queue = queue.PriorityQueue(maxsize=max_queued)
+        self._seq = itertools.count()
+        self._epoch = time.monotonic()
+        self._jobs = {}
+        # Finished jobs in finish order, for pruning
+        self._finished = deque()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        # Stats
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _ensure_started(self):
+        # Workers are started lazily so that importing the module (e.g. in a
+        # pre-fork gunicorn master) never spawns threads.
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    name=f"{self.name}-worker-{i}",
+                    daemon=True
+                )
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, fn, *args, cost=0, owner=None, **kwargs):
+        """
+        Queue ``fn(*args, **kwargs)`` for background execution.
+
+        Args:
+            fn: Callable to run on a worker thread
+            cost: Estimated job size; lower-cost jobs run first
+            owner: Optional owner ID used to authorize status/result lookups
+
+        Returns:
+            Job
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+        """
+        self._ensure_started()
+        job = Job(fn, args, kwargs, cost, owner)
+        # cost - aging * waited orders jobs the same at any moment as
+        # cost + aging * submitted, so the heap key never has to change
+        priority = cost + self.aging_per_second * (time.monotonic() - self._epoch)
+        try:
+            self._queue.put_nowait((priority, next(self._seq), job))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(f"{self.name} queue is full ({self.max_queued} jobs)")
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def get(self, job_id):
+        """Get a job by ID, or None if unknown or expired."""
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        # Drop jobs that finished before the retention window (call with _lock held)
+        cutoff = time.time() - self.retention_seconds
+        while self._finished and self._finished[0].finished_at <= cutoff:
+            job = self._finished.popleft()
+            self._jobs.pop(job.id, None)
+
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            job.started_at = time.time()
+            job.status = RUNNING
+            wait = job.started_at - job.submitted_at
+            _local.job = job
+            try:
+                job.result = job.fn(*job.args, **job.kwargs)
+                job.status = DONE
+            except Exception as e:
+                print(f"❌ Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                _local.job = None
+                job.finished_at = time.time()
+                # Drop references to inputs (e.g. uploaded bytes) as soon as possible
+                job.args = job.kwargs = None
+                with self._lock:
+                    self._total_wait += wait
+                    self._max_wait = max(self._max_wait, wait)
+                    if job.status == DONE:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+                    self._finished.append(job)
+                    self._prune()
+                job._done.set()
+                job._notify_finished()
+                self._queue.task_done()
+
+    def stats(self):
+        """Queue depth, wait times and outcome counters."""
+        with self._lock:
+            self._prune()
+            finished = self._completed + self._failed
+            running = sum(1 for j in self._jobs.values() if j.status == RUNNING)
+            oldest_pending = min(
+                (j.submitted_at for j in self._jobs.values() if j.status == PENDING),
+                default=None
+            )
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "aging_per_second": self.aging_per_second,
+                "retained_jobs": len(self._jobs),
+                "queue_depth": self._queue.qsize(),
+                "running": running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_seconds": round(self._total_wait / finished, 3) if finished else 0.0,
+                "max_wait_seconds": round(self._max_wait, 3),
+                "oldest_pending_seconds": round(time.time() - oldest_pending, 3) if oldest_pending else 0.0,
+            }
@@ -0,0 +1,97 @@
+"""
+Micro-batching
+Collects items submitted by concurrent callers for a few milliseconds (or
+until a batch is full), processes them as one batch and hands each caller
+its own result.
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class MicroBatcher:
+    """
+    ``submit(item)`` blocks until ``process_batch(items)`` has run on a
+    batch containing the item, and returns the item's result.
+
+    ``process_batch`` receives a list of items and returns a list of
+    results in the same order; if it raises, every caller in the batch
+    gets the exception. Batches are processed on up to ``workers`` threads
+    so a slow batch does not hold up collection of the next one.
+    """
+
+    def __init__(self, process_batch, max_batch=8, max_wait_seconds=0.025, workers=4, name="batcher"):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self.name = name
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name=f"{self.name}-collector", daemon=True)
+                self._thread.start()
+
+    def submit(self, item, timeout=None):
+        """
+        Process an item as part of the next batch.
+
+        Raises:
+            Whatever process_batch raised for the batch;
+            concurrent.futures.TimeoutError if ``timeout`` expires first
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future.result(timeout)
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        try:
+            results = self.process_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name}: got {len(results)} results for {len(batch)} items")
+        except BaseException as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "queued": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+            }
@@ -1,253 +1,484 @@
 # services/pdf_exporter.py
 
-from xhtml2pdf import pisa
 from datetime import datetime
 from jinja2 import Template
+from config import Config
 import io
 
-def generate_pdf(result: dict, output_path: str):
+# Bump when either engine's report layout changes: stored PDFs are keyed by
+# (engine, RENDER_VERSION, analysis result), so old renders stop being served
+RENDER_VERSION = 1
+
+# Professional HTML template with inline CSS (xhtml2pdf compatible),
+# compiled once at import
+REPORT_TEMPLATE = Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        @page {
+            size: letter;
+            margin: 1cm;
+        }
+
+        body {
+            font-family: Arial, Helvetica, sans-serif;
+            line-height: 1.6;
+            color: #1a1a1a;
+            font-size: 11pt;
+        }
+
+        .header {
+            border-bottom: 3px solid #6366f1;
+            padding-bottom: 15px;
+            margin-bottom: 20px;
+        }
+
+        h1 {
+            font-size: 24pt;
+            font-weight: bold;
+            color: #6366f1;
+            margin: 0 0 5px 0;
+        }
+
+        .timestamp {
+            font-size: 9pt;
+            color: #6b7280;
+        }
+
+        h2 {
+            font-size: 16pt;
+            font-weight: bold;
+            color: #1f2937;
+            margin-top: 20px;
+            margin-bottom: 10px;
+            border-left: 4px solid #6366f1;
+            padding-left: 10px;
+        }
+
+        .summary-section {
+            background-color: #f9fafb;
+            padding: 15px;
+            border-radius: 5px;
+            margin-bottom: 15px;
+        }
+
+        .doc-type {
+            font-size: 10pt;
+            color: #4b5563;
+            margin-bottom: 8px;
+        }
+
+        .doc-type strong {
+            color: #1f2937;
+        }
+
+        .summary-text {
+            font-size: 10pt;
+            color: #374151;
+            line-height: 1.7;
+            margin: 10px 0;
+        }
+
+        .risk-badge {
+            display: inline-block;
+            padding: 5px 12px;
+            border-radius: 15px;
+            font-size: 10pt;
+            font-weight: bold;
+            margin-top: 8px;
+        }
+
+        .risk-high {
+            background-color: #fee2e2;
+            color: #991b1b;
+        }
+
+        .risk-medium {
+            background-color: #fef3c7;
+            color: #92400e;
+        }
+
+        .risk-low {
+            background-color: #d1fae5;
+            color: #065f46;
+        }
+
+        .drivers-list {
+            margin-left: 15px;
+            margin-top: 8px;
+        }
+
+        .drivers-list li {
+            margin-bottom: 6px;
+            color: #374151;
+            font-size: 10pt;
+            line-height: 1.6;
+        }
+
+        table {
+            width: 100%;
+            border-collapse: collapse;
+            margin-top: 10px;
+            font-size: 9pt;
+        }
+
+        th {
+            background-color: #6366f1;
+            color: white;
+            padding: 10px;
+            text-align: left;
+            font-weight: bold;
+            font-size: 10pt;
+        }
+
+        td {
+            padding: 10px;
+            border-bottom: 1px solid #e5e7eb;
+            vertical-align: top;
+        }
+
+        tr:nth-child(even) {
+            background-color: #f9fafb;
+        }
+
+        .clause-title {
+            font-weight: bold;
+            color: #1f2937;
+        }
+
+        .footer {
+            margin-top: 30px;
+            padding-top: 15px;
+            border-top: 2px solid #e5e7eb;
+            text-align: center;
+        }
+
+        .disclaimer {
+            font-size: 8pt;
+            color: #6b7280;
+            font-style: italic;
+            line-height: 1.5;
+        }
+
+        .disclaimer strong {
+            color: #991b1b;
+            font-weight: bold;
+        }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>JustiPlay Legal Document Report</h1>
+        <p class="timestamp">Generated: {{ timestamp }}</p>
+    </div>
+
+    <div class="summary-section">
+        <h2>Document Summary</h2>
+        <p class="doc-type"><strong>Document Type:</strong> {{ result.document_type }}</p>
+        <p class="summary-text">{{ result.summary }}</p>
+        <div>
+            <strong style="font-size: 10pt; color: #1f2937;">Overall Risk Assessment:</strong>
+            <span class="risk-badge risk-{{ result.overall_risk|lower }}">
+                {{ result.overall_risk }} Risk
+            </span>
+        </div>
+    </div>
+
+    <h2>Risk Drivers</h2>
+    <ul class="drivers-list">
+    {% for d in result.risk_drivers %}
+        <li>{{ d }}</li>
+    {% endfor %}
+    </ul>
+
+    <h2>Clause-by-Clause Analysis</h2>
+    <table>
+        <thead>
+            <tr>
+                <th style="width: 25%;">Clause</th>
+                <th style="width: 12%;">Risk Level</th>
+                <th style="width: 63%;">Educational Suggestion</th>
+            </tr>
+        </thead>
+        <tbody>
+        {% for c in result.clauses %}
+            <tr>
+                <td class="clause-title">{{ c.title }}</td>
+                <td>
+                    <span class="risk-badge risk-{{ c.risk|lower }}">
+                        {{ c.risk }}
+                    </span>
+                </td>
+                <td>{{ c.suggestion }}</td>
+            </tr>
+        {% endfor %}
+        </tbody>
+    </table>
+
+    <div class="footer">
+        <p class="disclaimer">
+            <strong>IMPORTANT DISCLAIMER:</strong><br>
+            This report is for <strong>educational and awareness purposes only</strong>. 
+            It does NOT constitute legal advice and does NOT create an attorney-client relationship.<br>
+            For legal guidance specific to your situation, please consult a qualified legal professional.
+        </p>
+    </div>
+</body>
+</html>
+""")
+
+ENGINES = ("xhtml2pdf", "fpdf")
+
+# Report colors (RGB), matching the HTML template
+_INDIGO = (99, 102, 241)
+_INK = (31, 41, 55)
+_BODY = (55, 65, 81)
+_MUTED = (107, 114, 128)
+_ROW_ALT = (249, 250, 251)
+_RULE = (229, 231, 235)
+_RISK_COLORS = {
+    "high": ((254, 226, 226), (153, 27, 27)),
+    "medium": ((254, 243, 199), (146, 64, 14)),
+    "low": ((209, 250, 229), (6, 95, 70)),
+}
+
+# Core PDF fonts are Latin-1 only; map common typographic characters first
+_LATIN1_REPLACEMENTS = {
+    "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+    "\u2013": "-", "\u2014": "-", "\u2026": "...", "\u2022": "-",
+    "\u20b9": "Rs.", "\u2713": "v", "\u2717": "x", "\u00a0": " ",
+}
+
+
+def render_pdf(result: dict, engine: str = None) -> bytes:
     """
-    Generate a professionally styled PDF report for legal document analysis.
+    Render a professionally styled PDF report for legal document analysis.
     
     Args:
         result: Analysis result dictionary from document_analyzer
-        output_path: Path where PDF should be saved
+        engine: "xhtml2pdf" (HTML/CSS layout) or "fpdf" (direct drawing,
+            much faster); defaults to Config.PDF_RENDER_ENGINE
+        
+    Returns:
+        bytes: The PDF document
     """
-    now = datetime.now().strftime("%d %b %Y, %H:%M")
+    engine = engine or Config.PDF_RENDER_ENGINE
+    if engine == "fpdf":
+        return render_pdf_fpdf(result)
+    return render_pdf_xhtml2pdf(result)
 
-    # Professional HTML template with inline CSS (xhtml2pdf compatible)
-    template = Template("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            @page {
-                size: letter;
-                margin: 1cm;
-            }
-            
-            body {
-                font-family: Arial, Helvetica, sans-serif;
-                line-height: 1.6;
-                color: #1a1a1a;
-                font-size: 11pt;
-            }
-            
-            .header {
-                border-bottom: 3px solid #6366f1;
-                padding-bottom: 15px;
-                margin-bottom: 20px;
-            }
-            
-            h1 {
-                font-size: 24pt;
-                font-weight: bold;
-                color: #6366f1;
-                margin: 0 0 5px 0;
-            }
-            
-            .timestamp {
-                font-size: 9pt;
-                color: #6b7280;
-            }
-            
-            h2 {
-                font-size: 16pt;
-                font-weight: bold;
-                color: #1f2937;
-                margin-top: 20px;
-                margin-bottom: 10px;
-                border-left: 4px solid #6366f1;
-                padding-left: 10px;
-            }
-            
-            .summary-section {
-                background-color: #f9fafb;
-                padding: 15px;
-                border-radius: 5px;
-                margin-bottom: 15px;
-            }
-            
-            .doc-type {
-                font-size: 10pt;
-                color: #4b5563;
-                margin-bottom: 8px;
-            }
-            
-            .doc-type strong {
-                color: #1f2937;
-            }
-            
-            .summary-text {
-                font-size: 10pt;
-                color: #374151;
-                line-height: 1.7;
-                margin: 10px 0;
-            }
-            
-            .risk-badge {
-                display: inline-block;
-                padding: 5px 12px;
-                border-radius: 15px;
-                font-size: 10pt;
-                font-weight: bold;
-                margin-top: 8px;
-            }
-            
-            .risk-high {
-                background-color: #fee2e2;
-                color: #991b1b;
-            }
-            
-            .risk-medium {
-                background-color: #fef3c7;
-                color: #92400e;
-            }
-            
-            .risk-low {
-                background-color: #d1fae5;
-                color: #065f46;
-            }
-            
-            .drivers-list {
-                margin-left: 15px;
-                margin-top: 8px;
-            }
-            
-            .drivers-list li {
-                margin-bottom: 6px;
-                color: #374151;
-                font-size: 10pt;
-                line-height: 1.6;
-            }
-            
-            table {
-                width: 100%;
-                border-collapse: collapse;
-                margin-top: 10px;
-                font-size: 9pt;
-            }
-            
-            th {
-                background-color: #6366f1;
-                color: white;
-                padding: 10px;
-                text-align: left;
-                font-weight: bold;
-                font-size: 10pt;
-            }
-            
-            td {
-                padding: 10px;
-                border-bottom: 1px solid #e5e7eb;
-                vertical-align: top;
-            }
-            
-            tr:nth-child(even) {
-                background-color: #f9fafb;
-            }
-            
-            .clause-title {
-                font-weight: bold;
-                color: #1f2937;
-            }
-            
-            .footer {
-                margin-top: 30px;
-                padding-top: 15px;
-                border-top: 2px solid #e5e7eb;
-                text-align: center;
-            }
-            
-            .disclaimer {
-                font-size: 8pt;
-                color: #6b7280;
-                font-style: italic;
-                line-height: 1.5;
-            }
-            
-            .disclaimer strong {
-                color: #991b1b;
-                font-weight: bold;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>JustiPlay Legal Document Report</h1>
-            <p class="timestamp">Generated: {{ timestamp }}</p>
-        </div>
-
-        <div class="summary-section">
-            <h2>Document Summary</h2>
-            <p class="doc-type"><strong>Document Type:</strong> {{ result.document_type }}</p>
-            <p class="summary-text">{{ result.summary }}</p>
-            <div>
-                <strong style="font-size: 10pt; color: #1f2937;">Overall Risk Assessment:</strong>
-                <span class="risk-badge risk-{{ result.overall_risk|lower }}">
-                    {{ result.overall_risk }} Risk
-                </span>
-            </div>
-        </div>
 
-        <h2>Risk Drivers</h2>
-        <ul class="drivers-list">
-        {% for d in result.risk_drivers %}
-            <li>{{ d }}</li>
-        {% endfor %}
-        </ul>
-
-        <h2>Clause-by-Clause Analysis</h2>
-        <table>
-            <thead>
-                <tr>
-                    <th style="width: 25%;">Clause</th>
-                    <th style="width: 12%;">Risk Level</th>
-                    <th style="width: 63%;">Educational Suggestion</th>
-                </tr>
-            </thead>
-            <tbody>
-            {% for c in result.clauses %}
-                <tr>
-                    <td class="clause-title">{{ c.title }}</td>
-                    <td>
-                        <span class="risk-badge risk-{{ c.risk|lower }}">
-                            {{ c.risk }}
-                        </span>
-                    </td>
-                    <td>{{ c.suggestion }}</td>
-                </tr>
-            {% endfor %}
-            </tbody>
-        </table>
-
-        <div class="footer">
-            <p class="disclaimer">
-                <strong>IMPORTANT DISCLAIMER:</strong><br>
-                This report is for <strong>educational and awareness purposes only</strong>. 
-                It does NOT constitute legal advice and does NOT create an attorney-client relationship.<br>
-                For legal guidance specific to your situation, please consult a qualified legal professional.
-            </p>
-        </div>
-    </body>
-    </html>
-    """)
+def render_pdf_xhtml2pdf(result: dict) -> bytes:
+    """Render the report from the HTML template with xhtml2pdf."""
+    from xhtml2pdf import pisa
 
-    html_content = template.render(result=result, timestamp=now)
+    now = datetime.now().strftime("%d %b %Y, %H:%M")
+    html_content = REPORT_TEMPLATE.render(result=result, timestamp=now)
     
     # Generate PDF with xhtml2pdf
     try:
-        with open(output_path, "wb") as pdf_file:
-            pisa_status = pisa.CreatePDF(
-                html_content,
-                dest=pdf_file
-            )
+        pdf_file = io.BytesIO()
+        pisa_status = pisa.CreatePDF(
+            html_content,
+            dest=pdf_file
+        )
         
         if pisa_status.err:
             print(f"⚠️ PDF generation had errors")
-        else:
-            print(f"📄 PDF report generated: {output_path}")
+        return pdf_file.getvalue()
     except Exception as e:
         print(f"❌ PDF generation failed: {e}")
         raise
+
+
+def _latin1(text) -> str:
+    text = str(text if text is not None else "")
+    for src, dst in _LATIN1_REPLACEMENTS.items():
+        text = text.replace(src, dst)
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+def _wrap_lines(pdf, width: float, text: str) -> int:
+    """Number of lines multi_cell will need for ``text`` at ``width``."""
+    usable = width - 2 * pdf.c_margin
+    lines = 0
+    for paragraph in text.split("\n"):
+        line_width = 0.0
+        lines += 1
+        for word in paragraph.split(" "):
+            word_width = pdf.get_string_width(word + " ")
+            if line_width and line_width + word_width > usable:
+                lines += 1
+                line_width = 0.0
+            # Words wider than a line are broken by multi_cell
+            while word_width > usable:
+                lines += 1
+                word_width -= usable
+            line_width += word_width
+    return lines
+
+
+def _risk_badge(pdf, risk: str, label: str, height: float = 6):
+    fill, text = _RISK_COLORS.get(str(risk).lower(), _RISK_COLORS["medium"])
+    pdf.set_font("Arial", "B", 9)
+    pdf.set_fill_color(*fill)
+    pdf.set_text_color(*text)
+    pdf.cell(pdf.get_string_width(label) + 8, height, label, border=0, ln=0, align="C", fill=True)
+
+
+def _section_heading(pdf, title: str):
+    pdf.ln(4)
+    y = pdf.get_y()
+    pdf.set_fill_color(*_INDIGO)
+    pdf.rect(pdf.l_margin, y, 1.4, 7, "F")
+    pdf.set_x(pdf.l_margin + 4)
+    pdf.set_font("Arial", "B", 14)
+    pdf.set_text_color(*_INK)
+    pdf.cell(0, 7, title, ln=1)
+    pdf.ln(2)
+
+
+def render_pdf_fpdf(result: dict) -> bytes:
+    """
+    Draw the report layout directly with fpdf.
+
+    Produces the same sections as the HTML template (header, summary with
+    risk badge, risk drivers, clause table, disclaimer) without an HTML/CSS
+    layout pass.
+    """
+    from fpdf import FPDF
+
+    now = datetime.now().strftime("%d %b %Y, %H:%M")
+    pdf = FPDF(orientation="P", unit="mm", format="letter")
+    pdf.set_margins(10, 10, 10)
+    pdf.set_auto_page_break(True, margin=12)
+    pdf.add_page()
+    width = pdf.w - pdf.l_margin - pdf.r_margin
+
+    # Header
+    pdf.set_font("Arial", "B", 22)
+    pdf.set_text_color(*_INDIGO)
+    pdf.cell(0, 11, "JustiPlay Legal Document Report", ln=1)
+    pdf.set_font("Arial", "", 9)
+    pdf.set_text_color(*_MUTED)
+    pdf.cell(0, 5, f"Generated: {now}", ln=1)
+    pdf.set_draw_color(*_INDIGO)
+    pdf.set_line_width(1)
+    pdf.line(pdf.l_margin, pdf.get_y() + 2, pdf.l_margin + width, pdf.get_y() + 2)
+    pdf.set_line_width(0.2)
+    pdf.ln(5)
+
+    # Summary
+    _section_heading(pdf, "Document Summary")
+    pdf.set_font("Arial", "B", 10)
+    pdf.set_text_color(*_INK)
+    pdf.cell(pdf.get_string_width("Document Type: ") + 1, 6, "Document Type: ")
+    pdf.set_font("Arial", "", 10)
+    pdf.set_text_color(*_BODY)
+    pdf.cell(0, 6, _latin1(result.get("document_type", "")), ln=1)
+    pdf.ln(1)
+    pdf.multi_cell(0, 5.5, _latin1(result.get("summary", "")))
+    pdf.ln(2)
+    pdf.set_font("Arial", "B", 10)
+    pdf.set_text_color(*_INK)
+    pdf.cell(pdf.get_string_width("Overall Risk Assessment: ") + 2, 6, "Overall Risk Assessment: ")
+    overall = _latin1(result.get("overall_risk", "Medium"))
+    _risk_badge(pdf, overall, f"{overall} Risk")
+    pdf.ln(8)
+
+    # Risk drivers
+    _section_heading(pdf, "Risk Drivers")
+    pdf.set_font("Arial", "", 10)
+    pdf.set_text_color(*_BODY)
+    for driver in result.get("risk_drivers", []):
+        pdf.set_x(pdf.l_margin + 4)
+        pdf.cell(4, 5.5, "-")
+        pdf.multi_cell(width - 8, 5.5, _latin1(driver))
+        pdf.ln(1)
+
+    # Clause table
+    _section_heading(pdf, "Clause-by-Clause Analysis")
+    columns = ((0.25, "Clause"), (0.12, "Risk Level"), (0.63, "Educational Suggestion"))
+    col_widths = [width * share for share, _ in columns]
+    line_h = 5
+
+    def table_header():
+        pdf.set_font("Arial", "B", 10)
+        pdf.set_fill_color(*_INDIGO)
+        pdf.set_text_color(255, 255, 255)
+        for w, (_, label) in zip(col_widths, columns):
+            pdf.cell(w, 8, label, border=0, ln=0, fill=True)
+        pdf.ln(8)
+
+    table_header()
+    pdf.set_draw_color(*_RULE)
+    for row, clause in enumerate(result.get("clauses", [])):
+        title = _latin1(clause.get("title", ""))
+        risk = _latin1(clause.get("risk", "Medium"))
+        suggestion = _latin1(clause.get("suggestion", ""))
+
+        pdf.set_font("Arial", "", 9)
+        lines = max(_wrap_lines(pdf, col_widths[2], suggestion), 1)
+        pdf.set_font("Arial", "B", 9)
+        lines = max(lines, _wrap_lines(pdf, col_widths[0], title))
+        row_h = lines * line_h + 4
+
+        if pdf.get_y() + row_h > pdf.page_break_trigger:
+            pdf.add_page()
+            table_header()
+
+        x, y = pdf.l_margin, pdf.get_y()
+        if row % 2:
+            pdf.set_fill_color(*_ROW_ALT)
+            pdf.rect(x, y, width, row_h, "F")
+
+        pdf.set_xy(x, y + 2)
+        pdf.set_text_color(*_INK)
+        pdf.multi_cell(col_widths[0], line_h, title)
+
+        pdf.set_xy(x + col_widths[0] + 1, y + 2)
+        _risk_badge(pdf, risk, risk, height=line_h)
+
+        pdf.set_xy(x + col_widths[0] + col_widths[1], y + 2)
+        pdf.set_font("Arial", "", 9)
+        pdf.set_text_color(*_BODY)
+        pdf.multi_cell(col_widths[2], line_h, suggestion)
+
+        pdf.line(x, y + row_h, x + width, y + row_h)
+        pdf.set_xy(x, y + row_h)
+
+    # Disclaimer
+    pdf.ln(8)
+    pdf.set_draw_color(*_RULE)
+    pdf.set_line_width(0.6)
+    pdf.line(pdf.l_margin, pdf.get_y(), pdf.l_margin + width, pdf.get_y())
+    pdf.set_line_width(0.2)
+    pdf.ln(4)
+    pdf.set_font("Arial", "B", 8)
+    pdf.set_text_color(153, 27, 27)
+    pdf.cell(0, 4, "IMPORTANT DISCLAIMER:", ln=1, align="C")
+    pdf.set_font("Arial", "I", 8)
+    pdf.set_text_color(*_MUTED)
+    pdf.multi_cell(0, 4, (
+        "This report is for educational and awareness purposes only. "
+        "It does NOT constitute legal advice and does NOT create an attorney-client relationship.\n"
+        "For legal guidance specific to your situation, please consult a qualified legal professional."
+    ), align="C")
+
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def generate_pdf(result: dict, output_path: str):
+    """
+    Generate a PDF report and save it to a file.
+    
+    Args:
+        result: Analysis result dictionary from document_analyzer
+        output_path: Path where PDF should be saved
+    """
+    data = render_pdf(result)
+    with open(output_path, "wb") as pdf_file:
+        pdf_file.write(data)
+    print(f"📄 PDF report generated: {output_path}")
@@ -0,0 +1,138 @@
+# services/render_pool.py
+"""
+Out-of-process PDF report rendering.
+
+Both render engines are pure Python and CPU-bound; rendering in a request
+thread holds the GIL and stalls every other gunicorn thread. Reports are
+rendered in a small dedicated process pool instead, and request threads
+only wait on the future. Each render runs under an alarm in the worker,
+and a pool that still misses its deadline has its processes terminated,
+so a wedged render never keeps burning CPU in the background.
+
+The worker processes import services.pdf_exporter, which must stay light:
+no Google clients or Flask imports at module level.
+"""
+
+import time
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+from services.pdf_exporter import render_pdf
+
+
+# Extra time the parent waits beyond the worker's own alarm before killing the pool
+_GRACE_SECONDS = 2.0
+# How often a waiting request checks whether its render has started
+_POLL_SECONDS = 0.5
+
+
+class PdfRenderError(Exception):
+    """Raised when a report cannot be rendered within the configured limits."""
+
+
+# -------------------------------------------------
+# Worker side
+# -------------------------------------------------
+
+def _on_alarm(signum, frame):
+    raise PdfRenderError("PDF rendering exceeded its time limit")
+
+
+def _init_worker():
+    """Process-pool initializer: install the time-limit handler."""
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+
+def render_with_limit(result: dict, engine: str, time_limit: float) -> bytes:
+    """Render a report inside a worker process, interrupted after ``time_limit`` seconds."""
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.setitimer(signal.ITIMER_REAL, max(time_limit, 0.01))
+    try:
+        return render_pdf(result, engine)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+# -------------------------------------------------
+# Parent side
+# -------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: never fork a multi-threaded gunicorn worker
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return _pool
+
+
+def _reset_pool(pool):
+    """Discard a broken or wedged pool and kill its workers; the next render starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # A stuck render ignores shutdown(); terminate its process as well
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def render_pdf_in_pool(result: dict, engine: str = None, timeout: float = None) -> bytes:
+    """
+    Render a PDF report in the render pool; see pdf_exporter.render_pdf.
+
+    Args:
+        result: Analysis result dictionary from document_analyzer
+        engine: Render engine (default Config.PDF_RENDER_ENGINE)
+        timeout: Render time limit in seconds, not counting time queued
+            behind other renders (default from Config)
+
+    Returns:
+        bytes: The PDF document
+
+    Raises:
+        PdfRenderError: If rendering times out or the worker crashes
+    """
+    timeout = timeout or Config.PDF_RENDER_TIMEOUT_SECONDS
+    engine = engine or Config.PDF_RENDER_ENGINE
+    pool = _get_pool()
+    future = pool.submit(render_with_limit, result, engine, timeout)
+    # The worker's alarm is the real deadline; time spent queued behind
+    # other renders does not count. A future is marked running once it is
+    # handed to the pool's call queue, up to one render before a worker
+    # picks it up, so the pool is only killed after twice the limit.
+    running_since = None
+    try:
+        while True:
+            try:
+                return future.result(timeout=_POLL_SECONDS)
+            except FutureTimeoutError:
+                if not future.running():
+                    continue
+                running_since = running_since or time.monotonic()
+                if time.monotonic() - running_since > 2 * timeout + _GRACE_SECONDS:
+                    _reset_pool(pool)
+                    raise PdfRenderError(f"PDF rendering exceeded its {timeout:g}s time limit")
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise PdfRenderError("PDF render process crashed")
+    except CancelledError:
+        # Queued when another render's wedged worker reset the pool
+        raise PdfRenderError("PDF rendering was interrupted by a render pool reset; please retry")
@@ -0,0 +1,81 @@
+"""
+Report Service
+Saves analysis results and renders their PDF reports lazily, on the first
+download request, instead of on every analysis.
+"""
+
+import json
+import hashlib
+
+from config import Config
+from services.report_store import get_report_store, REPORT_ID_PREFIX
+from services.pdf_exporter import RENDER_VERSION
+from services.singleflight import SingleFlight
+
+_renders = SingleFlight("pdf-render")
+
+
+def result_hash(result: dict) -> str:
+    """Stable hash of an analysis result (key order independent)."""
+    canonical = json.dumps(result, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def report_pdf_id(result: dict, engine: str = None) -> str:
+    """Report ID of the PDF for an analysis result, per render engine and layout version."""
+    engine = engine or Config.PDF_RENDER_ENGINE
+    key = f"{engine}:{RENDER_VERSION}:{result_hash(result)}"
+    return REPORT_ID_PREFIX + hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+def save_analysis(doc_id: str, result: dict):
+    """Persist an analysis result so its report can be rendered on demand."""
+    data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+    get_report_store().put(doc_id, data, suffix=".json")
+
+
+def load_analysis(doc_id: str):
+    """Load a saved analysis result, or None if unknown/expired."""
+    path = get_report_store().get_path(doc_id, suffix=".json")
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        return json.loads(f.read().decode("utf-8"))
+
+
+def get_report_pdf(doc_id: str):
+    """
+    Local path of the PDF report for an analysis, rendering it if needed.
+
+    Reports are stored under the hash of the analysis result, render engine
+    and layout version, so identical results (e.g. re-uploads served from
+    the analysis cache) share one PDF, and switching engines or changing
+    the layout renders afresh.
+    Concurrent first downloads of the same report render it only once, in
+    the out-of-process render pool.
+
+    Returns:
+        str path, or None if the analysis is unknown
+    """
+    from services.render_pool import render_pdf_in_pool
+
+    store = get_report_store()
+    result = load_analysis(doc_id)
+    if result is None:
+        return None
+
+    engine = Config.PDF_RENDER_ENGINE
+    pdf_id = report_pdf_id(result, engine)
+    path = store.get_path(pdf_id)
+    if path:
+        return path
+
+    def render():
+        # Re-check: another request may have finished rendering meanwhile
+        existing = store.get_path(pdf_id)
+        if existing:
+            return existing
+        print(f"📄 Rendering PDF report for {doc_id}")
+        return store.put(pdf_id, render_pdf_in_pool(result, engine))
+
+    return _renders.do(pdf_id, render)
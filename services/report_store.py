@@ -0,0 +1,257 @@
+"""
+Report Store
+Stores generated PDF reports under collision-free IDs, either on local
+disk or in Cloud Storage with a local LRU disk cache in front, so report
+downloads work on any instance behind a load balancer.
+"""
+
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+
+from config import Config
+
+REPORT_ID_PREFIX = "rpt_"
+
+# Sequential IDs of reports written to Config.REPORT_LEGACY_DIR before the store
+LEGACY_REPORT_ID = re.compile(r"doc_[0-9]{1,9}")
+
+
+def new_report_id() -> str:
+    """Random, collision-free report ID (safe for URLs and file names)."""
+    return REPORT_ID_PREFIX + secrets.token_hex(12)
+
+
+def is_valid_report_id(report_id: str) -> bool:
+    token = report_id[len(REPORT_ID_PREFIX):]
+    return (
+        report_id.startswith(REPORT_ID_PREFIX)
+        and len(token) == 24
+        and all(c in "0123456789abcdef" for c in token)
+    )
+
+
+def legacy_report_path(report_id: str):
+    """
+    Path of a report saved under a legacy doc_N ID, or None.
+
+    Links to these reports (e.g. file_url in users' libraries) predate the
+    report store; the files are served read-only from the legacy directory.
+    """
+    if not LEGACY_REPORT_ID.fullmatch(report_id):
+        return None
+    path = os.path.join(Config.REPORT_LEGACY_DIR, report_id + ".pdf")
+    return path if os.path.isfile(path) else None
+
+
+class LocalReportStore:
+    """
+    Reports on local disk, sharded as <root>/<ab>/<cd>/<report_id>.pdf.
+
+    Writes go to a temp file in the target directory and are renamed into
+    place, so readers never see a partial report. A garbage collector
+    removes reports older than ``ttl_seconds`` and, past ``max_bytes``,
+    the least recently used ones (by mtime, which reads refresh).
+    """
+
+    def __init__(self, root, ttl_seconds=None, max_bytes=None, gc_interval_seconds=600):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.gc_interval_seconds = gc_interval_seconds
+        self._last_gc = 0.0
+        self._gc_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, report_id: str, suffix: str = ".pdf") -> str:
+        token = report_id[len(REPORT_ID_PREFIX):]
+        return os.path.join(self.root, token[:2], token[2:4], report_id + suffix)
+
+    def put(self, report_id: str, data: bytes, suffix: str = ".pdf") -> str:
+        """Atomically write a report. Returns its local path."""
+        path = self.path_for(report_id, suffix)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.maybe_gc()
+        return path
+
+    def get_path(self, report_id: str, suffix: str = ".pdf"):
+        """Local path of a stored report, or None if it does not exist."""
+        path = self.path_for(report_id, suffix)
+        try:
+            # Refresh mtime: the size-based GC evicts least recently used first
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def delete(self, report_id: str, suffix: str = ".pdf"):
+        try:
+            os.remove(self.path_for(report_id, suffix))
+        except FileNotFoundError:
+            pass
+
+    def maybe_gc(self):
+        """Run gc() in the background if the last run is older than the interval."""
+        now = time.time()
+        if now - self._last_gc < self.gc_interval_seconds:
+            return
+        self._last_gc = now
+        threading.Thread(target=self.gc, name="report-store-gc", daemon=True).start()
+
+    def gc(self) -> int:
+        """Delete expired and over-budget reports. Returns files removed."""
+        if not self._gc_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time()
+            files = []
+            removed = 0
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    # Expired reports, and temp files orphaned by a crash
+                    stale_tmp = name.startswith(".tmp-") and st.st_mtime < now - 3600
+                    expired = self.ttl_seconds and st.st_mtime < now - self.ttl_seconds
+                    if stale_tmp or expired:
+                        self._remove(path)
+                        removed += 1
+                    elif not name.startswith(".tmp-"):
+                        files.append((st.st_mtime, st.st_size, path))
+
+            if self.max_bytes:
+                total = sum(size for _, size, _ in files)
+                for _, size, path in sorted(files):
+                    if total <= self.max_bytes:
+                        break
+                    self._remove(path)
+                    total -= size
+                    removed += 1
+
+            if removed:
+                print(f"🧹 Report store GC removed {removed} file(s) from {self.root}")
+            return removed
+        finally:
+            self._gc_lock.release()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class GCSReportStore:
+    """
+    Reports in a Cloud Storage bucket, fronted by a LocalReportStore used as
+    an LRU disk cache. Any instance can serve any report; repeated downloads
+    on the same instance are served from local disk.
+    """
+
+    def __init__(self, bucket, prefix, cache: LocalReportStore, ttl_seconds=None):
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/") + "/"
+        self.cache = cache
+        self.ttl_seconds = ttl_seconds
+        self._last_gc = 0.0
+
+    def _blob_name(self, report_id, suffix):
+        return f"{self.prefix}{report_id}{suffix}"
+
+    def put(self, report_id: str, data: bytes, suffix: str = ".pdf") -> str:
+        path = self.cache.put(report_id, data, suffix)
+        blob = self.bucket.blob(self._blob_name(report_id, suffix))
+        blob.upload_from_filename(path)
+        self.maybe_gc()
+        return path
+
+    def get_path(self, report_id: str, suffix: str = ".pdf"):
+        path = self.cache.get_path(report_id, suffix)
+        if path:
+            return path
+
+        blob = self.bucket.blob(self._blob_name(report_id, suffix))
+        try:
+            data = blob.download_as_bytes()
+        except Exception as e:
+            # NotFound for unknown IDs; anything else is logged and treated the same
+            if type(e).__name__ != "NotFound":
+                print(f"⚠️ Report download from Cloud Storage failed: {e}")
+            return None
+        return self.cache.put(report_id, data, suffix)
+
+    def delete(self, report_id: str, suffix: str = ".pdf"):
+        self.cache.delete(report_id, suffix)
+        try:
+            self.bucket.blob(self._blob_name(report_id, suffix)).delete()
+        except Exception:
+            pass
+
+    def maybe_gc(self):
+        now = time.time()
+        if now - self._last_gc < self.cache.gc_interval_seconds:
+            return
+        self._last_gc = now
+        threading.Thread(target=self.gc, name="report-store-gc", daemon=True).start()
+
+    def gc(self) -> int:
+        """Evict the local cache and delete expired blobs. Returns items removed."""
+        removed = self.cache.gc()
+        if self.ttl_seconds:
+            cutoff = time.time() - self.ttl_seconds
+            for blob in self.bucket.list_blobs(prefix=self.prefix):
+                if blob.time_created and blob.time_created.timestamp() < cutoff:
+                    blob.delete()
+                    removed += 1
+        return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_report_store():
+    """The configured report store (local disk or Cloud Storage)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if Config.REPORT_STORE_BACKEND == "gcs":
+                from services.firebase_service import get_storage_bucket
+                cache = LocalReportStore(
+                    os.path.join(Config.REPORT_STORE_DIR, "cache"),
+                    max_bytes=Config.REPORT_CACHE_MAX_BYTES
+                )
+                _store = GCSReportStore(
+                    get_storage_bucket(),
+                    Config.REPORT_GCS_PREFIX,
+                    cache,
+                    ttl_seconds=Config.REPORT_TTL_SECONDS
+                )
+            else:
+                _store = LocalReportStore(
+                    Config.REPORT_STORE_DIR,
+                    ttl_seconds=Config.REPORT_TTL_SECONDS,
+                    max_bytes=Config.REPORT_STORE_MAX_BYTES
+                )
+        return _store
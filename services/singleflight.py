@@ -0,0 +1,138 @@
+"""
+Singleflight
+Coalesces concurrent calls with the same key into one execution whose
+result (or exception) is shared by every caller. Streams can be shared
+the same way: late joiners replay the items produced so far, then follow
+the live stream.
+"""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class _Stream:
+    def __init__(self):
+        self.items = []
+        self.finished = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def replay(self):
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.items) and not self.finished:
+                    self.cond.wait()
+                items = self.items[index:]
+                finished, error = self.finished, self.error
+            yield from items
+            index += len(items)
+            if finished and index >= len(self.items):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    Duplicate-call suppression.
+
+    ``do(key, fn)`` runs ``fn()`` unless a call with the same key is already
+    in flight, in which case it waits for that call and returns its result.
+    Nothing is cached once the call completes.
+    """
+
+    def __init__(self, name="singleflight"):
+        self.name = name
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, fn):
+        """
+        Iterate ``fn()`` unless a stream with the same key is in flight, in
+        which case replay that stream's items and follow it to its end.
+
+        If the leading consumer stops iterating early, followers see a
+        RuntimeError instead of a silently truncated stream.
+        """
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                shared = self._streams[key] = _Stream()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            yield from shared.replay()
+            return
+
+        error = RuntimeError(f"{self.name}: shared stream was abandoned")
+        try:
+            for item in fn():
+                with shared.cond:
+                    shared.items.append(item)
+                    shared.cond.notify_all()
+                yield item
+            error = None
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                error = e
+            raise
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with shared.cond:
+                shared.error = error
+                shared.finished = True
+                shared.cond.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": len(self._calls) + len(self._streams),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+            }
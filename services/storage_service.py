@@ -5,39 +5,48 @@ Handles file uploads to Google Cloud Storage
 
 from services.firebase_service import get_storage_bucket
 from datetime import datetime, timedelta
-import os
 
 bucket = get_storage_bucket()
 
-def upload_document(file, user_id, filename=None):
+def document_blob_name(user_id, filename=None):
     """
-    Upload a document to Cloud Storage
+    Unique blob name for an uploaded document
     
     Args:
-        file: File object from Flask request
         user_id: User ID for organizing files
-        filename: Optional custom filename
+        filename: Optional original filename
     
     Returns:
-        dict with file_url and blob_name
+        Blob name string
     """
-    # Generate unique filename
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     if filename:
         # Sanitize filename
         safe_filename = "".join(c for c in filename if c.isalnum() or c in (' ', '.', '_')).rstrip()
-        file_extension = os.path.splitext(safe_filename)[1]
-        blob_name = f"documents/{user_id}/{timestamp}_{safe_filename}"
-    else:
-        blob_name = f"documents/{user_id}/{timestamp}.pdf"
+        return f"documents/{user_id}/{timestamp}_{safe_filename}"
+    return f"documents/{user_id}/{timestamp}.pdf"
+
+def upload_document(file, user_id=None, filename=None, content_type='application/pdf', blob_name=None):
+    """
+    Upload a document to Cloud Storage
     
-    # Upload to Cloud Storage
-    blob = bucket.blob(blob_name)
-    blob.upload_from_file(file, content_type='application/pdf')
+    Args:
+        file: File object from Flask request
+        user_id: User ID for organizing files
+        filename: Optional custom filename
+        content_type: MIME type stored with the blob
+        blob_name: Explicit blob name (default: from user_id and filename)
+    
+    Returns:
+        dict with file_url and blob_name
+    """
+    blob_name = blob_name or document_blob_name(user_id, filename)
     
-    # Make the blob publicly accessible (optional, for demo purposes)
+    # Upload to Cloud Storage, publicly readable (for demo purposes) in the
+    # same request rather than a second make_public() round-trip.
     # For production, use signed URLs instead
-    blob.make_public()
+    blob = bucket.blob(blob_name)
+    blob.upload_from_file(file, content_type=content_type, predefined_acl='publicRead')
     
     return {
         'file_url': blob.public_url,
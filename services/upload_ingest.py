@@ -0,0 +1,225 @@
+# services/upload_ingest.py
+"""
+Streaming upload ingestion.
+
+Uploaded files are streamed straight from the request body into a spool
+file on disk. The SHA-256 and the real file type (from magic bytes) are
+computed as the chunks pass through, and oversize or unsupported uploads
+are rejected before the rest of the body is buffered. Downstream stages
+share one read-only memory map of the spool file (or receive its path)
+instead of each holding their own copy of the bytes.
+
+This module is imported by the PDF worker processes, so it must stay
+light: no Google clients or Flask imports at module level.
+"""
+
+import os
+import mmap
+import time
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from config import Config
+
+# Magic-byte signatures of the accepted upload types
+MAGIC_TYPES = (
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+)
+SNIFF_BYTES = max(len(magic) for magic, _ in MAGIC_TYPES)
+
+# Spool files older than this are leftovers of a crashed process
+_STALE_SPOOL_SECONDS = 24 * 3600
+_spool_ready = False
+
+
+class UploadRejected(Exception):
+    """Raised while streaming an upload that is too large or of an unsupported type."""
+
+
+def sniff_mime(head: bytes):
+    """MIME type of a file from its first bytes, or None if unsupported."""
+    for magic, mime in MAGIC_TYPES:
+        if head.startswith(magic):
+            return mime
+    return None
+
+
+def _spool_dir() -> str:
+    """Create the spool directory once, removing files orphaned by a crash."""
+    global _spool_ready
+    directory = Config.UPLOAD_SPOOL_DIR
+    if not _spool_ready:
+        os.makedirs(directory, exist_ok=True)
+        cutoff = time.time() - _STALE_SPOOL_SECONDS
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+        _spool_ready = True
+    return directory
+
+
+class IngestStream:
+    """
+    Writable/readable spool file for one uploaded file.
+
+    Werkzeug's multipart parser writes the upload into it chunk by chunk;
+    every chunk is hashed, size-checked and (at the start) type-checked
+    on the way to disk. Streams that are never handed over with finish()
+    (file fields a route does not read) are discarded at the end of the
+    request.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes if max_bytes is not None else Config.UPLOAD_MAX_BYTES
+        self.size = 0
+        self.mime = None
+        self.claimed = False
+        self._head = b""
+        self._hash = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(dir=_spool_dir(), prefix="upload-")
+        self._file = os.fdopen(fd, "w+b")
+
+    def write(self, data) -> int:
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.discard()
+            raise UploadRejected(f"File is too large (limit {self.max_bytes // (1024 * 1024)} MB).")
+
+        if self.mime is None and len(self._head) < SNIFF_BYTES:
+            self._head += bytes(data[:SNIFF_BYTES - len(self._head)])
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_type()
+
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def _check_type(self):
+        self.mime = sniff_mime(self._head)
+        if self.mime is None:
+            self.discard()
+            raise UploadRejected("Unsupported file type. Please upload a PDF, JPG or PNG file.")
+
+    def finish(self, filename=None):
+        """
+        Complete ingestion and hand the spool file over as an Upload.
+
+        Raises:
+            UploadRejected: If the upload is empty or of an unsupported type
+        """
+        if self.size == 0:
+            self.discard()
+            raise UploadRejected("Uploaded file is empty.")
+        if self.mime is None:
+            self._check_type()
+        self._file.flush()
+        self._file.close()
+        self.claimed = True
+        return Upload(self.path, self.size, self._hash.hexdigest(), self.mime, filename)
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    # Read side, used by werkzeug and FileStorage
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        # Closed at the end of the request; the spool file outlives it
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+
+class Upload:
+    """An ingested upload: spool file path plus its size, hash and detected type."""
+
+    def __init__(self, path, size, sha256, mime, filename=None):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.mime = mime
+        self.filename = filename
+
+    def view(self):
+        """Context manager yielding a shared read-only memory map of the upload."""
+        return open_view(self.path)
+
+    def discard(self):
+        """Delete the spool file once every stage is done with it."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def ingest_file(file_storage, max_bytes=None) -> Upload:
+    """
+    Ingest an uploaded file (werkzeug FileStorage).
+
+    Uploads parsed through IngestStream are already on disk; anything else
+    is streamed through one in 1 MB chunks.
+
+    Raises:
+        UploadRejected: If the upload is empty, too large or unsupported
+    """
+    stream = file_storage.stream
+    if not isinstance(stream, IngestStream):
+        stream = IngestStream(max_bytes)
+        while True:
+            chunk = file_storage.stream.read(1024 * 1024)
+            if not chunk:
+                break
+            stream.write(chunk)
+    return stream.finish(file_storage.filename)
+
+
+@contextmanager
+def open_view(source):
+    """
+    Read-only buffer over document content.
+
+    Args:
+        source: Document bytes, or the path of a spooled upload, which is
+            memory-mapped so every reader shares the same page-cache pages
+    """
+    if not isinstance(source, str):
+        yield source
+        return
+    with open(source, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+
+def read_bytes(source) -> bytes:
+    """The full content of a source as bytes, for APIs that need a copy."""
+    if not isinstance(source, str):
+        return bytes(source)
+    with open(source, "rb") as f:
+        return f.read()
@@ -0,0 +1,287 @@
+"""
+Background Upload Queue
+Uploads analyzed documents to Cloud Storage off the analysis path, with
+bounded concurrency, retry with exponential backoff and an on-disk journal
+so pending uploads survive a restart.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from config import Config
+
+
+class UploadQueue:
+    """
+    Durable background uploader.
+
+    Every pending upload is journaled as ``<id>.json`` (metadata, attempt
+    count, next attempt time) plus ``<id>.data`` (the file) in
+    ``journal_dir``, written before ``enqueue`` returns. Entries are
+    removed once uploaded; after ``max_attempts`` failures (or an
+    unexpected error while handling them) their metadata is kept with
+    ``"failed": true`` for inspection and never retried, and their data
+    file is deleted.
+    """
+
+    def __init__(self, name, journal_dir, workers=2, max_attempts=8,
+                 base_delay_seconds=5.0, max_delay_seconds=600.0):
+        self.name = name
+        self.journal_dir = journal_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+        # Min-heap of (next_attempt_at, seq, entry_id)
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._in_flight = 0
+
+        # Stats
+        self._uploaded = 0
+        self._retries = 0
+        self._failed = 0
+
+    # -------------------------------------------------
+    # Journal
+    # -------------------------------------------------
+
+    def _meta_path(self, entry_id):
+        return os.path.join(self.journal_dir, f"{entry_id}.json")
+
+    def _data_path(self, entry_id):
+        return os.path.join(self.journal_dir, f"{entry_id}.data")
+
+    def _write_entry(self, entry):
+        """Atomically (re)write an entry's metadata."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.journal_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._meta_path(entry["id"]))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read_entry(self, entry_id):
+        try:
+            with open(self._meta_path(entry_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove_entry(self, entry_id):
+        for path in (self._meta_path(entry_id), self._data_path(entry_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _remove_data(self, entry_id):
+        try:
+            os.remove(self._data_path(entry_id))
+        except FileNotFoundError:
+            pass
+
+    # -------------------------------------------------
+    # Scheduling
+    # -------------------------------------------------
+
+    def start(self):
+        """
+        Start the upload workers and re-queue journaled uploads.
+
+        Called at app startup (not import) so a pre-fork gunicorn master
+        never spawns threads; enqueue() also starts the workers lazily.
+        """
+        with self._cond:
+            if self._threads:
+                return
+            os.makedirs(self.journal_dir, exist_ok=True)
+
+            resumed = 0
+            names = set(os.listdir(self.journal_dir))
+            for name in names:
+                # Temp files and files moved in just before a crash, never journaled
+                orphan = name.endswith(".data") and name[:-len(".data")] + ".json" not in names
+                if name.startswith(".tmp-") or orphan:
+                    os.remove(os.path.join(self.journal_dir, name))
+                    continue
+                if not name.endswith(".json"):
+                    continue
+                entry = self._read_entry(name[:-len(".json")])
+                if entry and entry.get("failed"):
+                    self._remove_data(entry["id"])
+                elif entry:
+                    heapq.heappush(self._heap, (entry["next_attempt_at"], next(self._seq), entry["id"]))
+                    resumed += 1
+            if resumed:
+                print(f"📦 Resuming {resumed} pending Cloud Storage upload(s)")
+
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"{self.name}-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def enqueue(self, path, blob_name, content_type, firestore_doc_id=None):
+        """
+        Journal a file for background upload. Takes ownership of ``path``
+        (the file is moved into the journal).
+
+        Args:
+            path: Local file to upload
+            blob_name: Destination blob name in the bucket
+            content_type: MIME type stored with the blob
+            firestore_doc_id: Document whose ``file_url`` is set once uploaded
+
+        Returns:
+            str entry ID
+        """
+        self.start()
+        entry_id = uuid.uuid4().hex
+        shutil.move(path, self._data_path(entry_id))
+        entry = {
+            "id": entry_id,
+            "blob_name": blob_name,
+            "content_type": content_type,
+            "firestore_doc_id": firestore_doc_id,
+            "attempts": 0,
+            "next_attempt_at": time.time(),
+            "created_at": time.time(),
+            "last_error": None,
+            "failed": False,
+        }
+        self._write_entry(entry)
+
+        with self._cond:
+            heapq.heappush(self._heap, (entry["next_attempt_at"], next(self._seq), entry_id))
+            self._cond.notify()
+        return entry_id
+
+    def _backoff(self, attempts):
+        # Exponential backoff with +/-50% jitter
+        delay = min(self.max_delay_seconds, self.base_delay_seconds * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    if self._heap and self._heap[0][0] <= now:
+                        _, _, entry_id = heapq.heappop(self._heap)
+                        self._in_flight += 1
+                        break
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    self._cond.wait(timeout)
+            try:
+                self._attempt(entry_id)
+            except Exception as e:
+                # Never let one entry kill the worker thread
+                print(f"❌ Upload queue error on entry {entry_id}: {e}")
+                self._mark_failed(entry_id, e)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+
+    def _attempt(self, entry_id):
+        entry = self._read_entry(entry_id)
+        if entry is None or entry.get("failed"):
+            return
+
+        try:
+            file_url = self._upload(entry)
+        except Exception as e:
+            entry["attempts"] += 1
+            entry["last_error"] = str(e)[:500]
+            if entry["attempts"] >= self.max_attempts:
+                entry["failed"] = True
+                self._write_entry(entry)
+                self._remove_data(entry_id)
+                with self._cond:
+                    self._failed += 1
+                print(f"❌ Cloud Storage upload of {entry['blob_name']} failed after {entry['attempts']} attempts: {e}")
+                return
+
+            delay = self._backoff(entry["attempts"])
+            entry["next_attempt_at"] = time.time() + delay
+            self._write_entry(entry)
+            with self._cond:
+                self._retries += 1
+                heapq.heappush(self._heap, (entry["next_attempt_at"], next(self._seq), entry_id))
+                self._cond.notify()
+            print(f"⚠️ Cloud Storage upload of {entry['blob_name']} failed (attempt {entry['attempts']}), retrying in {delay:.0f}s: {e}")
+            return
+
+        if entry.get("firestore_doc_id"):
+            try:
+                from services.firestore_service import update_document
+                update_document(entry["firestore_doc_id"], file_url=file_url)
+            except Exception as e:
+                # The file is stored; the document keeps its report-link fallback
+                print(f"⚠️ Updating file_url in Firestore failed: {e}")
+
+        self._remove_entry(entry_id)
+        with self._cond:
+            self._uploaded += 1
+        print(f"✅ File uploaded to Cloud Storage: {entry['blob_name']}")
+
+    def _mark_failed(self, entry_id, error):
+        """Give up on an entry after an unexpected error (best effort)."""
+        entry = self._read_entry(entry_id)
+        if entry is not None:
+            entry["failed"] = True
+            entry["last_error"] = str(error)[:500]
+            try:
+                self._write_entry(entry)
+            except OSError as e:
+                print(f"⚠️ Could not mark upload {entry_id} as failed: {e}")
+        try:
+            self._remove_data(entry_id)
+        except OSError:
+            pass
+        with self._cond:
+            self._failed += 1
+
+    def _upload(self, entry):
+        from services.storage_service import upload_document
+        with open(self._data_path(entry["id"]), "rb") as f:
+            result = upload_document(f, blob_name=entry["blob_name"], content_type=entry["content_type"])
+        return result["file_url"]
+
+    def stats(self):
+        """Pending uploads and outcome counters."""
+        with self._cond:
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "pending": len(self._heap),
+                "in_flight": self._in_flight,
+                "uploaded": self._uploaded,
+                "retries": self._retries,
+                "failed": self._failed,
+            }
+
+
+upload_queue = UploadQueue(
+    "storage-upload",
+    Config.UPLOAD_JOURNAL_DIR,
+    workers=Config.UPLOAD_WORKERS,
+    max_attempts=Config.UPLOAD_MAX_ATTEMPTS,
+    base_delay_seconds=Config.UPLOAD_RETRY_BASE_SECONDS,
+    max_delay_seconds=Config.UPLOAD_RETRY_MAX_SECONDS
+)
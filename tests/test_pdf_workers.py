@@ -0,0 +1,82 @@
+"""
+PDF worker pool: a job whose worker is wedged must not leak into other jobs.
+"""
+
+import signal
+import threading
+import time
+
+import pytest
+from fpdf import FPDF
+
+from config import Config
+from services.ai import pdf_workers
+from services.ai.pdf_workers import PdfExtractionError
+
+HANG = b"%PDF-hang"
+
+
+def _range_or_hang(source, start, end, time_limit, max_rss_mb):
+    """Worker-side stand-in for extract_page_range that wedges on HANG."""
+    if source == HANG:
+        # Simulate extraction stuck in C code: the alarm never interrupts it
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        time.sleep(60)
+    return pdf_workers.extract_page_range(source, start, end, time_limit, max_rss_mb)
+
+
+def _sample_pdf(pages=8) -> bytes:
+    pdf = FPDF()
+    pdf.set_font("Arial", "", 12)
+    for page in range(pages):
+        pdf.add_page()
+        pdf.multi_cell(0, 6, f"Page {page + 1}. The tenant shall pay rent monthly in advance. " * 5)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+@pytest.fixture
+def single_worker_pool(monkeypatch):
+    monkeypatch.setattr(Config, "PDF_WORKERS", 1)
+    monkeypatch.setattr(Config, "PDF_PAGES_PER_TASK", 1)
+    monkeypatch.setattr(pdf_workers, "extract_page_range", _range_or_hang)
+    pdf_workers._pool = None
+    yield
+    if pdf_workers._pool is not None:
+        pdf_workers._reset_pool(pdf_workers._pool)
+
+
+def test_wedged_job_times_out_without_breaking_concurrent_job(single_worker_pool):
+    pool = pdf_workers._get_pool()
+    outcomes = {}
+
+    def run(name, source, timeout):
+        try:
+            outcomes[name] = pdf_workers.extract_pdf_pages(source, timeout=timeout)
+        except Exception as e:
+            outcomes[name] = e
+
+    wedged = threading.Thread(target=run, args=("wedged", HANG, 1.0))
+    wedged.start()
+    time.sleep(0.5)
+    processes = list(pool._processes.values())
+    # Queued behind the wedged range on the only worker
+    other = threading.Thread(target=run, args=("other", _sample_pdf(), 30.0))
+    other.start()
+    wedged.join(15)
+    other.join(15)
+
+    assert isinstance(outcomes["wedged"], PdfExtractionError)
+    assert "time limit" in str(outcomes["wedged"])
+    # Cancelled by the reset: a PdfExtractionError, never a raw CancelledError
+    assert isinstance(outcomes["other"], PdfExtractionError)
+
+    # The wedged worker was killed, not left running as an orphan
+    deadline = time.monotonic() + 5
+    while any(p.is_alive() for p in processes) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert processes and not any(p.is_alive() for p in processes)
+
+    # A fresh pool serves the next job
+    pages, complete = pdf_workers.extract_pdf_pages(_sample_pdf(3), timeout=30.0)
+    assert complete and len(pages) == 3
+    assert "rent" in pages[2]